@@ -13,7 +13,11 @@ See the License for the specific language governing permissions and
 limitations under the License."""
 
 import simpy
+import heapq
 from Utils.log import write_log
+from Utils.expected_orders import ExpectedOrders
+from Utils.event_codes import EVENT_CODES, log_id
+import time_tracker
 
 
 class Buffer:
@@ -22,6 +26,7 @@ class Buffer:
     def __init__(self, config: dict, env: simpy.Environment, size: int):
         self.env = env
         self.SIMULATION_ENVIRONMENT = None
+        self.LOG_ID = None  # Id of the object in the event tables, set by the object registry of the simulation
         self.CELL = None
 
         # Attributes
@@ -31,31 +36,42 @@ class Buffer:
         # State
         self.items_in_storage = []
         self.full = False
-        self.items_waiting = []
+        self.items_waiting = []  # Heap of arrived orders that could not be stored yet (arrival time, sequence, order)
         self.agents_at_position = []
         self.waiting_agents = []
-        self.expected_orders = []  # (order, time, agent)
+        self.expected_orders = ExpectedOrders()  # Orders on the way to this buffer
         self.expected_orders_to_left = []  # (order, time, agent)
 
+        # Occupancy counters. Maintained by add_item, remove_item and Order.lock/unlock
+        self.stored = 0  # Items in storage
+        self.locked = 0  # Items in storage that are locked by an agent and will leave soon
+
+        # Backlog statistics of items_waiting
+        self.waiting_sequence = 0  # Tie breaker for orders arriving at the same time
+        self.backlog_area = 0  # Backlog length integrated over time until backlog_changed_at
+        self.backlog_changed_at = 0
+        self.max_backlog = 0
+        self.backlog_waiting_times = []  # Waiting times of admitted orders
+
         self.__class__.instances.append(self)
         self.result = None
-        self._excluded_keys = ["logs", "env", "RESPONSIBLE_AGENTS", "_excluded_keys", "_continuous_attributes"]
+        self._excluded_keys = ["logs", "env", "RESPONSIBLE_AGENTS", "_excluded_keys", "_continuous_attributes",
+                               "LOG_ID"]
         self._continuous_attributes = []
 
         self.env.process(self.initial_event())
 
     def save_event(self, event_type: str, item=None):
+        started = time_tracker.start()
         db = self.SIMULATION_ENVIRONMENT.db_con
         cursor = self.SIMULATION_ENVIRONMENT.db_cu
 
         time = self.env.now
 
-        if item:
-            item = id(item)
-
         cursor.execute("INSERT INTO buffer_events VALUES(?,?,?,?,?,?)",
-                       (id(self), time, event_type, item, self.full, len(self.items_in_storage)))
+                       (self.LOG_ID, time, EVENT_CODES[event_type], log_id(item), self.full, self.stored))
         db.commit()
+        time_tracker.stop("recording.buffer_events", started)
 
     def end_event(self):
         self.save_event("End_of_Time")
@@ -65,18 +81,54 @@ class Buffer:
         yield self.env.timeout(0)
 
     def free_slots(self):
-        return self.STORAGE_CAPACITY > len(self.items_in_storage) - len(
-            [order for order in self.items_in_storage if order.locked_by]) + len(
-            self.expected_orders)
+        return self.STORAGE_CAPACITY > self.stored - self.locked + len(self.expected_orders)
 
-    def item_picked_up(self, item):
+    def add_item(self, item):
+        self.items_in_storage.append(item)
+        self.stored += 1
+        if item.locked_by:
+            self.locked += 1
+        self.full = self.stored >= self.STORAGE_CAPACITY
+
+    def remove_item(self, item):
         self.items_in_storage.remove(item)
+        self.stored -= 1
+        if item.locked_by:
+            self.locked -= 1
+        self.full = self.stored >= self.STORAGE_CAPACITY
+
+    def expect_order(self, order, time, agent):
+        """Announce an order that will be stored at this buffer at the given time"""
+        self.expected_orders.announce(order, time, agent, self)
+
+    def expected_order_arrived(self, order):
+        self.expected_orders.complete(order)
+
+    def add_waiting_item(self, item):
+        """Queue an arriving order that can not be stored because the buffer is full"""
+        self.backlog_area = self.backlog_integral()
+        self.backlog_changed_at = self.env.now
+        heapq.heappush(self.items_waiting, (self.env.now, self.waiting_sequence, item))
+        self.waiting_sequence += 1
+        self.max_backlog = max(self.max_backlog, len(self.items_waiting))
+
+    def admit_waiting_item(self):
+        """Store the order that has been waiting the longest"""
+        self.backlog_area = self.backlog_integral()
+        self.backlog_changed_at = self.env.now
+        arrival_time, sequence, item = heapq.heappop(self.items_waiting)
+        self.backlog_waiting_times.append(self.env.now - arrival_time)
+        item.order_arrival()
+
+    def backlog_integral(self):
+        """Backlog length integrated over time until now"""
+        return self.backlog_area + len(self.items_waiting) * (self.env.now - self.backlog_changed_at)
+
+    def item_picked_up(self, item):
+        self.remove_item(item)
         if self.items_waiting:
-            self.items_waiting = sorted(self.items_waiting, key=lambda tup: tup[1])
-            self.items_waiting[0][0].order_arrival()
-            del self.items_waiting[0]
+            self.admit_waiting_item()
         else:
-            self.full = False
             if len(self.waiting_agents) > 0:
                 self.waiting_agents[0].current_waitingtask.interrupt("New space free")
         self.save_event("item_picked_up", item)
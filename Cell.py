@@ -19,12 +19,15 @@ from ProcessingStep import ProcessingStep
 import itertools
 import simpy
 from Utils.log import get_log
+from Utils.expected_orders import ExpectedOrders
+from Utils.order_attributes import order_attributes
 import pandas as pd
-import state_attributes
 from copy import copy
 
 import time_tracker
-import time
+
+# Status indexes each cell keeps of its orders
+ORDER_INDEXES = ["unlocked", "movable", "in_machine_input", "in_machine", "processing", "finished", "blocked"]
 
 
 class Cell:
@@ -34,6 +37,7 @@ class Cell:
                  output_buffer: InterfaceBuffer, level, cell_id, cell_type):
         self.env = env
         self.SIMULATION_ENVIRONMENT = None
+        self.LOG_ID = None  # Id of the object in the event tables, set by the object registry of the simulation
 
         # Attributes
         self.ID = cell_id
@@ -42,7 +46,9 @@ class Cell:
         self.LEVEL = level  # Hierarchy level of this cell, counting bottom up
         self.HEIGHT = None  # Physical distance between top and bottom of the cell, used for distance calculations
         self.WIDTH = None  # Physical distance between left and right side of the cell, used for distance calculations
-        self.DISTANCES = []  # Array containing all possible paths within the cell with shortest length. Agent always use the shortest path to its destination
+        self.DISTANCE_MATRIX = None  # Shortest distances between the possible positions, set from the plant template. Agent always use the shortest path to its destination
+        self.POSITION_INDEX = {}  # Row and column of each possible position in DISTANCE_MATRIX
+        self.ROUTES = {}  # Route cache of the plant template: results of check_best_path by task ids of the order
         self.AGENTS = agents  # Agents within the cell
         for agent in agents:
             agent.CELL = self
@@ -56,30 +62,48 @@ class Cell:
 
         # State
         self.orders_in_cell = []  # Items currently located within this cell
-        self.expected_orders = []  # Announced Orders, that will be available within this cell within next time (Order, Time, Position, Agent)
+        self.order_index = {status: {} for status in ORDER_INDEXES}  # Orders in this cell by status. Dicts of order: arrival number
+        self.arrival_numbers = {}  # Arrival number of each order in this cell. Used to keep the arrival order of the indexes
+        self.arrivals = 0  # Amount of orders that entered this cell
+        self.expected_orders = ExpectedOrders()  # Announced Orders, that will be available within this cell within next time
 
         self.__class__.instances.append(self)
         self.result = None
-        self._excluded_keys = ["logs", "HEIGHT", "WIDTH", "SIMULATION_ENVIRONMENT", "env", "DISTANCES",
-                               "POSSIBLE_POSITIONS", "PERFORMABLE_TASKS"]  # Attributes excluded from log
+        self._excluded_keys = ["logs", "HEIGHT", "WIDTH", "SIMULATION_ENVIRONMENT", "env", "DISTANCE_MATRIX",
+                               "POSITION_INDEX", "ROUTES", "POSSIBLE_POSITIONS", "PERFORMABLE_TASKS", "LOG_ID"]  # Attributes excluded from log
         self._continuous_attributes = []  # Attributes that have to be calculated for states between discrete events
 
     def orders_available(self):
-        non_locked = [order for order in self.orders_in_cell if not order.locked_by or order.processing]
-        if len(non_locked) > 0:
-            return True
-        return False
+        return len(self.order_index["unlocked"]) > 0 or len(self.order_index["processing"]) > 0
+
+    def update_order_index(self, order):
+        """Sort an order of this cell into the status indexes. Called whenever a status of the order changes"""
+        in_machine_input = False
+        in_machine = False
+        if isinstance(order.position, Machine.Machine):
+            in_machine_input = order is order.position.item_in_input
+            in_machine = order is order.position.item_in_machine
+
+        status = {"unlocked": not order.locked_by,
+                  "movable": not order.locked_by and not in_machine_input and not in_machine,
+                  "in_machine_input": in_machine_input,
+                  "in_machine": in_machine,
+                  "processing": order.processing,
+                  "finished": order.tasks_finished,
+                  "blocked": order.blocked_by is not None}
+
+        arrival = self.arrival_numbers[order]
+        for index, member in status.items():
+            if member:
+                self.order_index[index][order] = arrival
+            else:
+                self.order_index[index].pop(order, None)
 
     def inform_incoming_order(self, agent, item, time, position):
-        self.expected_orders.append((item, time, position, agent))
+        self.expected_orders.announce(item, time, agent, position)
 
     def cancel_incoming_order(self, order_cancel):
-        if self.expected_orders:
-            for item in self.expected_orders:
-                order, time, position, agent = item
-                if order == order_cancel:
-                    self.expected_orders.remove(item)
-                    return
+        self.expected_orders.cancel(order_cancel)
 
     def all_tasks_included(self, order, all_tasks=True, alternative_tasks=None):
         """Test if all tasks within the orders work schedule can be performed by this cell.
@@ -88,19 +112,27 @@ class Cell:
             performable_tasks = alternative_tasks
         else:
             performable_tasks = self.PERFORMABLE_TASKS
+        performable_tasks = [perform_task for (perform_task, machines) in performable_tasks if machines > 0]
+        work_schedule = order.work_schedule
         if all_tasks:
-            work_schedule = order.work_schedule
+            start = 0
         else:
-            work_schedule = order.remaining_tasks
-        for task in work_schedule:
-            task_possible = False
-            for (perform_task, machines) in performable_tasks:
-                if task == perform_task and machines > 0:
-                    task_possible = True
-            if not task_possible:
+            start = order.task_cursor
+        for position in range(start, len(work_schedule)):
+            if work_schedule[position] not in performable_tasks:
                 return 0
         return 1
 
+    def check_best_path(self, order, include_all=True):
+        """Result of find_best_path. The result only depends on the tree and the tasks of the order,
+        so it is stored in the route cache of the cell by task ids"""
+        task_ids = [task.id for task in order.work_schedule]
+        key = (frozenset(task_ids), include_all or frozenset(task_ids[order.task_cursor:]))
+        result = self.ROUTES.get(key)
+        if result is None:
+            result = self.ROUTES[key] = self.find_best_path(order, include_all)
+        return result
+
     def occupancy(self, requester: ManufacturingAgent, criteria: dict):
         buffer = [self.INPUT_BUFFER.occupancy("Input", criteria["buffer"], self)] + [self.OUTPUT_BUFFER.occupancy("Output", criteria["buffer"], self)]
 
@@ -118,23 +150,24 @@ class Cell:
         return [{**item, **pos_attr} for sublist, pos_attr in result for item in sublist]
 
     def get_cell_state(self, requester: ManufacturingAgent):
-        if requester.RULESET.dynamic:
-            criteria = state_attributes.smart_state
-            ranking_criteria = []
-        else:
-            criteria = state_attributes.normal_state
-            ranking_criteria = requester.ranking_criteria
-
-        # Get occupancy of all available slots within this cell
-        now = time.time()
-        #occupancy_states = pd.DataFrame(self.occupancy(requester, criteria), columns=["order", "pos", "pos_type"] + attribute_columns)
-        occupancy_states = pd.DataFrame(self.occupancy(requester, criteria))
-        time_tracker.time_occupancy_calc += time.time() - now
+        """State of the orders an agent could move next. Dynamic agents use their ObservationEncoder instead"""
+        started = time_tracker.start()
+        # Movability is guaranteed by the index. Only the attributes needed for the ranking are added.
+        # Rows keep the arrival order in the cell, random rulesets and ties of the ranking depend on it.
+        # Orders that were locked in between are appended to the index again and have to be sorted back.
+        movable = self.order_index["movable"]
+        occupancy_states = pd.DataFrame([{"order": order, "pos": order.position} for order in sorted(movable, key=movable.get)],
+                                        columns=["order", "pos"])
+        attributes = requester.ranking_criteria
+        time_tracker.stop("state_build.occupancy", started)
+
+        if occupancy_states.empty or not attributes:
+            return occupancy_states
 
         # Add attributes for each order within this cell
-        now = time.time()
-        occupancy_states = self.add_order_attributes(occupancy_states, requester, criteria["order"] + list(set(ranking_criteria) - set(criteria["order"])))
-        time_tracker.time_order_attr_calc += time.time() - now
+        started = time_tracker.start()
+        occupancy_states = self.add_order_attributes(occupancy_states, requester, attributes)
+        time_tracker.stop("state_build.order_attributes", started)
 
         return occupancy_states
 
@@ -143,10 +176,7 @@ class Cell:
         current_time = self.env.now
 
         occupancy["attributes"] = occupancy["order"].apply(get_order_attributes, args=(requester, attributes, current_time))
-
-        now = time.time()
         occupancy = occupancy.join(pd.DataFrame(occupancy.pop("attributes").values.tolist()))
-        time_tracker.b += time.time() - now
 
         return occupancy
 
@@ -160,10 +190,16 @@ class Cell:
         order.in_cell_since = self.env.now
         self.cancel_incoming_order(order)
         self.orders_in_cell.append(order)
+        self.arrival_numbers[order] = self.arrivals
+        self.arrivals += 1
+        self.update_order_index(order)
 
     def remove_order_in_cell(self, order):
         order.in_cell_since = None
         self.orders_in_cell.remove(order)
+        self.arrival_numbers.pop(order, None)
+        for index in self.order_index.values():
+            index.pop(order, None)
 
 class ManufacturingCell(Cell):
 
@@ -176,8 +212,7 @@ class ManufacturingCell(Cell):
 
         self.POSSIBLE_POSITIONS += machines
 
-        self.DISTANCES = [(start, end, 5) for start in self.POSSIBLE_POSITIONS for end in self.POSSIBLE_POSITIONS if
-                          start is not end]
+        self.POSITION_INDEX = {position: index for index, position in enumerate(self.POSSIBLE_POSITIONS)}
 
     def init_responsible_agents(self):
         """Set responsible agents of object within the cell to the cell agents"""
@@ -187,20 +222,7 @@ class ManufacturingCell(Cell):
         for machine in self.MACHINES:
             machine.RESPONSIBLE_AGENTS = self.AGENTS
 
-    def init_performable_tasks(self):
-        """Initialize self.PERFORMABLE_TASKS:
-        Which tasks can be performed within this cell and how many machines are there for each?
-        Iterate through complete tree branch"""
-        result = []
-        for task in ProcessingStep.instances:
-            machine_counter = 0
-            for machine in self.MACHINES:
-                if machine.PERFORMABLE_TASK == task:
-                    machine_counter += 1
-            result.append((task, machine_counter))
-        self.PERFORMABLE_TASKS = result
-
-    def check_best_path(self, order, include_all=True):
+    def find_best_path(self, order, include_all=True):
         """Test if all tasks within the orders work schedule can be performed by this cell. Return True or False"""
         return self.all_tasks_included(order, all_tasks=include_all)
 
@@ -219,7 +241,7 @@ class DistributionCell(Cell):
         self.POSSIBLE_POSITIONS += self.INTERFACES_OUT
         self.CELL_CAPACITY += sum([inpt.STORAGE_CAPACITY for inpt in self.INTERFACES_IN]) + sum([outpt.STORAGE_CAPACITY for outpt in self.INTERFACES_OUT])
 
-        self.DISTANCES = [(start, end, 5) for start in self.POSSIBLE_POSITIONS for end in self.POSSIBLE_POSITIONS if start is not end]
+        self.POSITION_INDEX = {position: index for index, position in enumerate(self.POSSIBLE_POSITIONS)}
 
     def init_responsible_agents(self):
         """Set responsible agents of object within the cell to the cell agents"""
@@ -230,18 +252,7 @@ class DistributionCell(Cell):
             agent.position = self.INPUT_BUFFER
             self.INPUT_BUFFER.agents_at_position.append(agent)
 
-    def init_performable_tasks(self):
-        """Initialize self.PERFORMABLE_TASKS:
-        Which tasks can be performed within this cell and how many machines are there for each?
-        Iterate through complete tree branch"""
-        child_tasks = []
-        for child in self.CHILDS:
-            if len(child.PERFORMABLE_TASKS) == 0:
-                child.init_performable_tasks()
-            child_tasks.append(child.PERFORMABLE_TASKS)
-        self.PERFORMABLE_TASKS = combine_performable_tasks(child_tasks)
-
-    def check_best_path(self, order, include_all=True):
+    def find_best_path(self, order, include_all=True):
         """Calculate the minimal amount of manufacturing cells needed to
          process this order completely in each tree branch"""
         child_results = []
@@ -274,99 +285,14 @@ class DistributionCell(Cell):
 def combine_performable_tasks(task_array):
     """Util function to flatten multidimensional lists into one flat list
     with the amount of appearences within the list"""
-    result = []
-    flatten_list = []
+    number_of_machines = {}
     for child_cell in task_array:
-        flatten_list += child_cell
-    for task in ProcessingStep.instances:
-        number_of_machines = 0
-        for list_element in flatten_list:
-            task_type, machines = list_element
-            if task_type == task:
-                number_of_machines += machines
-        result.append((task, number_of_machines))
-    return result
+        for task_type, machines in child_cell:
+            number_of_machines[task_type] = number_of_machines.get(task_type, 0) + machines
+    return [(task, number_of_machines.get(task, 0)) for task in ProcessingStep.instances]
 
 
 def get_order_attributes(order, requester: ManufacturingAgent, attributes: list, now):
-
-        def start():
-            return now - order.start
-
-        def due_to():
-            return now - order.due_to
-
-        def complexity():
-            return order.complexity
-
-        def type():
-            return order.type.type_id
-
-        def time_in_cell():
-            return now - order.in_cell_since
-
-        def locked():
-            if not order.locked_by:
-                return 0
-            elif order.locked_by == requester:
-                return 1
-            else:
-                return 2
-
-        def picked_up():
-            if not order.picked_up_by:
-                return 0
-            elif order.picked_up_by == requester:
-                return 1
-            else:
-                return 2
-
-        def processing():
-            return int(order.processing)
-
-        def tasks_finished():
-            return int(order.tasks_finished)
-
-        def remaining_tasks():
-            return len(order.remaining_tasks)
-
-        def next_task():
-                return order.next_task.id
-
-        def distance():
-            if order.position:
-                return requester.time_for_distance(order.position)
-            else:
-                return -1
-
-        def in_m():
-            if isinstance(order.position, Machine.Machine):
-                if order == order.position.item_in_machine:
-                    return 1
-                else:
-                    return 0
-            else:
-                return 0
-
-        def in_m_input():
-            if isinstance(order.position, Machine.Machine):
-                if order == order.position.item_in_input:
-                    return 1
-                else:
-                    return 0
-            else:
-                return 0
-
-        def in_same_cell():
-            if order.current_cell == requester.CELL:
-                return 1
-            else:
-                return 0
-
-        attr = {}
-
-        if order:
-            for attribute in attributes:
-                attr[attribute] = locals()[attribute]()
-
-        return attr
+    if not order:
+        return {}
+    return {attribute: order_attributes[attribute](order, requester, now) for attribute in attributes}
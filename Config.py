@@ -16,6 +16,16 @@ configuration = {
     "DB_IN_MEMORY": True,
     "TIME_FOR_ITEM_PICK_UP": 0.1,
     "TIME_FOR_ITEM_STORE": 0.1,
+    "INSTRUMENTATION": False,
+    "MEMORY_REPORT": False,
+    "MEMORY_BUDGET_ACTION": "warn",  # "warn" or "abort" if a component exceeds its budget
+    "REPLAY_BUFFER": "",  # Directory of the replay buffer for transitions of smart agents, empty to deactivate
+    "REPLAY_BUFFER_CAPACITY": 100000,
+    "REPLAY_OBSERVATION_SIZE": 1024,
+    "RESULT_CACHE": False,  # Reuse results of identical runs (config, setup, catalogs, seeds and measures)
+    "RESULT_CACHE_SIZE": 500,  # MB, least recently used results are removed
+    "EVENT_LOG_FORMAT": "xlsx",  # Files of the event log if save_log is active: xlsx (small runs), parquet or arrow (need pyarrow)
+    "TIME_SERIES_BIN_WIDTH": 0,  # Width of the time bins of the KPI time series in result/time_series.csv, 0 to deactivate
 
     "DISTANCES": {
         "BASE_HEIGHT": 1,
@@ -26,6 +36,13 @@ configuration = {
         "MULTIPLICATOR_LOWER_CELL": 1
     },
 
+    "MEMORY_BUDGETS": {  # Budgets in MB, 0 for no limit. Only checked if MEMORY_REPORT is active
+        "MODEL_OBJECTS": 0,
+        "EVENT_TABLES": 0,
+        "RESULTS": 0,
+        "CACHES": 0
+    },
+
     "SEED_GENERATOR": {
         "SEED_GEN_M_INTERRUPTIONS": 2928337,
         "SEED_GEN_INC_ORDERS": 4848373
@@ -80,7 +97,11 @@ evaluation_measures = {
         "time_full": True,
         "overfill_rate": True,
         "mean_items_in_storage": True,
-        "mean_time_in_storage": True
+        "mean_time_in_storage": True,
+        "mean_backlog_length": True,
+        "max_backlog_length": True,
+        "mean_backlog_waiting_time": True,
+        "max_backlog_waiting_time": True
     },
 
     "cell": {
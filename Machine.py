@@ -17,6 +17,10 @@ import simpy
 import numpy as np
 import json
 from Utils.log import write_log
+from Utils.expected_orders import ExpectedOrders
+from Utils.event_codes import EVENT_CODES, log_id
+from Utils.position_attributes import machine_attributes
+import time_tracker
 
 
 class Machine:
@@ -25,6 +29,7 @@ class Machine:
     def __init__(self, config: dict, env: simpy.Environment, task_id):
         self.env = env
         self.SIMULATION_ENVIRONMENT = None
+        self.LOG_ID = None  # Id of the object in the event tables, set by the object registry of the simulation
         self.CELL = None
 
         # Attributes
@@ -46,7 +51,7 @@ class Machine:
         self.setup_proc = None
         self.wait_for_setup_and_load = False
 
-        self.expected_orders = []  # (order, time, agent)
+        self.expected_orders = ExpectedOrders()  # Orders on the way to the machine input
         self.next_expected_order = None
         self.expected_orders_to_left = []  # (order, time, agent)
         self.current_setup = None
@@ -75,104 +80,49 @@ class Machine:
         self.failure_time = None
         self.failure_fixed_in = 0
         self.failure_fixed_at = 0
+        self.failure_random = None  # Own random stream of the failures, seeded by the simulation environment
 
         self.__class__.instances.append(self)
         self.result = None
-        self._excluded_keys = ["logs", "env", "RESPONSIBLE_AGENTS", "_excluded_keys", "_continuous_attributes"]
+        self._excluded_keys = ["logs", "env", "RESPONSIBLE_AGENTS", "_excluded_keys", "_continuous_attributes",
+                               "LOG_ID", "failure_random"]
         self._continuous_attributes = ["remaining_manufacturing_time", "remaining_setup_time", "failure_fixed_in"]
 
         self.env.process(self.initial_event())
         self.main_proc = self.env.process(self.main_process())
 
     def occupancy(self, attributes: list, requester=None):
-
-        def machine_type():
-            return self.PERFORMABLE_TASK.id
-
-        def current_setup():
-            if self.current_setup:
-                return self.current_setup.type_id
-            else:
-                return -1
-
-        def in_setup():
-            return int(self.setup)
-
-        def next_setup():
-            if self.setup:
-                return self.next_expected_order.type.type_id
-            else:
-                return current_setup()
-
-        def remaining_setup_time():
-            if self.setup:
-                return self.setup_finished_at - self.env.now
-            else:
-                return 0
-
-        def manufacturing():
-            return int(self.manufacturing)
-
-        def failure():
-            return int(self.failure)
-
-        def remaining_man_time():
-            if self.failure:
-                return self.remaining_manufacturing_time
-            elif self.manufacturing:
-                return self.manufacturing_end_time - self.env.now
-            else:
-                return 0
-
-        def failure_fixed_in():
-            if self.failure:
-                return self.failure_fixed_at - self.env.now
-            else:
-                return 0
-
-        attr = {}
-        for attribute in attributes:
-            attr[attribute] = locals()[attribute]()
+        attr = {attribute: machine_attributes[attribute](self, self.env.now) for attribute in attributes}
 
         return ([{"order": self.item_in_input, "pos": self, "pos_type": "Machine-Input"},
                 {"order": self.item_in_machine, "pos": self, "pos_type": "Machine-Internal"},
                 {"order": self.item_in_output, "pos": self, "pos_type": "Machine-Output"}], attr)
 
     def save_event(self, event_type: str, est_time=None, next_setup_type=None):
+        started = time_tracker.start()
         db = self.SIMULATION_ENVIRONMENT.db_con
         cursor = self.SIMULATION_ENVIRONMENT.db_cu
 
         time = self.env.now
 
+        # Setup types are logged with the id of the order type
         if next_setup_type:
-            nst = id(next_setup_type)
+            nst = next_setup_type.type_id
         else:
             nst = None
 
         if self.current_setup:
-            cst = id(self.current_setup)
+            cst = self.current_setup.type_id
         else:
             cst = None
 
-        if self.item_in_input:
-            iii = id(self.item_in_input)
-        else:
-            iii = None
-
-        if self.item_in_machine:
-            iim = id(self.item_in_machine)
-        else:
-            iim = None
-
-        if self.item_in_output:
-            iio = id(self.item_in_output)
-        else:
-            iio = None
-
         cursor.execute("INSERT INTO machine_events VALUES(?,?,?,?,?,?,?,?,?,?,?,?,?,?)",
-                       (id(self), time, event_type, est_time, nst, cst, self.load_item, self.manufacturing, self.setup, self.idle, self.failure, iii, iim, iio))
+                       (self.LOG_ID, time, EVENT_CODES[event_type], est_time, nst, cst, self.load_item,
+                        self.manufacturing, self.setup, self.idle, self.failure, log_id(self.item_in_input),
+                        log_id(self.item_in_machine), log_id(self.item_in_output)))
 
         db.commit()
+        time_tracker.stop("recording.machine_events", started)
 
     def initial_event(self):
         self.save_event("Initial")
@@ -181,16 +131,20 @@ class Machine:
     def end_event(self):
         self.save_event("End_of_Time")
 
+    def expect_order(self, order, time, agent):
+        """Announce an order that will be put into the machine input at the given time"""
+        self.expected_orders.announce(order, time, agent, self)
+
+    def expected_order_arrived(self, order):
+        self.expected_orders.complete(order)
+
     def main_process(self):
         try:
             if self.expected_orders or self.item_in_input:
                 if self.item_in_input:
                     self.next_expected_order = self.item_in_input
                 else:
-                    min_time = float('inf')
-                    for order, time, agent in self.expected_orders:
-                        if time < min_time:
-                            self.next_expected_order = order
+                    self.next_expected_order = self.expected_orders.earliest()
 
                 self.wait_for_setup_and_load = True
                 laden = self.env.process(self.get_item())
@@ -220,10 +174,12 @@ class Machine:
     def wait_for_free_output(self):
         try:
             self.item_in_machine.blocked_by = self.item_in_output
+            self.item_in_machine.status_changed()
             while 1:
                 yield self.env.timeout(10)
         except simpy.Interrupt as interruption:
             self.item_in_machine.blocked_by = None
+            self.item_in_machine.status_changed()
             self.wait_for_output_proc = None
 
     def wait_for_item(self):
@@ -247,6 +203,7 @@ class Machine:
                 yield self.env.timeout(0.1)
                 self.item_in_machine = self.item_in_input
                 self.item_in_input = None
+                self.item_in_machine.status_changed()
                 self.load_item = False
                 if not self.setup:
                     self.idle = True
@@ -313,15 +270,18 @@ class Machine:
             return
         if self.item_in_output:
             self.item_in_machine.blocked_by = self.item_in_output
+            self.item_in_machine.status_changed()
             self.wait_for_output_proc = self.env.process(self.wait_for_free_output())
             yield self.wait_for_output_proc
             self.item_in_machine.blocked_by = None
+            self.item_in_machine.status_changed()
         self.idle = False
         self.save_event("release_item_start")
         yield self.env.timeout(0.1)
         released_item = self.item_in_machine
         self.item_in_machine = None
         self.item_in_output = released_item
+        released_item.status_changed()
 
         for agent, place in self.item_in_output.waiting_agent_pos:
             if place == self:
@@ -385,6 +345,7 @@ class Machine:
             self.manufacturing_start_time = self.env.now
             self.manufacturing_end_time = self.manufacturing_start_time + self.manufacturing_time
             self.item_in_machine.processing = True
+            self.item_in_machine.status_changed()
             self.item_in_machine.save_event("processing_start")
             self.save_event("production_start", est_time=self.manufacturing_time)
 
@@ -394,6 +355,7 @@ class Machine:
             self.manufacturing_start_time = self.env.now
             self.manufacturing_end_time = self.manufacturing_start_time + self.remaining_manufacturing_time
             self.item_in_machine.processing = True
+            self.item_in_machine.status_changed()
             self.item_in_machine.save_event("processing_continue")
             self.save_event("failure_end")
 
@@ -403,7 +365,7 @@ class Machine:
             continue_process()
 
         if self.ERROR_RATE > 0:
-            errors = np.random.uniform(low=0, high=1000, size=self.ERROR_RATE)
+            errors = self.failure_random.uniform(low=0, high=1000, size=self.ERROR_RATE)
             errors.sort()
             first_error = errors[0]
         else:
@@ -420,9 +382,9 @@ class Machine:
             self.previous_item = self.item_in_machine
             #self.env.process(testing_machines_single(self.env))
             self.item_in_machine.processing = False
-            self.item_in_machine.processing_step_finished()
             if self.item_in_output:
                 self.item_in_machine.blocked_by = self.item_in_output
+            self.item_in_machine.processing_step_finished()
             self.item_in_machine.save_event("processing_finished")
             self.save_event("production_end")
 
@@ -431,7 +393,7 @@ class Machine:
         #print("FAILURE EVENT", self.env.now, self)
         self.failure = True
         self.failure_time = self.env.now
-        self.failure_fixed_in = np.random.uniform(low=self.FAILURE_MIN_LENGTH, high=self.FAILURE_MAX_LENGTH)
+        self.failure_fixed_in = self.failure_random.uniform(low=self.FAILURE_MIN_LENGTH, high=self.FAILURE_MAX_LENGTH)
         self.failure_fixed_at = self.failure_fixed_in + self.failure_time
         self.manufacturing = False
         self.remaining_manufacturing_time = self.manufacturing_time - (self.env.now - self.manufacturing_start_time)
@@ -16,20 +16,16 @@ limitations under the License."""
 import simpy
 from Machine import Machine
 from Buffer import *
-import random
 from Ruleset import RuleSet
 import pandas as pd
 from ProcessingStep import ProcessingStep
 import threading
 from Utils.log import write_log
 from Utils.consecutive_performable_tasks import consecutive_performable_tasks
-from Utils.devisions import div_possible_zero
-from Utils.dict_pos_types import dict_pos_types
-import numpy as np
+from Utils.event_codes import EVENT_CODES, log_id
+from Utils.position_attributes import agent_attributes
 import RewardLayer
-from copy import copy
 
-import time
 import time_tracker
 
 
@@ -39,6 +35,7 @@ class ManufacturingAgent:
     def __init__(self, config: dict, env: simpy.Environment, position, ruleset_id=None):
         self.env = env
         self.SIMULATION_ENVIRONMENT = None
+        self.LOG_ID = None  # Id of the object in the event tables, set by the object registry of the simulation
         self.lock = None
 
         # Attributes
@@ -51,9 +48,10 @@ class ManufacturingAgent:
         if not self.RULESET:  # Check if the Agent has a Ruleset selected
             raise Exception(
                 "Atleast one Agent has no ruleset defined. Please choose a ruleset or the agent wont do anything!")
-        self.ranking_criteria = [criteria["measure"] for criteria in self.RULESET.numerical_criteria]
+        self.ranking_criteria = self.RULESET.scoring.required_attributes
 
         self.CELL = None
+        self.encoder = None  # ObservationEncoder of the cell state, only used by dynamic rulesets
         self.PARTNER_AGENTS = None  # Other Agents within the same Cell
         self.SPEED = config[
             "AGENT_SPEED"]  # Configured moving speed of the agent: How much distance can be moved within one time points
@@ -80,6 +78,7 @@ class ManufacturingAgent:
         self.picked_up_item = None  # Item the agent is holding, only one at a time
 
         self.started_tasks = 0  # Amount of started tasks
+        self.last_decision = None  # (State, action, penalty, finished orders) of the last smart decision for the replay buffer
 
         # Current tasks
         self.current_task = None  # The current task the agent is performing
@@ -89,7 +88,7 @@ class ManufacturingAgent:
         self.__class__.instances.append(self)
         self.logs = []
         self._excluded_keys = ["logs", "_excluded_keys", "env", "RULESET", "SPEED", "INVENTORY_SPACE", "CELL",
-                               "_continuous_attributes"]  # Attributes excluded from log
+                               "encoder", "last_decision", "_continuous_attributes", "LOG_ID"]  # Attributes excluded from log
         self._continuous_attributes = ["remaining_moving_time"]
 
         self.env.process(self.initial_event())  # Write initial event in event log when simulation starts
@@ -97,35 +96,18 @@ class ManufacturingAgent:
             self.main_process())  # Initialize first main process of the agent when simulation starts
 
     def save_event(self, event_type: str, next_position=None, travel_time=None):
+        started = time_tracker.start()
         db = self.SIMULATION_ENVIRONMENT.db_con
         cursor = self.SIMULATION_ENVIRONMENT.db_cu
 
         time = self.env.now
 
-        if next_position:
-            nxt_pos = id(next_position)
-        else:
-            nxt_pos = None
-
-        if self.position:
-            pos = id(self.position)
-        else:
-            pos = None
-
-        if self.picked_up_item:
-            pui = id(self.picked_up_item)
-        else:
-            pui = None
-
-        if self.locked_item:
-            locki = id(self.locked_item)
-        else:
-            locki = None
-
         cursor.execute("INSERT INTO agent_events VALUES(?,?,?,?,?,?,?,?,?,?,?)",
-                       (id(self), time, event_type, nxt_pos, travel_time, self.moving, self.waiting, self.has_task, pos,
-                        pui, locki))
+                       (self.LOG_ID, time, EVENT_CODES[event_type], log_id(next_position), travel_time, self.moving,
+                        self.waiting, self.has_task, log_id(self.position), log_id(self.picked_up_item),
+                        log_id(self.locked_item)))
         db.commit()
+        time_tracker.stop("recording.agent_events", started)
 
     def initial_event(self):
         self.save_event("Initial")
@@ -133,6 +115,9 @@ class ManufacturingAgent:
 
     def end_event(self):
         self.save_event("End_of_Time")
+        if self.last_decision is not None:
+            # The run ends the episode of the last smart decision
+            self.remember(self.encoder.encode(), done=True)
 
     def occupancy(self, attributes: list, requester=None):
         if requester == self:
@@ -140,36 +125,7 @@ class ManufacturingAgent:
         else:
             pos_type = "Agent"
 
-        def agent_position():
-            return self.position
-
-        def moving():
-            return int(self.moving)
-
-        def remaining_moving_time():
-            if self.moving:
-                return self.moving_end_time - self.env.now
-            else:
-                return 0
-
-        def next_position():
-            if self.moving:
-                return self.next_position
-            else:
-                return -1
-
-        def has_task():
-            return int(self.has_task)
-
-        def locked_item():
-            if self.locked_item:
-                return self.locked_item
-            else:
-                return -1
-
-        attr = {}
-        for attribute in attributes:
-            attr[attribute] = locals()[attribute]()
+        attr = {attribute: agent_attributes[attribute](self, self.env.now) for attribute in attributes}
 
         if self.picked_up_item:
             return [{"order": self.picked_up_item, "pos": self, "pos_type": pos_type}], attr
@@ -184,35 +140,59 @@ class ManufacturingAgent:
             return
 
         self.lock.acquire()
+        decision_started = time_tracker.start()
+        time_tracker.count("decisions")
 
-        # Get state of cell and orders inside this cell
-        state_calc_start = time.time()
-        cell_state = self.CELL.get_cell_state(requester=self)
-        time_tracker.time_state_calc += time.time() - state_calc_start
-
-        # For each order in state add the destination if this order would be chosen
-        dest_calc_start = time.time()
-        cell_state["_destination"] = cell_state.apply(self.add_destinations, axis=1)
-        time_tracker.time_destination_calc += time.time() - dest_calc_start
-
+        started = time_tracker.start()
         if self.RULESET.dynamic:
-            now = time.time()
-            next_task, next_order, destination = self.get_smart_action(cell_state)
-            time_tracker.time_action_calc += time.time() - now
+            # Fixed shape state of all slots within this cell, the destinations are part of it
+            observation = self.encoder.encode()
+            mask = RewardLayer.action_mask(self.encoder.matrix, self.encoder.COLUMN_INDEX, out=self.encoder.mask)
+            self.remember(observation)
+            time_tracker.stop("state_build", started)
+
+            started = time_tracker.start()
+            if mask[:-1].any():
+                # Ask the policy of the ruleset. Other agents of this cell can decide while the batch is collected,
+                # this waiting time is not part of the decision
+                paused = time_tracker.start()
+                self.lock.release()
+                action = yield self.SIMULATION_ENVIRONMENT.policy_service.request(self, observation, mask)
+                self.lock.acquire()
+                decision_started = time_tracker.resume(decision_started, paused)
+                started = time_tracker.resume(started, paused)
+            else:
+                # Taking no action is the only valid choice
+                action = self.encoder.SLOTS
+            next_task, next_order, destination = self.get_smart_action(action)
         else:
-            now = time.time()
+            # Get state of cell and orders inside this cell
+            cell_state = self.CELL.get_cell_state(requester=self)
+            time_tracker.stop("state_build", started)
+
+            # For each order in state add the destination if this order would be chosen
+            started = time_tracker.start()
+            if not cell_state.empty:
+                # Only movable orders are part of the state
+                cell_state["_destination"] = [destination if destination else -1 for destination in
+                                              map(self.calculate_destination, cell_state["order"])]
+            time_tracker.stop("destination", started)
+
+            started = time_tracker.start()
             next_task, next_order, destination = self.get_action(cell_state)
-            time_tracker.time_smart_action_calc += time.time() - now
+        time_tracker.stop("ranking", started)
+        time_tracker.stop("decision", decision_started)
 
         # Perform next task if there is one
         if next_task:
+            time_tracker.count("tasks_started")
             self.current_task = next_task
             self.has_task = True
             self.save_event("start_task")
             self.started_tasks += 1
 
             if next_order:
-                next_order.locked_by = self
+                next_order.lock(self)
                 self.locked_item = next_order
                 self.locked_item.save_event("locked")
                 self.announce_arrival(next_order, destination)
@@ -227,15 +207,12 @@ class ManufacturingAgent:
             self.lock.release()
 
     def get_action(self, order_state):
+        """Choose the next order by the ruleset. The state contains only movable orders of this cell"""
 
-        useable_orders = order_state.loc[np.where((order_state["order"].notnull()) & (order_state["locked"] == 0)
-                                                  & (order_state["in_m_input"] == 0) & (order_state["in_m"] == 0) &
-                                                  order_state["in_same_cell"] == 1)]
-
-        if useable_orders.empty:
+        if order_state.empty:
             return None, None, None
 
-        useable_with_free_destination = useable_orders[useable_orders["_destination"] != -1]
+        useable_with_free_destination = order_state[order_state["_destination"] != -1]
 
         if useable_with_free_destination.empty:
             return None, None, None
@@ -249,30 +226,9 @@ class ManufacturingAgent:
             next_order = ranking["order"].iat[0]
 
         else:
-            criteria = [criteria["measure"] for criteria in self.RULESET.numerical_criteria]
-
-            ranking = useable_with_free_destination.loc[:, ["order"] + criteria]
-
-            for criterion in self.RULESET.numerical_criteria:
-                weight = criterion["weight"]
-                measure = criterion["measure"]
-                order = criterion["ranking_order"]
-
-                max_v = ranking[measure].max()
-                min_v = ranking[measure].min()
-
-                # Min Max Normalisation
-                if order == "ASC":
-                    ranking["WS-" + measure] = weight * div_possible_zero((ranking[measure] - min_v), (max_v - min_v))
-                else:
-                    ranking["WS-" + measure] = weight * (
-                                1 - div_possible_zero((ranking[measure] - min_v), (max_v - min_v)))
-
-            order_scores = ranking.filter(regex="WS-")
-            ranking.loc[:, "Score"] = order_scores.sum(axis=1)
-            ranking.sort_values(by=["Score"], inplace=True)
-
-            next_order = ranking["order"].iat[0]
+            scoring = self.RULESET.scoring
+            values = useable_with_free_destination.loc[:, scoring.MEASURES].to_numpy(dtype=float)
+            next_order = useable_with_free_destination["order"].iat[scoring.best(values)]
 
         destination = useable_with_free_destination[useable_with_free_destination["order"] == next_order].reset_index(drop=True).loc[0, "_destination"]
 
@@ -281,80 +237,54 @@ class ManufacturingAgent:
         else:
             return None, None, None
 
-    def get_smart_action(self, order_state):
-
-        state_numeric = self.state_to_numeric(copy(order_state))
-
-        # Get action space
-        action_space = range(0, len(state_numeric) + 1)
-
-        # Flatten state
-        state_flat = list(state_numeric.to_numpy().flatten())
-
-        # Get action
-        random.seed = 1000
-        action = random.choice(action_space)
-        # print(action)
-        # action = smart_agent.get_action(state_flat, action_space)
+    def get_smart_action(self, action: int):
+        """Perform the action chosen by the policy service. Last action of the action space means no action"""
 
-        if action < len(state_numeric):
+        if action < self.encoder.SLOTS:
             # Normal action
-            next_order = order_state.at[action, "order"]
-            destination = order_state.at[action, "_destination"]
+            next_order = self.encoder.orders[action]
+            penalty = RewardLayer.evaluate_choice(self.encoder.choice(action))
         else:
             # Take no action
-            return None, None, None
+            next_order = None
+            penalty = 0
 
-        penalty = RewardLayer.evaluate_choice(state_numeric.loc[action])
+        self.SIMULATION_ENVIRONMENT.policy_service.feedback(self, penalty)
+        if self.SIMULATION_ENVIRONMENT.replay_buffer is not None:
+            self.last_decision = (self.encoder.observation.copy(), action, penalty, self.SIMULATION_ENVIRONMENT.finished_orders)
 
-        if penalty < 0:
-            # smart_agent.appendMemory(former_state=state_flat, new_state=state_flat, action=action, reward=penalty, time_passed=0)
+        if next_order is None or penalty < 0:
             return None, None, None
-        else:
-            print("Smart Action", self)
-            return self.env.process(self.item_from_to(next_order, next_order.position, destination)), next_order, destination
-
-    def state_to_numeric(self, order_state):
-        order_state.loc[:, "slot_id"] = order_state.index
-        slot_ids = order_state.pop("slot_id")
-        order_state.insert(0, "slot_id", slot_ids)
-
-        pos_in_cell = order_state["pos"].unique()
-        pos_ids = np.arange(1, len(pos_in_cell) + 1)
-        pos_ids = dict(zip(pos_in_cell, pos_ids))
-
-        pos_type_ids = dict_pos_types
-
-        orders_in_cell = order_state[order_state["order"].notnull()]["order"].to_dict()
-        orders_in_cell = {orders_in_cell[key]: key for key in orders_in_cell}
 
-        # Map categorical values to ids
-        cols = ["pos", "agent_position", "next_position", "_destination"]
-        cols = [column for column in cols if column in order_state.columns.values.tolist()]
-        order_state[cols] = order_state[cols].replace(pos_ids)
-
-        cols = ["pos_type"]
-        order_state[cols] = order_state[cols].replace(pos_type_ids)
+        # The cell might have changed while waiting for the policy
+        if next_order not in self.CELL.order_index["movable"]:
+            return None, None, None
+        destination = self.calculate_destination(next_order)
+        if not destination:
+            return None, None, None
 
-        if "locked_item" in order_state.columns.values.tolist():
-            order_state["locked_item"].fillna(-2)
-            cols = ["locked_item"]
-            order_state[cols] = order_state[cols].replace(orders_in_cell)
+        print("Smart Action", self)
+        return self.env.process(self.item_from_to(next_order, next_order.position, destination)), next_order, destination
 
-        order_state = order_state.fillna(0)
-        order_state.loc[order_state["order"] != 0, "order"] = 1
+    def remember(self, observation, done=False):
+        """Complete the transition of the last smart decision with the current state and store it in the replay buffer"""
+        replay_buffer = self.SIMULATION_ENVIRONMENT.replay_buffer
+        if replay_buffer is None or self.last_decision is None:
+            return
 
-        return order_state
+        state, action, penalty, finished_orders = self.last_decision
+        self.last_decision = None
+        reward = RewardLayer.reward_action(penalty, self.SIMULATION_ENVIRONMENT.finished_orders - finished_orders)
+        replay_buffer.append(state, action, reward, observation, done)
 
     def calculate_destination(self, order):
         """Calculate the best next position for an agent to bring the order"""
         #print(self.env.now, self, order, "Calculate Destination for this order")
 
         if order.current_cell is not self.CELL:
-            return None, None
+            return None
 
         next_processing_step = order.next_task
-        next_steps = order.remaining_tasks
         destination = None
 
         # Bring finished orders and orders that can not be performed in this cell always to the cell output buffer
@@ -362,7 +292,7 @@ class ManufacturingAgent:
                                                                 if amount > 0]:
             if self.CELL.OUTPUT_BUFFER.free_slots():
                 destination = self.CELL.OUTPUT_BUFFER
-            elif self.CELL.STORAGE.free_slots():
+            elif self.CELL.STORAGE.free_slots() and order.position is not self.CELL.STORAGE:
                 destination = self.CELL.STORAGE
 
         # Order is in machine cell
@@ -412,7 +342,8 @@ class ManufacturingAgent:
 
             else:
                 # Prefer the one that can perform the most continuous tasks and has a free Input Slot.
-                result = [(cell, consecutive_performable_tasks(next_steps, performable_tasks)) for
+                result = [(cell, consecutive_performable_tasks(order.work_schedule, performable_tasks,
+                                                               start=order.task_cursor)) for
                           (cell, shortest_path, performable_tasks) in possibilities]
                 result = sorted([(cell, amount) for (cell, amount) in result if amount > 0], key=lambda tup: tup[1],
                                 reverse=True)
@@ -429,25 +360,12 @@ class ManufacturingAgent:
                     destination = self.CELL.STORAGE
 
         if destination == order.position:
-            print(self, order, "Order is already at Position!")
-            exit()
+            raise Exception("Order is already at Position!", self, order, order.position)
         return destination
 
-    def add_destinations(self, data):
-
-        useable_order = (pd.notnull(data["order"])) and (data["locked"] == 0) and (data["in_m_input"] == 0) and (
-                data["in_m"] == 0)
-
-        if useable_order:
-            destination = self.calculate_destination(data["order"])
-            if destination:
-                return destination
-
-        return -1
-
     def announce_arrival(self, order, destination):
         arr_time = self.env.now + self.time_for_distance(order.position) + self.time_for_distance(destination, start_position=order.position) + self.TIME_FOR_ITEM_PICK_UP + self.TIME_FOR_ITEM_STORE
-        destination.expected_orders.append((order, arr_time, self))
+        destination.expect_order(order, arr_time, self)
 
         if isinstance(destination, InterfaceBuffer):
             if destination.upper_cell == self.CELL:
@@ -562,11 +480,10 @@ class ManufacturingAgent:
                 self.position.input_lock = False
 
                 #print("Remove1", item, self, self.position, self.position.expected_orders)
-                self.position.expected_orders.remove(
-                    [(order, time, agent) for order, time, agent in self.position.expected_orders if
-                     order == item][0])
+                self.position.expected_order_arrived(item)
 
                 self.position.item_in_input = item
+                item.status_changed()
                 if self.position.wait_for_item_proc:
                     self.position.wait_for_item_proc.interrupt("Order arrived")
                 if item.waiting_agent_pos:
@@ -580,12 +497,8 @@ class ManufacturingAgent:
                 yield self.env.timeout(self.TIME_FOR_ITEM_STORE)
 
                 #print("Remove2", item, self, self.position, self.position.expected_orders)
-                self.position.expected_orders.remove(
-                    [(order, time, agent) for order, time, agent in self.position.expected_orders if order == item][0])
-
-                self.position.items_in_storage.append(item)
-                if len(self.position.items_in_storage) == self.position.STORAGE_CAPACITY:
-                    self.position.full = True
+                self.position.expected_order_arrived(item)
+                self.position.add_item(item)
                 if isinstance(self.position, InterfaceBuffer):
                     item.save_event("cell_change")
                     self.CELL.remove_order_in_cell(item)
@@ -661,7 +574,6 @@ class ManufacturingAgent:
             yield self.current_subtask
         if isinstance(from_pos, Machine) and from_pos != to_pos:
             if item is not from_pos.item_in_output:
-                item.waiting_agent = (self, from_pos)
                 self.current_waitingtask = self.env.process(self.wait_for_item_processing(item, from_pos))
                 yield self.current_waitingtask
         if not self.picked_up_item:
@@ -672,7 +584,7 @@ class ManufacturingAgent:
         self.current_subtask = self.env.process(self.store_item())
         yield self.current_subtask
 
-        item.locked_by = None
+        item.unlock()
         item.save_event("unlocked")
         self.locked_item = None
         self.current_task = None
@@ -686,20 +598,17 @@ class ManufacturingAgent:
         if not destination:
             raise Exception("Time for distance: Can not calculate the distance to destination None")
 
-        def get_time(start_pos, end_pos):
-            if start_pos == end_pos:
-                return 0
-            for start, end, length in self.CELL.DISTANCES:
-                if start == start_pos and end == end_pos:
-                    return length / self.SPEED
-
         if not start_position:
             start_position = self.position
 
         if destination == start_position:
             return 0
-        else:
-            return get_time(start_position, destination)
+
+        start = self.CELL.POSITION_INDEX.get(start_position)
+        end = self.CELL.POSITION_INDEX.get(destination)
+        if start is None or end is None:
+            return None
+        return float(self.CELL.DISTANCE_MATRIX[start, end]) / self.SPEED
 
     def state_change_in_cell(self):
         if not self.main_proc.is_alive:
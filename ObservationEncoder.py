@@ -0,0 +1,211 @@
+"""Copyright 2022 Jannis Müller/ janmueller@uni-potsdam.de
+
+Licensed under the Apache License, Version 2.0 (the "License");
+you may not use this file except in compliance with the License.
+You may obtain a copy of the License at
+
+    http://www.apache.org/licenses/LICENSE-2.0
+
+Unless required by applicable law or agreed to in writing, software
+distributed under the License is distributed on an "AS IS" BASIS,
+WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+See the License for the specific language governing permissions and
+limitations under the License."""
+
+import numpy as np
+import state_attributes
+from Utils.dict_pos_types import dict_pos_types
+from Utils.order_attributes import order_attributes
+from Utils.position_attributes import machine_attributes, agent_attributes
+
+POSITION_REFERENCES = ["next_position", "agent_position"]  # Position attributes encoded by their position id
+
+
+class ObservationEncoder:
+    """Numeric state of a cell for one dynamic agent. Every slot of the cell (buffer places, agents and the
+    three places of each machine) has a fixed row, the columns follow state_attributes.smart_state.
+    The state is written into one preallocated float32 matrix which is reused for each decision.
+    Buffers can hold more orders than their capacity while locked orders are leaving. These orders are clipped
+    to the fixed slots of the buffer and counted in the column overflow.
+    The layout, constant values and column views of the positions are prepared once, so encode only reads the
+    current state of the positions and orders."""
+
+    def __init__(self, agent):
+        self.AGENT = agent
+        cell = agent.CELL
+        criteria = state_attributes.smart_state
+
+        self.ORDER_ATTRIBUTES = criteria["order"]
+        self.POSITION_ATTRIBUTES = list(dict.fromkeys(criteria["buffer"] + criteria["machine"] + criteria["agent"]))
+        self.COLUMNS = ["slot_id", "order", "pos", "pos_type"] + self.POSITION_ATTRIBUTES + self.ORDER_ATTRIBUTES + ["overflow", "_destination"]
+        self.COLUMN_INDEX = {column: index for index, column in enumerate(self.COLUMNS)}
+
+        # Positions in the same order as in Cell.occupancy
+        positions = [("buffer", cell.INPUT_BUFFER, cell.INPUT_BUFFER.occupancy("Input", criteria["buffer"], cell)),
+                     ("buffer", cell.OUTPUT_BUFFER, cell.OUTPUT_BUFFER.occupancy("Output", criteria["buffer"], cell)),
+                     ("buffer", cell.STORAGE, cell.STORAGE.occupancy("Storage", criteria["buffer"], cell))] \
+            + [("agent", agent, agent.occupancy(criteria["agent"], requester=self.AGENT)) for agent in cell.AGENTS] \
+            + [("machine", machine, machine.occupancy(criteria["machine"])) for machine in cell.MACHINES] \
+            + [("buffer", interface, interface.occupancy("Interface-In", criteria["buffer"])) for interface in cell.INTERFACES_IN] \
+            + [("buffer", interface, interface.occupancy("Interface-Out", criteria["buffer"])) for interface in cell.INTERFACES_OUT]
+
+        self.SLOTS = sum(len(entries) for kind, position, (entries, attributes) in positions)
+        self.matrix = np.zeros((self.SLOTS, len(self.COLUMNS)), dtype=np.float32)
+        self.observation = self.matrix.reshape(-1)  # Flat view on the matrix which is handed to the policy
+        self.mask = np.ones(self.SLOTS + 1, dtype=bool)  # Possible actions, the last action means no action
+        self.ROWS = list(self.matrix)  # Row views of the slots
+        self.orders = [None] * self.SLOTS
+        self.destinations = [None] * self.SLOTS
+
+        # Values which do not change during the simulation. Each encoding starts from a copy of them
+        self.TEMPLATE = np.zeros_like(self.matrix)
+        self.TEMPLATE[:, 0] = np.arange(self.SLOTS)
+        self.TEMPLATE[:, -1] = -1
+
+        self.POSITION_IDS = {}  # Position ids start with 1, positions outside of this cell are 0
+        self.BUFFERS = []  # (buffer, first slot, last slot, view of the overflow column)
+        self.AGENT_SLOTS = []  # (agent, slot)
+        self.MACHINE_SLOTS = []  # (machine, slot of the machine input)
+        self.POSITION_WRITERS = []  # (attribute function, position, view of the column for its slots, value is a position)
+        self.LOCKED_ITEM_WRITERS = []  # (agent, view of the column for its slot)
+        self.locked_slots = {agent: -1 for agent in cell.AGENTS}  # Slot of the locked item of each agent of this cell
+        first_slot = 0
+        for kind, position, (entries, attributes) in positions:
+            last_slot = first_slot + len(entries)
+            self.POSITION_IDS.setdefault(position, len(self.POSITION_IDS) + 1)
+            self.TEMPLATE[first_slot:last_slot, 2] = self.POSITION_IDS[position]
+            self.TEMPLATE[first_slot:last_slot, 3] = [dict_pos_types[entry["pos_type"]] for entry in entries]
+
+            if kind == "buffer":
+                self.BUFFERS.append((position, first_slot, last_slot,
+                                     self.matrix[first_slot:last_slot, self.COLUMN_INDEX["overflow"]]))
+                for attribute, value in attributes.items():
+                    self.TEMPLATE[first_slot:last_slot, self.COLUMN_INDEX[attribute]] = value if value is not None else 0
+            else:
+                if kind == "agent":
+                    self.AGENT_SLOTS.append((position, first_slot))
+                    functions = agent_attributes
+                else:
+                    self.MACHINE_SLOTS.append((position, first_slot))
+                    functions = machine_attributes
+                for attribute in attributes:
+                    column = self.matrix[first_slot:last_slot, self.COLUMN_INDEX[attribute]]
+                    if attribute == "locked_item":
+                        self.LOCKED_ITEM_WRITERS.append((position, column))
+                    else:
+                        self.POSITION_WRITERS.append((functions[attribute], position, column,
+                                                      attribute in POSITION_REFERENCES))
+            first_slot = last_slot
+
+        self.ORDER_WRITERS = [(self.COLUMN_INDEX[attribute], order_attributes[attribute]) for attribute in self.ORDER_ATTRIBUTES]
+        self.LOCKED = self.COLUMN_INDEX["locked"]
+        self.IN_M_INPUT = self.COLUMN_INDEX["in_m_input"]
+        self.IN_M = self.COLUMN_INDEX["in_m"]
+
+        # Destinations of orders are reused as long as the order and the cell state they depend on are unchanged.
+        # Cell state: free slots of the possible target buffers and free inputs and setups of the machines
+        machines = [(lambda machine=machine: machine.item_in_input is None and len(machine.expected_orders) == 0)
+                    for machine in cell.MACHINES] + [(lambda machine=machine: machine.current_setup) for machine in cell.MACHINES]
+        children = [child.INPUT_BUFFER.free_slots for child in getattr(cell, "CHILDS", [])] \
+            + [(lambda buffer=child.INPUT_BUFFER: buffer.full) for child in getattr(cell, "CHILDS", [])]
+        self.DESTINATION_INPUTS = [cell.OUTPUT_BUFFER.free_slots, cell.STORAGE.free_slots] + machines + children
+        self.destination_inputs = [None] * len(self.DESTINATION_INPUTS)
+        self.destination_cache = {}  # Order: [task cursor, position, cell, destination]
+
+    def encode(self):
+        """Write the current state of the cell into the observation buffer and return it"""
+        matrix = self.matrix
+        orders = self.orders
+        np.copyto(matrix, self.TEMPLATE)
+
+        # Orders of all slots
+        for buffer, first_slot, last_slot, overflow in self.BUFFERS:
+            slot = first_slot
+            excess = buffer.stored - (last_slot - first_slot)
+            if excess > 0:
+                # Locked orders are leaving the buffer, they are left out first
+                overflow.fill(excess)
+                for order in buffer.items_in_storage:
+                    if not order.locked_by:
+                        orders[slot] = order
+                        slot += 1
+                for order in buffer.items_in_storage:
+                    if order.locked_by and slot < last_slot:
+                        orders[slot] = order
+                        slot += 1
+            else:
+                for order in buffer.items_in_storage:
+                    orders[slot] = order
+                    slot += 1
+            while slot < last_slot:
+                orders[slot] = None
+                slot += 1
+        for agent, slot in self.AGENT_SLOTS:
+            orders[slot] = agent.picked_up_item
+        for machine, slot in self.MACHINE_SLOTS:
+            orders[slot] = machine.item_in_input
+            orders[slot + 1] = machine.item_in_machine
+            orders[slot + 2] = machine.item_in_output
+
+        if self.destination_inputs_changed():
+            self.destination_cache.clear()
+        for agent in self.locked_slots:
+            self.locked_slots[agent] = -1
+
+        now = self.AGENT.env.now
+        slot = 0
+        for order in orders:
+            self.destinations[slot] = None
+            if order is not None:
+                row = self.ROWS[slot]
+                row[1] = 1
+                for column, attribute_value in self.ORDER_WRITERS:
+                    row[column] = attribute_value(order, self.AGENT, now)
+
+                # Locked items of agents are referenced by their slot
+                agent = order.locked_by
+                if agent in self.locked_slots and agent.locked_item is order:
+                    self.locked_slots[agent] = slot
+
+                # Destination if this order would be chosen
+                if row[self.LOCKED] == 0 and row[self.IN_M_INPUT] == 0 and row[self.IN_M] == 0:
+                    self.destinations[slot] = self.destination(order)
+                if self.destinations[slot]:
+                    row[-1] = self.POSITION_IDS.get(self.destinations[slot], 0)
+            slot += 1
+
+        for attribute_value, position, column, is_position in self.POSITION_WRITERS:
+            value = attribute_value(position, now)
+            if is_position:
+                value = self.POSITION_IDS.get(value, 0) if value != -1 else -1
+            elif value is None:
+                value = 0
+            column.fill(value)
+        for agent, column in self.LOCKED_ITEM_WRITERS:
+            column.fill(self.locked_slots.get(agent, -1))
+
+        return self.observation
+
+    def destination_inputs_changed(self):
+        changed = False
+        for index, current_value in enumerate(self.DESTINATION_INPUTS):
+            value = current_value()
+            if value != self.destination_inputs[index]:
+                self.destination_inputs[index] = value
+                changed = True
+        return changed
+
+    def destination(self, order):
+        """Destination of the order if it was chosen, see ManufacturingAgent.calculate_destination"""
+        entry = self.destination_cache.get(order)
+        if entry is None:
+            entry = self.destination_cache[order] = [None, None, None, None]
+        elif entry[0] == order.task_cursor and entry[1] is order.position and entry[2] is order.current_cell:
+            return entry[3]
+        destination = self.AGENT.calculate_destination(order)
+        entry[0], entry[1], entry[2], entry[3] = order.task_cursor, order.position, order.current_cell, destination
+        return destination
+
+    def choice(self, slot: int):
+        """Encoded values of one slot by column name"""
+        return dict(zip(self.COLUMNS, self.matrix[slot]))
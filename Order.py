@@ -16,17 +16,55 @@ limitations under the License."""
 import json
 from ProcessingStep import load_processing_steps, ProcessingStep
 import simpy
-from copy import copy
 import numpy as np
 import Machine
 import matplotlib.pyplot as plt
 from Utils.consecutive_performable_tasks import consecutive_performable_tasks
+from Utils.event_codes import EVENT_CODES, POSITION_CODES, log_id
+import time_tracker
+
+# Status flags of an order. All flags are packed into the integer Order.status
+STARTED = 1
+OVERDUE = 2
+TASKS_FINISHED = 4
+PROCESSING = 8
+WAIT_FOR_REPAIR = 16
+COMPLETED = 32
+
+
+def status_flag(flag: int):
+    """Boolean view on a single flag of Order.status"""
+
+    def get_flag(order):
+        return order.status & flag != 0
+
+    def set_flag(order, value):
+        if value:
+            order.status |= flag
+        else:
+            order.status &= ~flag
+
+    return property(get_flag, set_flag)
 
 
 class Order:
     instances = []
     finished_instances = []
 
+    __slots__ = ["env", "SIMULATION_ENVIRONMENT", "type", "start", "due_to", "urgency", "complexity", "status",
+                 "completed_at", "task_cursor", "position", "current_cell", "in_cell_since",
+                 "picked_up_by", "blocked_by", "locked_by", "waiting_agent_pos", "result", "LOG_ID"]
+
+    _excluded_keys = ("logs", "env", "SIMULATION_ENVIRONMENT", "waiting_agent_pos", "LOG_ID")  # Attributes excluded from log
+    _continuous_attributes = ()
+
+    started = status_flag(STARTED)
+    overdue = status_flag(OVERDUE)
+    tasks_finished = status_flag(TASKS_FINISHED)
+    processing = status_flag(PROCESSING)
+    wait_for_repair = status_flag(WAIT_FOR_REPAIR)
+    completed = status_flag(COMPLETED)
+
     def __init__(self, env: simpy.Environment, sim_env, start, due_to, urgency: int,
                  type, complexity=1):
         self.env = env
@@ -34,24 +72,15 @@ class Order:
 
         # Attributes
         self.type = type  # Type of order. New Types can be defined in Order_types.json.
-        self.composition = self.type.composition  # Material composition of the order. Defined by order type.
-        self.work_schedule = copy(self.type.work_schedule)  # The whole processing steps to be performed on this item to be completed
         self.start = start  # Time when the order arrived/will arrive
-        self.starting_position = sim_env.main_cell.INPUT_BUFFER  # The position where the item will spawn once it started
         self.due_to = due_to  # Due to date of the order
         self.urgency = urgency  # Parameter that can be used to further rank orders
         self.complexity = complexity  # Numerical value, modifier for processing time within machines
 
         # State
-        self.started = False
-        self.overdue = False
-        self.tasks_finished = False
-        self.processing = False
-        self.wait_for_repair = False
-        self.completed = False
+        self.status = 0  # Packed status flags (STARTED, OVERDUE, TASKS_FINISHED, PROCESSING, WAIT_FOR_REPAIR, COMPLETED)
         self.completed_at = None
-        self.remaining_tasks = copy(self.work_schedule)
-        self.next_task = self.remaining_tasks[0]
+        self.task_cursor = 0  # Position of the next task within the work schedule
         self.position = None
         self.current_cell = None
         self.in_cell_since = None  # Time when the item entered its current cell over the interface buffer
@@ -60,18 +89,57 @@ class Order:
         self.locked_by = None  # Locked by Agent X. A locked Order can´t be part of other agent tasks
         self.waiting_agent_pos = []  # Agent waiting for this order to be processed. Tuple: (agent, position)
 
+        self.LOG_ID = None  # Id of the order in the event tables
+        sim_env.object_registry.register(self)
         self.__class__.instances.append(self)
         self.result = None
-        self._excluded_keys = ["logs", "_excluded_keys", "env", "SIMULATION_ENVIRONMENT", "work_schedule", "starting_positon", "waiting_agent_pos", "_continuous_attributes"]
-        self._continuous_attributes = []
 
         self.env.process(self.set_order_overdue())
 
+    @property
+    def composition(self):
+        """Material composition of the order. Defined by order type."""
+        return self.type.composition
+
+    @property
+    def work_schedule(self):
+        """The whole processing steps to be performed on this item to be completed. Shared by all orders of a type"""
+        return self.type.work_schedule
+
+    @property
+    def next_task(self):
+        """Next processing step of the work schedule. Dummy processing step if all tasks are finished"""
+        if self.task_cursor < len(self.type.work_schedule):
+            return self.type.work_schedule[self.task_cursor]
+        return ProcessingStep.dummy_processing_step
+
+    @property
+    def remaining_tasks(self):
+        """Processing steps of the work schedule that are not finished yet"""
+        return self.type.work_schedule[self.task_cursor:]
+
+    @property
+    def remaining_task_count(self):
+        return len(self.type.work_schedule) - self.task_cursor
+
+    @property
+    def stored_in_buffer(self):
+        """True if the order lies in the storage of a buffer and is not held by an agent"""
+        return self.position is not None and self.picked_up_by is None \
+            and not isinstance(self.position, Machine.Machine)
+
+    @property
+    def starting_position(self):
+        """The position where the item will spawn once it started"""
+        return self.SIMULATION_ENVIRONMENT.main_cell.INPUT_BUFFER
+
     def save_event(self, event_type: str):
+        started = time_tracker.start()
         db = self.SIMULATION_ENVIRONMENT.db_con
         cursor = self.SIMULATION_ENVIRONMENT.db_cu
 
         time = self.env.now
+        status = self.status
 
         if self.blocked_by:
             blocked = True
@@ -80,37 +148,26 @@ class Order:
 
         if self.picked_up_by:
             picked_up = True
-            picked_by = id(self.picked_up_by)
             transportation = self.picked_up_by.moving
         else:
             picked_up = False
-            picked_by = None
             transportation = False
 
-        if self.current_cell:
-            cell = id(self.current_cell)
-        else:
-            cell = None
-
         if self.position:
-            pos = id(self.position)
-            pos_type = type(self.position).__name__
+            pos_type = POSITION_CODES[type(self.position).__name__]
         else:
-            pos = None
             pos_type = None
 
-        if self.locked_by:
-            lock_by = id(self.locked_by)
-        else:
-            lock_by = None
-
-        tasks_remaining = len(self.remaining_tasks)
+        tasks_remaining = self.remaining_task_count
 
         cursor.execute("INSERT INTO item_events VALUES(?,?,?,?,?,?,?,?,?,?,?,?,?,?,?,?,?,?)",
-                       (id(self), time, event_type, self.started, self.overdue, blocked, self.tasks_finished,
-                        self.completed, picked_up, transportation, self.processing, self.wait_for_repair, tasks_remaining,
-                        cell, pos, str(pos_type), picked_by, lock_by))
+                       (self.LOG_ID, time, EVENT_CODES[event_type], status & STARTED != 0, status & OVERDUE != 0,
+                        blocked, status & TASKS_FINISHED != 0, status & COMPLETED != 0, picked_up, transportation,
+                        status & PROCESSING != 0, status & WAIT_FOR_REPAIR != 0, tasks_remaining,
+                        log_id(self.current_cell), log_id(self.position), pos_type, log_id(self.picked_up_by),
+                        log_id(self.locked_by)))
         db.commit()
+        time_tracker.stop("recording.item_events", started)
 
     def end_event(self):
         if not self.completed:
@@ -118,38 +175,52 @@ class Order:
 
     def order_finished(self):
         if self.position == self.SIMULATION_ENVIRONMENT.main_cell.OUTPUT_BUFFER and self.tasks_finished:
-            self.position.items_in_storage.remove(self)
+            self.position.remove_item(self)
             self.current_cell = None
             self.position = None
             self.completed = True
             self.completed_at = self.env.now
             self.__class__.finished_instances.append(self)
+            self.SIMULATION_ENVIRONMENT.finished_orders += 1
             print("Order finished! Nr ", len(self.__class__.finished_instances))
 
+    def lock(self, agent):
+        """Reserve the order for the task of an agent. A locked order does not block its buffer slot anymore"""
+        self.locked_by = agent
+        if self.stored_in_buffer:
+            self.position.locked += 1
+        self.status_changed()
+
+    def unlock(self):
+        if self.stored_in_buffer:
+            self.position.locked -= 1
+        self.locked_by = None
+        self.status_changed()
+
+    def status_changed(self):
+        """Update the status indexes of the cell the order is located in"""
+        if self.current_cell:
+            self.current_cell.update_order_index(self)
+
     def processing_step_finished(self):
-        if len(self.remaining_tasks) == 1:
-            del self.remaining_tasks[0]
-            self.next_task = ProcessingStep.dummy_processing_step
+        self.task_cursor += 1
+        if self.task_cursor == len(self.type.work_schedule):
             self.tasks_finished = True
-        else:
-            del self.remaining_tasks[0]
-            self.next_task = self.remaining_tasks[0]
+        self.status_changed()
 
     def order_arrival(self):
         #print(self.env.now, "Arrival of new Item", self.starting_position.items_in_storage, self.starting_position.STORAGE_CAPACITY, len([o for o in self.starting_position.items_in_storage if o.locked_by]))
-        if len(self.starting_position.items_in_storage) < self.starting_position.STORAGE_CAPACITY:
+        if not self.starting_position.full:
             self.position = self.starting_position
             self.started = True
-            self.position.items_in_storage.append(self)
-            if len(self.position.items_in_storage) == self.position.STORAGE_CAPACITY:
-                self.position.full = True
+            self.position.add_item(self)
             print(self.env.now, "Arrival of new Item")
             self.SIMULATION_ENVIRONMENT.main_cell.new_order_in_cell(self)
             self.SIMULATION_ENVIRONMENT.main_cell.inform_agents()
             self.save_event("order_arrival")
             self.position.save_event("order_arrival")
         else:
-            self.starting_position.items_waiting.append((self, self.env.now))
+            self.starting_position.add_waiting_item(self)
             self.save_event("incoming_order")
 
     def set_order_overdue(self):
@@ -197,9 +268,10 @@ class Order:
         if est_accessable_in < 0:
             est_accessable_in = 0
 
-        remaining_tasks = len(self.remaining_tasks)
+        remaining_tasks = self.remaining_task_count
 
-        tasks_in_cell_performable = consecutive_performable_tasks(self.remaining_tasks, self.current_cell.PERFORMABLE_TASKS)
+        tasks_in_cell_performable = consecutive_performable_tasks(self.work_schedule, self.current_cell.PERFORMABLE_TASKS,
+                                                                  start=self.task_cursor)
 
         if self.processing:
             remaining_tasks -= 0.5
@@ -225,9 +297,10 @@ class OrderType:
         self.frequency_factor = type_config['frequency_factor']
         self.duration_factor = type_config['duration_factor']
         self.composition = type_config['composition']
-        self.work_schedule = type_config['work_schedule']
+        work_schedule = type_config['work_schedule']
         for processing_step in ProcessingStep.instances:
-            self.work_schedule = [processing_step if x == processing_step.id else x for x in self.work_schedule]
+            work_schedule = [processing_step if x == processing_step.id else x for x in work_schedule]
+        self.work_schedule = tuple(work_schedule)  # Immutable, shared by all orders of this type
 
     def __eq__(self, other):
         if other:
@@ -245,6 +318,7 @@ def load_order_types():
     """
     load_processing_steps()
     order_types = json.load(open("Order_types.json", encoding="UTF-8"))
+    OrderType.instances.clear()
     for type in order_types['order_types']:
         OrderType(type)
 
@@ -0,0 +1,98 @@
+"""Copyright 2022 Jannis Müller/ janmueller@uni-potsdam.de
+
+Licensed under the Apache License, Version 2.0 (the "License");
+you may not use this file except in compliance with the License.
+You may obtain a copy of the License at
+
+    http://www.apache.org/licenses/LICENSE-2.0
+
+Unless required by applicable law or agreed to in writing, software
+distributed under the License is distributed on an "AS IS" BASIS,
+WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+See the License for the specific language governing permissions and
+limitations under the License."""
+
+import simpy
+import numpy as np
+import time_tracker
+
+
+class RandomPolicy:
+    """Policy of dynamic rulesets without a trained model. Chooses uniformly between the possible actions.
+    Trained models have to provide the same predict method."""
+
+    def __init__(self, seed=None):
+        self.random = np.random.RandomState(seed)
+
+    def predict(self, states: np.ndarray, action_mask: np.ndarray, random: np.random.RandomState = None):
+        """Return one action per row of states. Rows are zero padded, action_mask is True for possible actions.
+        The policy service passes the random stream of its simulation, the policy object is shared by all of them"""
+        if random is None:
+            random = self.random
+        scores = random.uniform(size=action_mask.shape)
+        scores[~action_mask] = -1
+        return scores.argmax(axis=1)
+
+
+class PolicyService:
+    """Collects the decision requests of all dynamic agents raised at the same simulation time and
+    evaluates them with one batched call of the policy per ruleset"""
+
+    def __init__(self, env: simpy.Environment, seed=None):
+        self.env = env
+        self.SEED = seed  # Seed of random policies of rulesets without seed
+        self.random_streams = {}  # Random stream of each random policy within this simulation
+        self.requests = []  # (ruleset, state, action mask, event)
+        self.flush_proc = None
+        self.penalty = 0  # Penalties of the chosen actions, collected by training environments
+
+    def request(self, agent, state: np.ndarray, action_mask: np.ndarray):
+        """Queue a decision of an agent. action_mask is True for valid actions (see RewardLayer.action_mask).
+        The returned event is triggered with the chosen action"""
+        event = self.env.event()
+        self.requests.append((agent.RULESET, state, action_mask, event))
+        if self.flush_proc is None:
+            self.flush_proc = self.env.process(self.flush())
+        return event
+
+    def flush(self):
+        # Wait until no more requests are raised at the current time
+        requests = -1
+        while requests != len(self.requests):
+            requests = len(self.requests)
+            yield self.env.timeout(0)
+
+        batch, self.requests = self.requests, []
+        self.flush_proc = None
+
+        rulesets = {}
+        for request in batch:
+            rulesets.setdefault(request[0], []).append(request)
+
+        for ruleset, requests in rulesets.items():
+            states = np.zeros((len(requests), max(len(state) for _, state, _, _ in requests)), dtype=np.float32)
+            action_mask = np.zeros((len(requests), max(len(mask) for _, _, mask, _ in requests)), dtype=bool)
+            for row, (_, state, mask, _) in enumerate(requests):
+                states[row, :len(state)] = state
+                action_mask[row, :len(mask)] = mask
+
+            started = time_tracker.start()
+            if isinstance(ruleset.policy, RandomPolicy):
+                actions = ruleset.policy.predict(states, action_mask, self.random_stream(ruleset))
+            else:
+                actions = ruleset.policy.predict(states, action_mask)
+            time_tracker.stop("policy", started)
+
+            for (_, _, _, event), action in zip(requests, actions):
+                event.succeed(int(action))
+
+    def random_stream(self, ruleset):
+        """Decisions of random policies only depend on the seeds of the simulation, not on other simulations"""
+        if ruleset not in self.random_streams:
+            self.random_streams[ruleset] = np.random.RandomState(ruleset.seed if ruleset.seed is not None else self.SEED)
+        return self.random_streams[ruleset]
+
+    def feedback(self, agent, penalty):
+        """Penalty of the last action of an agent, summed up for the rewards of training environments.
+        Transitions of the replay buffer take the penalty from the agent"""
+        self.penalty += penalty
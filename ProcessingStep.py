@@ -33,8 +33,9 @@ class ProcessingStep:
 
 
 def load_processing_steps():
-    """Load possible processing steps from json file and create an object for each"""
+    """Load possible processing steps from json file and create an object for each. Replaces loaded steps"""
     processing_steps = json.load(open("ProcessingSteps.json", encoding="UTF-8"))
+    ProcessingStep.instances.clear()
 
     # Hidden dummy processing step for finished orders
     ProcessingStep({"id": -1, "title": "Order finished", "base_duration": 0}, hidden=True)
@@ -12,27 +12,48 @@ WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
 See the License for the specific language governing permissions and
 limitations under the License."""
 
-import pandas as pd
+import numpy as np
+
+# Penalty criteria for forbidden choices: (column of the encoded state, forbidden value)
+PENALTY_CRITERIA = [
+    ("order", 0),
+    ("locked", 2),
+    ("picked_up", 1),
+    ("in_m_input", 1),
+    ("in_m", 1),
+    ("processing", 1),
+    ("in_same_cell", 0),
+    ("_destination", -1)
+]
+PENALTY = -1000
 
 
 def evaluate_choice(choice):
 
-    # Penalty criteria for forbidden choices
-    criteria = [
-        choice["order"] == 0,
-        choice["locked"] == 2,
-        choice["picked_up"] == 1,
-        choice["in_m_input"] == 1,
-        choice["in_m"] == 1,
-        choice["processing"] == 1,
-        choice["in_same_cell"] == 0,
-        choice["_destination"] == -1
-    ]
-
-    penalty = -1000 * sum(criteria)
+    penalty = PENALTY * sum(choice[column] == value for column, value in PENALTY_CRITERIA)
 
     return penalty
 
 
-def reward_action():
-    return 0
+def penalties(matrix: np.ndarray, column_index: dict):
+    """Penalty of each slot of an encoded state (rows of an ObservationEncoder matrix)"""
+    violations = np.zeros(len(matrix))
+    for column, value in PENALTY_CRITERIA:
+        violations += matrix[:, column_index[column]] == value
+    return PENALTY * violations
+
+
+def action_mask(matrix: np.ndarray, column_index: dict, out=None):
+    """True for each slot which can be chosen without penalty. The last action (take no action) is always allowed"""
+    if out is None:
+        out = np.empty(len(matrix) + 1, dtype=bool)
+    out[:-1] = True
+    for column, value in PENALTY_CRITERIA:
+        out[:-1] &= matrix[:, column_index[column]] != value
+    out[-1] = True
+    return out
+
+
+def reward_action(penalty=0, finished_orders=0):
+    """Reward between two decisions: Penalties of forbidden choices and the orders finished in between"""
+    return penalty + finished_orders
@@ -14,7 +14,10 @@ limitations under the License."""
 
 # -*- coding: utf-8 -*-
 import json
+import os
 import pickle
+import numpy as np
+from PolicyService import RandomPolicy
 
 
 class RuleSet:
@@ -38,17 +41,63 @@ class RuleSet:
         except:
             self.numerical_criteria = []
             pass
+        self.scoring = Scoring(self.numerical_criteria)
 
         try:
             self.dynamic = rules['rules']['dynamic']
-            #self.model = pickle.loads(rules['rules']['trained_model'])
         except:
             self.dynamic = False
-            #self.model = None
+
+        if self.dynamic:
+            self.policy = load_policy(rules['rules'].get('trained_model'), self.seed)
+        else:
+            self.policy = None
+
+
+class Scoring:
+    """Numerical criteria of a ruleset compiled into a weighted min max scoring. The lowest score is ranked first"""
+
+    def __init__(self, numerical_criteria: list):
+        for criterion in numerical_criteria:
+            if criterion["ranking_order"] not in ["ASC", "DESC"]:
+                raise Exception("Ranking order of a ruleset criterion has to be ASC or DESC!", criterion)
+
+        self.MEASURES = [criterion["measure"] for criterion in numerical_criteria]  # Column order of the value matrix
+        self.WEIGHTS = np.array([criterion["weight"] for criterion in numerical_criteria], dtype=float)
+        self.DESCENDING = np.array([criterion["ranking_order"] == "DESC" for criterion in numerical_criteria], dtype=bool)
+
+    @property
+    def required_attributes(self):
+        """Order attributes needed to rank orders by this ruleset"""
+        return self.MEASURES
+
+    def score(self, values: np.ndarray):
+        """Scores for a matrix with one row per order and one column per measure"""
+        min_v = values.min(axis=0)
+        value_range = values.max(axis=0) - min_v
+        normalized = np.divide(values - min_v, value_range, out=np.zeros(values.shape), where=value_range != 0)
+        normalized = np.where(self.DESCENDING, 1 - normalized, normalized)
+        return (normalized * self.WEIGHTS).sum(axis=1)
+
+    def best(self, values: np.ndarray):
+        """Row index of the order with the lowest score"""
+        return int(np.argmin(self.score(values)))
+
+
+def load_policy(model_file, seed=None):
+    """Load the pickled policy of a dynamic ruleset. It has to provide predict(states, action_mask) like RandomPolicy.
+    Without a trained model the agents choose random actions"""
+    if model_file and os.path.exists(model_file):
+        with open(model_file, "rb") as f:
+            return pickle.load(f)
+    if model_file:
+        print("Warning: Trained model", model_file, "not found! Dynamic ruleset uses random actions.")
+    return RandomPolicy(seed)
 
 
 def load_rulesets():
     """Load possible rulesets from json file and create an object for each"""
     rulesets_config = json.load(open("rulesets.json", encoding='utf-8'))
+    RuleSet.instances.clear()
     for rule in rulesets_config['rulesets']:
         RuleSet(rule)
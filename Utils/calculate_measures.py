@@ -17,6 +17,7 @@ import pandas as pd
 import numpy as np
 from Order import Order, OrderType
 from Utils.devisions import div_possible_zero
+from Utils.event_codes import EVENT_CODES, EVENT_TYPES, POSITION_TYPES
 
 
 def machine_measures(sim_env, obj, measures=[]):
@@ -92,9 +93,9 @@ def machine_measures(sim_env, obj, measures=[]):
             ends = event_times_single_object("machine", obj, "failure_end", db_con)
             df = pd.merge(starts, ends, left_index=True, right_index=True)
             df["time_to_repair"] = df["time_y"] - df["time_x"]
-            return df["time_to_repair"].mean().item()
-        else:
-            return None
+            if not df.empty:
+                return df["time_to_repair"].mean().item()
+        return None
 
     def availability():
         return ((simulation_length - time_to_repair())/simulation_length) * 100
@@ -133,23 +134,35 @@ def order_measures(sim_env, obj, measures=[]):
         return boolean_times_single_object("item", obj, "transportation", db_con).item()
 
     def average_transportation_time():
-        return transportation_time()/event_counts[(event_counts["event"] == "transportation_start")]["#events"].values[0].item()
+        transports = event_counts[(event_counts["event"] == "transportation_start")]["#events"]
+        if not transports.empty:
+            return transportation_time()/transports.values[0].item()
+        else:
+            return None
 
     def time_at_pos():
         return time_by_dimension("item", obj, "position", db_con)
 
     def time_at_pos_type():
-        return time_by_dimension("item", obj, "position_type", db_con)
+        df = time_by_dimension("item", obj, "position_type", db_con)
+        df["position_type"] = decode(df["position_type"], POSITION_TYPES)
+        return df
 
     def time_at_machines():
         df = time_at_pos_type()
         result = df[df["position_type"] == "Machine"]
-        return result["length"].iloc[0].item()
+        if not result.empty:
+            return result["length"].iloc[0].item()
+        else:
+            return 0
 
     def time_in_interface_buffer():
         df = time_at_pos_type()
         result = df[df["position_type"] == "InterfaceBuffer"]
-        return result["length"].iloc[0].item()
+        if not result.empty:
+            return result["length"].iloc[0].item()
+        else:
+            return 0
 
     def time_in_queue_buffer():
         df = time_at_pos_type()
@@ -173,7 +186,7 @@ def order_measures(sim_env, obj, measures=[]):
         return time_by_dimension("item", obj, "cell", db_con)
 
     def different_cells_run_through():
-        df = pd.read_sql_query("SELECT COUNT(DISTINCT cell) as 'amount' FROM item_events WHERE item={object}".format(object=id(obj)), db_con)
+        df = pd.read_sql_query("SELECT COUNT(DISTINCT cell) as 'amount' FROM item_events WHERE item={object}".format(object=obj.LOG_ID), db_con)
         return df["amount"].iloc[0].item()
 
     for measure in measures:
@@ -193,7 +206,7 @@ def agent_measures(sim_env, obj, measures=[]):
 
     def transportation_time():
         df = pd.read_sql_query(
-            "SELECT time, moving, picked_up_item FROM agent_events WHERE agent={object} and picked_up_item NOT NULL".format(object=id(obj)), db_con)
+            "SELECT time, moving, picked_up_item FROM agent_events WHERE agent={object} and picked_up_item NOT NULL".format(object=obj.LOG_ID), db_con)
         df = remove_events_without_changes(df, "moving")
         df["length"] = df["time"].shift(periods=-1, axis=0) - df["time"]
         result = df.groupby(["moving"], as_index=False)["length"].sum()
@@ -258,6 +271,27 @@ def buffer_measures(sim_env, obj, measures=[]):
         df = time_by_dimension("buffer", obj, "event_item", db_con)
         return df["length"].mean()
 
+    def backlog_waiting_times():
+        # Orders still waiting at the end of the simulation are included with their waiting time so far
+        return obj.backlog_waiting_times + [sim_env.env.now - arrival_time for arrival_time, sequence, order in
+                                            obj.items_waiting]
+
+    def mean_backlog_length():
+        return obj.backlog_integral()/simulation_length
+
+    def max_backlog_length():
+        return obj.max_backlog
+
+    def mean_backlog_waiting_time():
+        waiting_times = backlog_waiting_times()
+        if waiting_times:
+            return statistics.mean(waiting_times)
+        else:
+            return 0
+
+    def max_backlog_waiting_time():
+        return max(backlog_waiting_times(), default=0)
+
     for measure in measures:
         result[measure] = locals()[measure]()
 
@@ -267,7 +301,7 @@ def buffer_measures(sim_env, obj, measures=[]):
 def cell_measures(sim_env, obj, measures=[]):
     db_con = sim_env.db_con
     simulation_length = sim_env.SIMULATION_TIME_RANGE
-    orders = pd.read_sql_query("SELECT DISTINCT item as item FROM item_events WHERE cell={}".format(id(obj)), db_con)["item"]
+    orders = pd.read_sql_query("SELECT DISTINCT item as item FROM item_events WHERE cell={}".format(obj.LOG_ID), db_con)["item"]
     result = {}
 
     def mean_time_in_cell():
@@ -275,7 +309,7 @@ def cell_measures(sim_env, obj, measures=[]):
 
         for order_id in orders:
             df = time_by_dimension("item", order_id, "cell", db_con, object_as_id=True)
-            results.append(df[df["cell"] == id(obj)]["length"].iloc[0])
+            results.append(df[df["cell"] == obj.LOG_ID]["length"].iloc[0])
 
         if len(results) == 0:
             return 0
@@ -371,13 +405,13 @@ def simulation_measures(sim_env, measures=[]):
 
 def boolean_times_single_object(focus: str, object, measure: str, db_con, periods=1):
     """Calculate the absolute amount of time per boolean value in event_log for a specific object"""
-    df = pd.read_sql_query("SELECT time, {measure} FROM {focus}_events WHERE {focus}={object}".format(measure=measure, focus=focus, object=id(object)), db_con)
+    df = pd.read_sql_query("SELECT time, {measure} FROM {focus}_events WHERE {focus}={object}".format(measure=measure, focus=focus, object=object.LOG_ID), db_con)
     df = remove_events_without_changes(df, measure)
     if periods == 1:
         df["length"] = df["time"].shift(periods=-1, axis=0) - df["time"]
         result = df.groupby([measure], as_index=False)["length"].sum()
         if result[result[measure] == 1].empty:
-            result = 0
+            result = np.float64(0)
         else:
             result = result[result[measure] == 1]["length"].values[0]
     else:
@@ -392,7 +426,7 @@ def time_by_dimension(focus: str, object, dimension: str, db_con, object_as_id=F
     if object_as_id:
         object_id = object
     else:
-        object_id = id(object)
+        object_id = object.LOG_ID
 
     df = pd.read_sql_query(
         "SELECT time, {dimension} FROM {focus}_events WHERE {focus}={object}".format(dimension=dimension, focus=focus,
@@ -407,21 +441,22 @@ def event_count_single_object(focus: str, object, db_con, periods=1):
     if periods == 1:
         result = pd.read_sql_query(
             "SELECT event, COUNT(time) as '#events' FROM {focus}_events WHERE {focus}={object} GROUP BY event".format(focus=focus,
-                                                                                                object=id(object)), db_con)
+                                                                                                object=object.LOG_ID), db_con)
     else:
         df = pd.read_sql_query(
-            "SELECT time, event FROM {focus}_events WHERE {focus}={object}".format(focus=focus, object=id(object)), db_con)
+            "SELECT time, event FROM {focus}_events WHERE {focus}={object}".format(focus=focus, object=object.LOG_ID), db_con)
         df = add_time_periods(df, periods=periods)
         del df["time"]
         result = df.groupby(["time_bin", "event"], as_index=False).size()
         result.rename(columns={'size': '#events'}, inplace=True)
+    result["event"] = decode(result["event"], EVENT_TYPES)
     return result
 
 
 def event_times_single_object(focus: str, object, event: str, db_con, periods=1):
     if periods == 1:
         result = pd.read_sql_query(
-            "SELECT time FROM {focus}_events WHERE {focus}={object} AND event='{event}'".format(focus=focus, object=id(object), event=event), db_con)
+            "SELECT time FROM {focus}_events WHERE {focus}={object} AND event={event}".format(focus=focus, object=object.LOG_ID, event=EVENT_CODES[event]), db_con)
         return result
 
 
@@ -436,19 +471,29 @@ def event_count_all_objects(focus: str, db_con, periods=1):
         del df["time"]
         result = df.groupby(["time_bin", "event"], as_index=False).size()
         result.rename(columns={'size': '#events'}, inplace=True)
+    result["event"] = decode(result["event"], EVENT_TYPES)
     return result
 
 
+def decode(codes: pd.Series, names: list):
+    """Names of the codes of an event or position type column"""
+    return codes.map(dict(enumerate(names)))
+
+
 def add_time_periods(df, periods: int):
     start = df["time"].min()
     end = df["time"].max()
     period_length = (end - start)/periods
     timestamps = [start + i * period_length for i in range(1, periods)]
-    concat_data = pd.DataFrame({"time": timestamps, "marker": [True for i in range(1, periods)]})
-    df = pd.concat([df, concat_data], ignore_index=True).sort_values("time", axis=0).reset_index(drop=True)
-    for column in df.columns:
-        if column != "time" and column != "marker":
-            df[column] = np.where(df["marker"] == True, df[column].shift(periods=1, axis=0), df[column])
+    concat_data = pd.DataFrame({"time": timestamps, "marker": True})
+    df = pd.concat([df.assign(marker=False), concat_data], ignore_index=True)
+    df = df.sort_values("time", axis=0, kind="mergesort").reset_index(drop=True)
+
+    # Marker rows take the values of the last event before them
+    marker = df["marker"].to_numpy()
+    source = np.maximum.accumulate(np.where(marker, 0, np.arange(len(df))))
+    columns = [column for column in df.columns if column != "time" and column != "marker"]
+    df[columns] = df[columns].iloc[source].reset_index(drop=True)
 
     del df["marker"]
     timestamps = timestamps + [start, end]
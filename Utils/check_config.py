@@ -95,6 +95,59 @@ def check_configuration_file(config: dict):
             "minimum": 0.001,
             "lower_than": "SIMULATION_RANGE"
         },
+        "INSTRUMENTATION": {
+            "data_type": bool
+        },
+        "MEMORY_REPORT": {
+            "data_type": bool
+        },
+        "MEMORY_BUDGET_ACTION": {
+            "data_type": str,
+            "options": ["warn", "abort"]
+        },
+        "REPLAY_BUFFER": {
+            "data_type": str
+        },
+        "REPLAY_BUFFER_CAPACITY": {
+            "data_type": int,
+            "minimum": 1
+        },
+        "REPLAY_OBSERVATION_SIZE": {
+            "data_type": int,
+            "minimum": 1
+        },
+        "RESULT_CACHE": {
+            "data_type": bool
+        },
+        "RESULT_CACHE_SIZE": {
+            "data_type": float,
+            "minimum": 0
+        },
+        "EVENT_LOG_FORMAT": {
+            "data_type": str,
+            "options": ["xlsx", "parquet", "arrow"]
+        },
+        "TIME_SERIES_BIN_WIDTH": {
+            "data_type": float,
+            "minimum": 0,
+            "lower_than": "SIMULATION_RANGE"
+        },
+        "MODEL_OBJECTS": {
+            "data_type": float,
+            "minimum": 0
+        },
+        "EVENT_TABLES": {
+            "data_type": float,
+            "minimum": 0
+        },
+        "RESULTS": {
+            "data_type": float,
+            "minimum": 0
+        },
+        "CACHES": {
+            "data_type": float,
+            "minimum": 0
+        },
         "BASE_HEIGHT": {
             "data_type": float,
             "minimum": 0.001,
@@ -147,11 +200,15 @@ def check_configuration_file(config: dict):
     def greater_than(value, limit_v):
         return value > config[limit_v]
 
+    def options(value, limit_v):
+        return value in limit_v
+
     functionList = {'data_type': data_type,
                     "minimum": minimum,
                     "maximum": maximum,
                     "lower_than": lower_than,
-                    "greater_than": greater_than}
+                    "greater_than": greater_than,
+                    "options": options}
 
     def check_config_values(con: dict):
         for key, value in con.items():
@@ -13,16 +13,18 @@ See the License for the specific language governing permissions and
 limitations under the License."""
 
 def class_to_dict(cls):
+    attributes = get_attributes(cls)
+
     discrete_att = dict(
         (key, value)
-        for (key, value) in cls.__dict__.items()
+        for (key, value) in attributes.items()
         if key not in cls._excluded_keys
         and key not in cls._continuous_attributes
     )
 
     continuous_att = dict(
         (key, get_continuous_att(cls, key))
-        for (key, value) in cls.__dict__.items()
+        for (key, value) in attributes.items()
         if key not in cls._excluded_keys
         and key in cls._continuous_attributes
     )
@@ -33,6 +35,13 @@ def class_to_dict(cls):
         return discrete_att
 
 
+def get_attributes(obj):
+    """Attributes of objects with __dict__ or __slots__ (e.g. Order)"""
+    if hasattr(obj, "__dict__"):
+        return obj.__dict__
+    return dict((key, getattr(obj, key)) for key in obj.__slots__ if hasattr(obj, key))
+
+
 def get_continuous_att(obj, attribute: str):
     result = getattr(obj, attribute)
     end_attr = getattr(obj, end_times[attribute])
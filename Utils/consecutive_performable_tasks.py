@@ -13,13 +13,13 @@ See the License for the specific language governing permissions and
 limitations under the License."""
 
 
-def consecutive_performable_tasks(next_tasks, performable_tasks):
+def consecutive_performable_tasks(work_schedule, performable_tasks, start=0):
+    """Amount of tasks of the work schedule, beginning at position start,
+    that can be performed one after another with the given performable tasks"""
 
     performable_tasks = [task for (task, amount) in performable_tasks if amount > 0]
 
-    next_tasks = [task in performable_tasks for task in next_tasks]
-
-    if False in next_tasks:
-        return next_tasks.index(False)
-    else:
-        return len(next_tasks)
+    for position in range(start, len(work_schedule)):
+        if work_schedule[position] not in performable_tasks:
+            return position - start
+    return len(work_schedule) - start
@@ -16,8 +16,16 @@ import sqlite3
 import os
 import time
 import shutil
+import importlib.util
 import pandas as pd
 import Cell, Order
+from Utils.event_codes import create_dictionary_tables, EVENT_TYPES, POSITION_TYPES
+from Utils.save_results import results_table
+
+EXCEL_MAX_ROWS = 1048575  # Rows of an xlsx sheet without the header
+COLUMNAR_BATCH_SIZE = 65536  # Rows per record batch of the parquet and arrow files
+DICTIONARY_COLUMNS = {"event": EVENT_TYPES, "position_type": POSITION_TYPES}  # Coded columns of the event tables
+ARROW_TYPES = {"INTEGER": "int64", "FLOAT": "double", "TEXT": "string"}  # Arrow types of the SQLite columns
 
 
 def set_up_db(sim_env):
@@ -35,7 +43,7 @@ def set_up_db(sim_env):
     db_cu.execute("""CREATE TABLE machine_events (
                     machine INTEGER NOT NULL,
                     time FLOAT NOT NULL,
-                    event TEXT NOT NULL,
+                    event INTEGER NOT NULL,
                     est_time FLOAT,
                     next_setup_type INTEGER,
                     current_setup_type INTEGER,
@@ -52,7 +60,7 @@ def set_up_db(sim_env):
     db_cu.execute("""CREATE TABLE agent_events (
                     agent INTEGER NOT NULL,
                     time FLOAT NOT NULL,
-                    event TEXT NOT NULL,
+                    event INTEGER NOT NULL,
                     next_position INTEGER,
                     travel_time FLOAT,
                     moving INTEGER NOT NULL CHECK(moving IN (0,1)),
@@ -66,7 +74,7 @@ def set_up_db(sim_env):
     db_cu.execute("""CREATE TABLE item_events (
                             item INTEGER NOT NULL,
                             time FLOAT NOT NULL,
-                            event TEXT NOT NULL,
+                            event INTEGER NOT NULL,
                             started INTEGER NOT NULL CHECK(started IN (0,1)),
                             over_due INTEGER NOT NULL CHECK(over_due IN (0,1)),
                             blocked INTEGER NOT NULL CHECK(blocked IN (0,1)),
@@ -79,7 +87,7 @@ def set_up_db(sim_env):
                             tasks_remaining INTEGER,
                             cell INTEGER,
                             position INTEGER,
-                            position_type TEXT,
+                            position_type INTEGER,
                             picked_up_by INTEGER,
                             locked_by INTEGER
                             )""")
@@ -87,7 +95,7 @@ def set_up_db(sim_env):
     db_cu.execute("""CREATE TABLE buffer_events (
                             buffer INTEGER NOT NULL,
                             time FLOAT NOT NULL,
-                            event TEXT NOT NULL,
+                            event INTEGER NOT NULL,
                             event_item INTEGER,
                             full INTEGER NOT NULL CHECK(full IN (0,1)),
                             items_in_storage INTEGER
@@ -101,10 +109,21 @@ def set_up_db(sim_env):
                             normal_tasks_started INTEGER
                             )""")
 
+    create_dictionary_tables(db_cu)
+
     db_con.commit()
     return db_con, db_cu
 
 
+def save_event_log(sim_env, run, file_format="xlsx", time_series=None):
+    """Save the tables of the event log in data/sim_run_<run>. xlsx is meant for small runs, parquet and arrow
+    (Arrow IPC) write compressed columnar files with the run number and the results of the run"""
+    if file_format == "xlsx":
+        save_as_excel(sim_env, run)
+    else:
+        save_as_columnar(sim_env, run, file_format, time_series)
+
+
 def save_as_excel(sim_env, run):
     print("\nSave database tables as xlsx-files for further exploration")
     start_time = time.time()
@@ -116,7 +135,84 @@ def save_as_excel(sim_env, run):
         os.makedirs(directory)
 
     for table in data:
-        pd.read_sql_query("SELECT * from {table}".format(table=table[0]), sim_env.db_con).to_excel("{directory}/{table}.xlsx".format(directory=directory, table=table[0]))
+        df = pd.read_sql_query("SELECT * from {table}".format(table=table[0]), sim_env.db_con)
+        if len(df) > EXCEL_MAX_ROWS:
+            print("Warning: Table %s has %d rows, only the first %d fit into an xlsx-file! "
+                  "Use EVENT_LOG_FORMAT parquet or arrow for large runs." % (table[0], len(df), EXCEL_MAX_ROWS))
+            df = df.iloc[:EXCEL_MAX_ROWS]
+        df.to_excel("{directory}/{table}.xlsx".format(directory=directory, table=table[0]))
+    print("Saving finished in %d seconds!" % (time.time() - start_time))
+
+
+def columnar_available():
+    """Parquet and arrow files need the optional dependency pyarrow"""
+    return importlib.util.find_spec("pyarrow") is not None
+
+
+def save_as_columnar(sim_env, run, file_format, time_series=None):
+    """Stream each table of the event log into a parquet or arrow file with a run column.
+    Event and position types are stored as dictionary columns with their names"""
+    try:
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+    except ImportError:
+        raise Exception("Saving the event log as %s requires pyarrow! Install it or use EVENT_LOG_FORMAT xlsx." % file_format)
+
+    print("\nSave database tables as %s-files for further exploration" % file_format)
+    start_time = time.time()
+    directory = "data/{}".format("sim_run_"+str(run))
+    os.makedirs(directory, exist_ok=True)
+    metadata = {"run": str(run), "seed_incoming_orders": str(sim_env.SEED_INCOMING_ORDERS),
+                "seed_machine_interruptions": str(sim_env.SEED_MACHINE_INTERRUPTIONS)}
+    dictionaries = {column: pa.array(names) for column, names in DICTIONARY_COLUMNS.items()}
+
+    def open_writer(name, schema):
+        path = "{directory}/{name}.{extension}".format(directory=directory, name=name,
+                                                      extension="parquet" if file_format == "parquet" else "arrow")
+        if file_format == "parquet":
+            return pq.ParquetWriter(path, schema, compression="zstd")
+        return pa.ipc.new_file(path, schema, options=pa.ipc.IpcWriteOptions(compression="zstd"))
+
+    tables = [table for (table,) in sim_env.db_cu.execute("SELECT name FROM sqlite_master WHERE type='table'")]
+    for table in tables:
+        columns = [(name, sql_type) for _, name, sql_type, *_ in sim_env.db_cu.execute(
+            "PRAGMA table_info({table})".format(table=table)).fetchall()]
+        fields = [pa.field("run", pa.int32())]
+        for name, sql_type in columns:
+            if name in dictionaries and table.endswith("_events"):
+                fields.append(pa.field(name, pa.dictionary(pa.int8(), pa.string())))
+            else:
+                fields.append(pa.field(name, pa.type_for_alias(ARROW_TYPES[sql_type.upper()])))
+        schema = pa.schema(fields, metadata=metadata)
+
+        cursor = sim_env.db_con.execute("SELECT * FROM {table}".format(table=table))
+        with open_writer(table, schema) as writer:
+            rows = cursor.fetchmany(COLUMNAR_BATCH_SIZE)
+            while rows:
+                values = list(zip(*rows))
+                arrays = [pa.array([run] * len(rows), pa.int32())]
+                for field, column in zip(fields[1:], values):
+                    if pa.types.is_dictionary(field.type):
+                        arrays.append(pa.DictionaryArray.from_arrays(pa.array(column, pa.int8()),
+                                                                     dictionaries[field.name]))
+                    else:
+                        arrays.append(pa.array(column, field.type))
+                writer.write_batch(pa.RecordBatch.from_arrays(arrays, schema=schema))
+                rows = cursor.fetchmany(COLUMNAR_BATCH_SIZE)
+
+    # Results and KPI time series of the run, text columns as dictionaries
+    frames = {"results": results_table(sim_env)}
+    if time_series is not None:
+        frames["time_series"] = time_series
+    for name, frame in frames.items():
+        frame = frame.copy()
+        frame.insert(0, "run", run)
+        frame = frame.astype({column: "category" for column in frame.columns if frame[column].dtype == object})
+        table = pa.Table.from_pandas(frame, preserve_index=False)
+        table = table.replace_schema_metadata({**(table.schema.metadata or {}), **metadata})
+        with open_writer(name, table.schema) as writer:
+            writer.write_table(table)
+
     print("Saving finished in %d seconds!" % (time.time() - start_time))
 
 
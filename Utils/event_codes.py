@@ -0,0 +1,76 @@
+"""Copyright 2022 Jannis Müller/ janmueller@uni-potsdam.de
+
+Licensed under the Apache License, Version 2.0 (the "License");
+you may not use this file except in compliance with the License.
+You may obtain a copy of the License at
+
+    http://www.apache.org/licenses/LICENSE-2.0
+
+Unless required by applicable law or agreed to in writing, software
+distributed under the License is distributed on an "AS IS" BASIS,
+WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+See the License for the specific language governing permissions and
+limitations under the License."""
+
+
+
+# Codes of the event and position type columns in the event tables. The index is the code, new entries are appended
+EVENT_TYPES = ["Initial", "End_of_Time",
+               # Orders
+               "order_arrival", "incoming_order", "cell_change", "over_due", "locked", "unlocked", "picked_up",
+               "put_down", "transportation_start", "transportation_end", "processing_start", "processing_continue",
+               "processing_finished", "wait_for_processing_start", "wait_for_processing_end",
+               "wait_for_slot_start", "wait_for_slot_end",
+               # Agents
+               "start_task", "end_of_main_process", "moving_start", "moving_end", "pick_up_start", "pick_up_end",
+               "store_item_start", "store_item_end",
+               # Buffers
+               "item_picked_up", "item_stored",
+               # Machines
+               "load_item_start", "load_item_end", "setup_start", "setup_end", "production_start", "production_end",
+               "release_item_start", "release_item_end", "failure_start", "failure_end", "machine_failure"]
+EVENT_CODES = {name: code for code, name in enumerate(EVENT_TYPES)}
+
+POSITION_TYPES = ["Machine", "InterfaceBuffer", "QueueBuffer"]
+POSITION_CODES = {name: code for code, name in enumerate(POSITION_TYPES)}
+
+
+def create_dictionary_tables(db_cu):
+    """Tables to decode the codes and object ids of the event tables"""
+    db_cu.execute("""CREATE TABLE event_types (
+                            code INTEGER PRIMARY KEY,
+                            name TEXT NOT NULL
+                            )""")
+    db_cu.execute("""CREATE TABLE position_types (
+                            code INTEGER PRIMARY KEY,
+                            name TEXT NOT NULL
+                            )""")
+    db_cu.execute("""CREATE TABLE objects (
+                            object INTEGER PRIMARY KEY,
+                            type TEXT NOT NULL,
+                            cell INTEGER
+                            )""")
+    db_cu.executemany("INSERT INTO event_types VALUES(?,?)", enumerate(EVENT_TYPES))
+    db_cu.executemany("INSERT INTO position_types VALUES(?,?)", enumerate(POSITION_TYPES))
+
+
+class ObjectRegistry:
+    """Run-local ids of all logged objects. Ids are dense integers in order of registration, so the objects
+    of a setup get the same ids in every run. The ids are stored as LOG_ID of the objects"""
+
+    def __init__(self, db_cu):
+        self.db_cu = db_cu
+        self.next_id = 1
+
+    def register(self, obj, cell_id=None):
+        """Give an object the next id, if it has none yet. cell_id is the setup index of the objects cell"""
+        if obj.LOG_ID is None:
+            obj.LOG_ID = self.next_id
+            self.db_cu.execute("INSERT INTO objects VALUES(?,?,?)", (self.next_id, type(obj).__name__, cell_id))
+            self.next_id += 1
+        return obj.LOG_ID
+
+
+def log_id(obj):
+    """Id of an object in the event tables, None for no object"""
+    return obj.LOG_ID if obj else None
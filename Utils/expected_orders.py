@@ -0,0 +1,72 @@
+"""Copyright 2022 Jannis Müller/ janmueller@uni-potsdam.de
+
+Licensed under the Apache License, Version 2.0 (the "License");
+you may not use this file except in compliance with the License.
+You may obtain a copy of the License at
+
+    http://www.apache.org/licenses/LICENSE-2.0
+
+Unless required by applicable law or agreed to in writing, software
+distributed under the License is distributed on an "AS IS" BASIS,
+WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+See the License for the specific language governing permissions and
+limitations under the License."""
+
+import heapq
+
+
+class ExpectedOrders:
+    """Orders announced to arrive at a buffer, machine or cell. Keyed by order with a min-heap on the expected
+    arrival time. Heap entries of canceled or completed orders are removed lazily."""
+
+    def __init__(self):
+        self.entries = {}  # Order -> (time, sequence, agent, position)
+        self.heap = []  # (time, sequence, order)
+        self.sequence = 0  # Tie breaker for equal arrival times and marker of the valid heap entry of an order
+
+    def __len__(self):
+        return len(self.entries)
+
+    def __contains__(self, order):
+        return order in self.entries
+
+    def __iter__(self):
+        """Iterate over (order, time, agent, position) in order of announcement"""
+        for order, (time, sequence, agent, position) in self.entries.items():
+            yield order, time, agent, position
+
+    def announce(self, order, time, agent, position=None):
+        self.entries[order] = (time, self.sequence, agent, position)
+        heapq.heappush(self.heap, (time, self.sequence, order))
+        self.sequence += 1
+
+    def cancel(self, order):
+        """Remove the order if it is announced. Returns the removed entry or None"""
+        entry = self.entries.pop(order, None)
+        if entry:
+            self.compact()
+        return entry
+
+    def complete(self, order):
+        """Remove an order that arrived. The order has to be announced before"""
+        if order not in self.entries:
+            raise Exception("Order arrived without being announced!", order)
+        entry = self.entries.pop(order)
+        self.compact()
+        return entry
+
+    def earliest(self):
+        """Order with the earliest expected arrival time or None"""
+        while self.heap:
+            time, sequence, order = self.heap[0]
+            entry = self.entries.get(order)
+            if entry and entry[1] == sequence:
+                return order
+            heapq.heappop(self.heap)
+        return None
+
+    def compact(self):
+        """Rebuild the heap once most of its entries are outdated"""
+        if len(self.heap) > 2 * len(self.entries) + 16:
+            self.heap = [(time, sequence, order) for order, (time, sequence, agent, position) in self.entries.items()]
+            heapq.heapify(self.heap)
@@ -15,15 +15,17 @@ limitations under the License."""
 # -*- coding: utf-8 -*-
 import numpy as np
 import Cell
+from ObservationEncoder import ObservationEncoder
 from Order import ProcessingStep
 import simpy
 import os
 from Ruleset import RuleSet
 from Utils.text_input import _input, yes_no_question
+from Utils.setup_loader import load_setup
+from Utils.plant_template import PlantTemplate
 import threading
 import pandas as pd
 from copy import copy
-import ast
 
 
 def new_cell_setup():
@@ -302,9 +304,7 @@ def load_setup_process():
                 for file in (f for f in os.listdir(myPath) if f.endswith('.txt')):
                     print(file.replace(".txt", ""))
                 name = _input("\nWhich setup do you want to load?\n") + '.txt'
-                with open('./setups/' + name) as infile:
-                    configuration = pd.read_csv(infile, sep=";", converters={'COLUMN_NAME': pd.eval})
-                return configuration
+                return load_setup('./setups/' + name)
             except:
                 print("\nAn Error occured: Unable to load the configuration. Please try again!")
                 pass
@@ -319,91 +319,33 @@ def load_setup_from_config(config):
         setup = load_setup_process()
         return setup
     print("Loading setup file from configuration file...")
-    with open('./setups/' + file_name) as infile:
-        setup = pd.read_csv(infile, sep=";", converters={'COLUMN_NAME': pd.eval})
-    return setup
+    return load_setup('./setups/' + file_name)
 
 
 def generator_from_setup(setup, config, env: simpy.Environment):
-    """Create instances of setup as json and build first connections between the objects"""
-    setup["agent_obj"] = None
-    setup["machine_obj"] = None
-
-    for index, column in setup.iterrows():
-        # Create objects in cells
-        setup.loc[index, "storage_obj"] = Cell.QueueBuffer(config, env, column["StorageCap"])
-        setup.loc[index, "input_obj"] = Cell.InterfaceBuffer(config, env, column["InputCap"])
-        setup.loc[index, "output_obj"] = Cell.InterfaceBuffer(config, env, column["OutputCap"])
-
-        if isinstance(column["Agents"], list):
-            agents = [Cell.ManufacturingAgent(config, env, setup.loc[index, "input_obj"],
-                                              int(ruleset_id)) for ruleset_id in column["Agents"]]
-        else:
-            agents = [Cell.ManufacturingAgent(config, env, setup.loc[index, "input_obj"],
-                        int(ruleset_id)) for ruleset_id in ast.literal_eval(column["Agents"])]
-
-        setup.at[index, "agent_obj"] = agents
-
-        if isinstance(column["Machines"], list):
-            machines = [Cell.Machine.Machine(config, env, int(task_id))
-                        for task_id in column["Machines"]]
-        else:
-            machines = [Cell.Machine.Machine(config, env, int(task_id))
-                    for task_id in ast.literal_eval(column["Machines"])]
-
-        setup.at[index, "machine_obj"] = machines
-
-    for index, column in setup.iterrows():
-        # Create each cell
-        if column["Type"] == "Man":
-            # Manufacturing cell
-            setup.loc[index, "cell_obj"] = Cell.ManufacturingCell(column["machine_obj"], env, column["agent_obj"],
-                                                                  column["storage_obj"], column["input_obj"],
-                                                                  column["output_obj"], column["Level"], index,
-                                                                  column["Type"])
-
-        else:
-            # Distribution cell
-            childs = setup[setup["Parent"] == index]["cell_obj"].tolist()
-            setup.loc[index, "cell_obj"] = Cell.DistributionCell(childs, env, column["agent_obj"],
-                                                                  column["storage_obj"], column["input_obj"],
-                                                                  column["output_obj"], column["Level"], index,
-                                                                  column["Type"])
-
-        column["input_obj"].lower_cell = setup.loc[index, "cell_obj"]
-        column["output_obj"].lower_cell = setup.loc[index, "cell_obj"]
-
-    # Set parents in cells and interfaces upper cell
-    pd.set_option('display.max_columns', None)
-    pd.set_option('display.max_colwidth', None)
-    pd.set_option('expand_frame_repr', False)
-
+    """Create instances of setup as json and build first connections between the objects.
+    Returns a copy of setup with the created objects in the columns *_obj"""
+    cells = PlantTemplate(setup).build(config, env)
     setup = setup.fillna(value=np.nan)
-
-    for index, column in setup.iterrows():
-        parent_id = column["Parent"]
-
-        if not np.isnan(parent_id):
-            column["cell_obj"].PARENT = setup.loc[parent_id, "cell_obj"]
-            column["input_obj"].upper_cell = setup.loc[parent_id, "cell_obj"]
-            column["output_obj"].upper_cell = setup.loc[parent_id, "cell_obj"]
-
-    setup["cell_obj"].apply(finish_setup)
+    setup["storage_obj"] = [cell.STORAGE for cell in cells]
+    setup["input_obj"] = [cell.INPUT_BUFFER for cell in cells]
+    setup["output_obj"] = [cell.OUTPUT_BUFFER for cell in cells]
+    setup["agent_obj"] = [cell.AGENTS for cell in cells]
+    setup["machine_obj"] = [cell.MACHINES for cell in cells]
+    setup["cell_obj"] = cells
 
     return setup
 
 
-def finish_setup(cell):
-    """Set the tree level of each cell in the tree, init agents and performable tasks"""
-    cell.init_responsible_agents()
-    cell.init_performable_tasks()
-
-
 def set_env_in_cells(sim_env, cells):
-    for cell in cells.tolist():
+    for cell in cells:
 
         sim_env.cells.append(cell)
 
+        # Ids in the event tables in order of the setup
+        for obj in [cell, cell.INPUT_BUFFER, cell.OUTPUT_BUFFER, cell.STORAGE] + cell.MACHINES + cell.AGENTS:
+            sim_env.object_registry.register(obj, cell.ID)
+
         cell.SIMULATION_ENVIRONMENT = sim_env
         cell.INPUT_BUFFER.SIMULATION_ENVIRONMENT = sim_env
         cell.OUTPUT_BUFFER.SIMULATION_ENVIRONMENT = sim_env
@@ -413,9 +355,13 @@ def set_env_in_cells(sim_env, cells):
         for agent in cell.AGENTS:
             agent.SIMULATION_ENVIRONMENT = sim_env
             agent.lock = lock
+            if agent.RULESET.dynamic:
+                agent.encoder = ObservationEncoder(agent)
         for machine in cell.MACHINES:
             machine.SIMULATION_ENVIRONMENT = sim_env
             machine.CELL = cell
+            # Failures of each machine only depend on the interruption seed and the position of the machine in the setup
+            machine.failure_random = np.random.default_rng([sim_env.SEED_MACHINE_INTERRUPTIONS, machine.LOG_ID])
         for interface in cell.INTERFACES_IN:
             interface.SIMULATION_ENVIRONMENT = sim_env
             interface.CELL = cell
@@ -0,0 +1,121 @@
+"""Copyright 2022 Jannis Müller/ janmueller@uni-potsdam.de
+
+Licensed under the Apache License, Version 2.0 (the "License");
+you may not use this file except in compliance with the License.
+You may obtain a copy of the License at
+
+    http://www.apache.org/licenses/LICENSE-2.0
+
+Unless required by applicable law or agreed to in writing, software
+distributed under the License is distributed on an "AS IS" BASIS,
+WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+See the License for the specific language governing permissions and
+limitations under the License."""
+
+import os
+import tracemalloc
+import Cell
+from Order import Order
+
+# Python allocations are attributed to a component by the file that allocated them.
+# Event tables live in SQLite and are measured by the size of the database pages instead.
+component_files = {
+    "model_objects": ["Order.py", "Cell.py", "Buffer.py", "Machine.py", "ManufacturingAgent.py", "ProcessingStep.py",
+                      "Ruleset.py", "init_simulation_env.py"],
+    "results": ["save_results.py", "calculate_measures.py", "environment.py"],
+    "caches": ["log.py", "class_to_dict.py"]
+}
+
+budget_keys = {"MODEL_OBJECTS": "model_objects", "EVENT_TABLES": "event_tables", "RESULTS": "results",
+               "CACHES": "caches"}
+
+
+def start(config: dict):
+    """Start tracing allocations for the next simulation run if the memory report is activated"""
+    if config.get("MEMORY_REPORT", False) and not tracemalloc.is_tracing():
+        tracemalloc.start()
+
+
+def stop():
+    if tracemalloc.is_tracing():
+        tracemalloc.stop()
+
+
+def traced_sizes():
+    """Size of the currently traced Python allocations in bytes per component"""
+    sizes = {"model_objects": 0, "results": 0, "caches": 0, "other": 0}
+    file_components = {file: component for component, files in component_files.items() for file in files}
+
+    for statistic in tracemalloc.take_snapshot().statistics("filename"):
+        file = os.path.basename(statistic.traceback[0].filename)
+        sizes[file_components.get(file, "other")] += statistic.size
+
+    return sizes
+
+
+def event_table_size(sim_env):
+    """Size of the event database in bytes and the amount of rows per table"""
+    cursor = sim_env.db_con.cursor()
+    page_count = cursor.execute("PRAGMA page_count").fetchone()[0]
+    page_size = cursor.execute("PRAGMA page_size").fetchone()[0]
+    tables = [table for (table,) in cursor.execute("SELECT name FROM sqlite_master WHERE type='table'").fetchall()]
+    rows = {table: cursor.execute("SELECT COUNT(*) FROM {table}".format(table=table)).fetchone()[0]
+            for table in tables}
+    cursor.close()
+    return page_count * page_size, rows
+
+
+def object_counts():
+    return {"orders": len(Order.instances),
+            "finished_orders": len(Order.finished_instances),
+            "cells": len(Cell.Cell.instances),
+            "buffers": len(Cell.Buffer.instances),
+            "machines": len(Cell.Machine.Machine.instances),
+            "agents": len(Cell.ManufacturingAgent.instances),
+            "agent_log_entries": sum(len(agent.logs) for agent in Cell.ManufacturingAgent.instances)}
+
+
+def report(sim_env):
+    """Memory used per component in MB together with the object counts of the current run.
+    Returns None if the memory report is not activated"""
+    if not tracemalloc.is_tracing():
+        return None
+
+    sizes = traced_sizes()
+    sizes["event_tables"], table_rows = event_table_size(sim_env)
+    current, peak = tracemalloc.get_traced_memory()
+
+    return {"components": {component: size / 1024 ** 2 for component, size in sorted(sizes.items())},
+            "traced_peak": peak / 1024 ** 2,
+            "objects": object_counts(),
+            "event_table_rows": table_rows}
+
+
+def check_budgets(sim_env, memory=None):
+    """Compare the memory of each component with the configured budget (MB, 0 means unlimited).
+    Depending on MEMORY_BUDGET_ACTION a warning is printed or the simulation is aborted"""
+    config = sim_env.CONFIG_FILE
+    budgets = {budget_keys[key]: limit for key, limit in config.get("MEMORY_BUDGETS", {}).items() if limit > 0}
+    if not budgets or not tracemalloc.is_tracing():
+        return
+
+    if memory is None:
+        memory = report(sim_env)
+
+    for component, limit in budgets.items():
+        used = memory["components"][component]
+        if used > limit:
+            message = "Memory budget of {component} exceeded at time {time}: {used:.1f} MB used, {limit} MB allowed" \
+                .format(component=component, time=sim_env.env.now, used=used, limit=limit)
+            if config.get("MEMORY_BUDGET_ACTION", "warn") == "abort":
+                raise MemoryError(message)
+            print("Warning:", message)
+
+
+def memory_watch(env, sim_env, checks=20):
+    """Check the memory budgets periodically while simulating"""
+    period_length = sim_env.SIMULATION_TIME_RANGE / checks
+
+    for check in range(checks):
+        yield env.timeout(period_length)
+        check_budgets(sim_env)
@@ -0,0 +1,103 @@
+"""Copyright 2022 Jannis Müller/ janmueller@uni-potsdam.de
+
+Licensed under the Apache License, Version 2.0 (the "License");
+you may not use this file except in compliance with the License.
+You may obtain a copy of the License at
+
+    http://www.apache.org/licenses/LICENSE-2.0
+
+Unless required by applicable law or agreed to in writing, software
+distributed under the License is distributed on an "AS IS" BASIS,
+WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+See the License for the specific language governing permissions and
+limitations under the License."""
+
+import Machine
+
+
+def start(order, requester, now):
+    return now - order.start
+
+
+def due_to(order, requester, now):
+    return now - order.due_to
+
+
+def complexity(order, requester, now):
+    return order.complexity
+
+
+def type(order, requester, now):
+    return order.type.type_id
+
+
+def time_in_cell(order, requester, now):
+    return now - order.in_cell_since
+
+
+def locked(order, requester, now):
+    if not order.locked_by:
+        return 0
+    elif order.locked_by == requester:
+        return 1
+    else:
+        return 2
+
+
+def picked_up(order, requester, now):
+    if not order.picked_up_by:
+        return 0
+    elif order.picked_up_by == requester:
+        return 1
+    else:
+        return 2
+
+
+def processing(order, requester, now):
+    return int(order.processing)
+
+
+def tasks_finished(order, requester, now):
+    return int(order.tasks_finished)
+
+
+def remaining_tasks(order, requester, now):
+    return order.remaining_task_count
+
+
+def next_task(order, requester, now):
+    return order.next_task.id
+
+
+def distance(order, requester, now):
+    if order.position:
+        return requester.time_for_distance(order.position)
+    else:
+        return -1
+
+
+def in_m(order, requester, now):
+    if isinstance(order.position, Machine.Machine) and order == order.position.item_in_machine:
+        return 1
+    else:
+        return 0
+
+
+def in_m_input(order, requester, now):
+    if isinstance(order.position, Machine.Machine) and order == order.position.item_in_input:
+        return 1
+    else:
+        return 0
+
+
+def in_same_cell(order, requester, now):
+    if order.current_cell == requester.CELL:
+        return 1
+    else:
+        return 0
+
+
+# Attribute name in state_attributes -> function(order, requester, now)
+order_attributes = {attribute.__name__: attribute for attribute in
+                    [start, due_to, complexity, type, time_in_cell, locked, picked_up, processing, tasks_finished,
+                     remaining_tasks, next_task, distance, in_m, in_m_input, in_same_cell]}
@@ -0,0 +1,155 @@
+"""Copyright 2022 Jannis Müller/ janmueller@uni-potsdam.de
+
+Licensed under the Apache License, Version 2.0 (the "License");
+you may not use this file except in compliance with the License.
+You may obtain a copy of the License at
+
+    http://www.apache.org/licenses/LICENSE-2.0
+
+Unless required by applicable law or agreed to in writing, software
+distributed under the License is distributed on an "AS IS" BASIS,
+WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+See the License for the specific language governing permissions and
+limitations under the License."""
+
+
+import ast
+import simpy
+import numpy as np
+import pandas as pd
+import Cell
+from ProcessingStep import ProcessingStep
+
+CELL_DISTANCE = 5  # Distance between two positions within a cell
+
+
+class PlantTemplate:
+    """Immutable description of a plant compiled once from a setup: topology, capacities, machine tasks,
+    agent rulesets, performable tasks and distance matrices. Tasks are stored by their ids. Each simulation run
+    only creates the objects of the plant with build, processing steps have to be loaded before.
+    ROUTES is the only mutable part: a cache of check_best_path per cell shared by all runs. Its results only
+    depend on the tree and the task ids of the orders"""
+
+    def __init__(self, setup: pd.DataFrame):
+        setup = setup.fillna(value=np.nan)
+        self.CELL_IDS = tuple(setup.index.tolist())
+        self.PARENTS = {cell_id: None if np.isnan(parent) else int(parent)
+                        for cell_id, parent in zip(self.CELL_IDS, setup["Parent"].tolist())}
+        self.CHILDS = {cell_id: [] for cell_id in self.CELL_IDS}
+        for cell_id, parent in self.PARENTS.items():
+            if parent is not None:
+                if parent not in self.CHILDS:
+                    raise Exception("Parent of cell " + str(cell_id) + " does not exist in setup!", parent)
+                self.CHILDS[parent].append(cell_id)
+        self.CHILDS = {cell_id: tuple(childs) for cell_id, childs in self.CHILDS.items()}
+        self.ORDER = tuple(topological_order(self.CELL_IDS, self.PARENTS, self.CHILDS))
+        self.MAIN_CELL = self.ORDER[-1]
+
+        self.TYPES = dict(zip(self.CELL_IDS, setup["Type"].tolist()))
+        self.LEVELS = dict(zip(self.CELL_IDS, setup["Level"].tolist()))
+        self.CAPACITIES = {cell_id: capacities for cell_id, capacities in
+                           zip(self.CELL_IDS, setup[["StorageCap", "InputCap", "OutputCap"]].itertuples(index=False))}
+        self.AGENTS = {cell_id: tuple(int(ruleset_id) for ruleset_id in as_list(agents))
+                       for cell_id, agents in zip(self.CELL_IDS, setup["Agents"].tolist())}
+        self.MACHINES = {cell_id: tuple(int(task_id) for task_id in as_list(machines))
+                         for cell_id, machines in zip(self.CELL_IDS, setup["Machines"].tolist())}
+
+        # Amount of machines per task id in each tree branch, counted bottom up
+        self.PERFORMABLE_TASKS = {}
+        for cell_id in self.ORDER:
+            cell_counts = {}
+            for task_id in self.MACHINES[cell_id] if self.TYPES[cell_id] == "Man" else ():
+                cell_counts[task_id] = cell_counts.get(task_id, 0) + 1
+            for child in self.CHILDS[cell_id]:
+                for task_id, amount in self.PERFORMABLE_TASKS[child].items():
+                    cell_counts[task_id] = cell_counts.get(task_id, 0) + amount
+            self.PERFORMABLE_TASKS[cell_id] = cell_counts
+
+        # Distances between the possible positions of a cell, shared by all cells with the same amount of positions
+        self.DISTANCE_MATRICES = {}
+        for cell_id in self.CELL_IDS:
+            positions = self.positions(cell_id)
+            if positions not in self.DISTANCE_MATRICES:
+                matrix = np.full((positions, positions), CELL_DISTANCE, dtype=float)
+                np.fill_diagonal(matrix, 0)
+                matrix.setflags(write=False)
+                self.DISTANCE_MATRICES[positions] = matrix
+
+        self.ROUTES = {cell_id: {} for cell_id in self.CELL_IDS}  # Route cache by task ids, filled during runs
+
+    def positions(self, cell_id):
+        """Amount of possible positions of agents within a cell"""
+        if self.TYPES[cell_id] == "Man":
+            return 3 + len(self.MACHINES[cell_id])
+        return 3 + 2 * len(self.CHILDS[cell_id])
+
+    def build(self, config: dict, env: simpy.Environment):
+        """Create the objects of one simulation run. Returns the cells in order of the setup"""
+        if not ProcessingStep.instances:
+            raise Exception("Processing steps have to be loaded before a plant is built!")
+
+        storages, inputs, outputs, agents, machines = {}, {}, {}, {}, {}
+        for cell_id in self.CELL_IDS:
+            # Create objects in cells in order of the setup. Buffers and agents start their processes on creation
+            storage_cap, input_cap, output_cap = self.CAPACITIES[cell_id]
+            storages[cell_id] = Cell.QueueBuffer(config, env, storage_cap)
+            inputs[cell_id] = Cell.InterfaceBuffer(config, env, input_cap)
+            outputs[cell_id] = Cell.InterfaceBuffer(config, env, output_cap)
+            agents[cell_id] = [Cell.ManufacturingAgent(config, env, inputs[cell_id], ruleset_id)
+                               for ruleset_id in self.AGENTS[cell_id]]
+            machines[cell_id] = [Cell.Machine.Machine(config, env, task_id) for task_id in self.MACHINES[cell_id]]
+
+        cells = {}
+        for cell_id in self.ORDER:
+            # Create each cell after all of its childs
+            if self.TYPES[cell_id] == "Man":
+                cell = Cell.ManufacturingCell(machines[cell_id], env, agents[cell_id], storages[cell_id],
+                                              inputs[cell_id], outputs[cell_id], self.LEVELS[cell_id], cell_id,
+                                              self.TYPES[cell_id])
+            else:
+                cell = Cell.DistributionCell([cells[child] for child in self.CHILDS[cell_id]], env, agents[cell_id],
+                                             storages[cell_id], inputs[cell_id], outputs[cell_id],
+                                             self.LEVELS[cell_id], cell_id, self.TYPES[cell_id])
+
+                # Set parent in childs and upper cell of their interfaces
+                for child in cell.CHILDS:
+                    child.PARENT = cell
+                    child.INPUT_BUFFER.upper_cell = cell
+                    child.OUTPUT_BUFFER.upper_cell = cell
+
+            cell.INPUT_BUFFER.lower_cell = cell
+            cell.OUTPUT_BUFFER.lower_cell = cell
+            cell.PERFORMABLE_TASKS = [(task, self.PERFORMABLE_TASKS[cell_id].get(task.id, 0))
+                                      for task in ProcessingStep.instances]
+            cell.DISTANCE_MATRIX = self.DISTANCE_MATRICES[len(cell.POSSIBLE_POSITIONS)]
+            cell.ROUTES = self.ROUTES[cell_id]
+            cells[cell_id] = cell
+
+        for cell_id in self.CELL_IDS:
+            cells[cell_id].init_responsible_agents()
+
+        return [cells[cell_id] for cell_id in self.CELL_IDS]
+
+
+def as_list(value):
+    """Agents and machines of a setup are stored as list or as string of a list"""
+    return value if isinstance(value, list) else ast.literal_eval(value)
+
+
+def topological_order(cell_ids, parents: dict, childs: dict):
+    """Order of cell ids with every child before its parent. Keeps the order of the setup if it is valid already"""
+    position = {cell_id: index for index, cell_id in enumerate(cell_ids)}
+    if all(parents[cell_id] is None or position[parents[cell_id]] > index for index, cell_id in enumerate(cell_ids)):
+        return list(cell_ids)
+
+    order = [cell_id for cell_id in cell_ids if not childs[cell_id]]
+    open_childs = {cell_id: len(childs[cell_id]) for cell_id in cell_ids}
+    for cell_id in order:
+        parent = parents[cell_id]
+        if parent is not None:
+            open_childs[parent] -= 1
+            if open_childs[parent] == 0:
+                order.append(parent)
+    if len(order) != len(cell_ids):
+        raise Exception("The cells of the setup do not form a tree!")
+    return order
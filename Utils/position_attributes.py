@@ -0,0 +1,111 @@
+"""Copyright 2022 Jannis Müller/ janmueller@uni-potsdam.de
+
+Licensed under the Apache License, Version 2.0 (the "License");
+you may not use this file except in compliance with the License.
+You may obtain a copy of the License at
+
+    http://www.apache.org/licenses/LICENSE-2.0
+
+Unless required by applicable law or agreed to in writing, software
+distributed under the License is distributed on an "AS IS" BASIS,
+WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+See the License for the specific language governing permissions and
+limitations under the License."""
+
+
+# Machines
+
+def machine_type(machine, now):
+    return machine.PERFORMABLE_TASK.id
+
+
+def current_setup(machine, now):
+    if machine.current_setup:
+        return machine.current_setup.type_id
+    else:
+        return -1
+
+
+def in_setup(machine, now):
+    return int(machine.setup)
+
+
+def next_setup(machine, now):
+    if machine.setup:
+        return machine.next_expected_order.type.type_id
+    else:
+        return current_setup(machine, now)
+
+
+def remaining_setup_time(machine, now):
+    if machine.setup:
+        return machine.setup_finished_at - now
+    else:
+        return 0
+
+
+def manufacturing(machine, now):
+    return int(machine.manufacturing)
+
+
+def failure(machine, now):
+    return int(machine.failure)
+
+
+def remaining_man_time(machine, now):
+    if machine.failure:
+        return machine.remaining_manufacturing_time
+    elif machine.manufacturing:
+        return machine.manufacturing_end_time - now
+    else:
+        return 0
+
+
+def failure_fixed_in(machine, now):
+    if machine.failure:
+        return machine.failure_fixed_at - now
+    else:
+        return 0
+
+
+# Agents
+
+def agent_position(agent, now):
+    return agent.position
+
+
+def moving(agent, now):
+    return int(agent.moving)
+
+
+def remaining_moving_time(agent, now):
+    if agent.moving:
+        return agent.moving_end_time - now
+    else:
+        return 0
+
+
+def next_position(agent, now):
+    if agent.moving:
+        return agent.next_position
+    else:
+        return -1
+
+
+def has_task(agent, now):
+    return int(agent.has_task)
+
+
+def locked_item(agent, now):
+    if agent.locked_item:
+        return agent.locked_item
+    else:
+        return -1
+
+
+# Attribute name in state_attributes -> function(position, now)
+machine_attributes = {attribute.__name__: attribute for attribute in
+                      [machine_type, current_setup, in_setup, next_setup, remaining_setup_time, manufacturing, failure,
+                       remaining_man_time, failure_fixed_in]}
+agent_attributes = {attribute.__name__: attribute for attribute in
+                    [agent_position, moving, remaining_moving_time, next_position, has_task, locked_item]}
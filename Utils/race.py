@@ -0,0 +1,158 @@
+"""Copyright 2022 Jannis Müller/ janmueller@uni-potsdam.de
+
+Licensed under the Apache License, Version 2.0 (the "License");
+you may not use this file except in compliance with the License.
+You may obtain a copy of the License at
+
+    http://www.apache.org/licenses/LICENSE-2.0
+
+Unless required by applicable law or agreed to in writing, software
+distributed under the License is distributed on an "AS IS" BASIS,
+WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+See the License for the specific language governing permissions and
+limitations under the License."""
+
+import ast
+import math
+import multiprocessing
+import numpy as np
+import pandas as pd
+from copy import deepcopy
+from Ruleset import RuleSet, load_rulesets
+from Utils.sweep import run_job
+from Utils.init_simulation_env import load_setup_from_config
+
+
+def chi2_sf(x: float, dof: int):
+    """P(X >= x) of a chi-squared distribution with an integer amount of degrees of freedom"""
+    if x <= 0:
+        return 1.0
+    half = x / 2
+    if dof % 2 == 0:
+        term, total = 1.0, 1.0
+        for i in range(1, dof // 2):
+            term *= half / i
+            total += term
+        return min(1.0, math.exp(-half) * total)
+    total = math.erfc(math.sqrt(half))
+    term = math.sqrt(half) / math.gamma(1.5)
+    for i in range(1, (dof + 1) // 2):
+        total += math.exp(-half) * term
+        term *= half / (i + 0.5)
+    return min(1.0, total)
+
+
+def t_sf(t: float, dof: int):
+    """P(T >= t) of a student t distribution with an integer amount of degrees of freedom"""
+    theta = math.atan(abs(t) / math.sqrt(dof))
+    cos2 = math.cos(theta) ** 2
+    if dof % 2 == 1:
+        term, total = math.cos(theta), math.cos(theta) if dof > 1 else 0
+        for i in range(3, dof - 1, 2):
+            term *= cos2 * (i - 1) / i
+            total += term
+        inside = 2 / math.pi * (theta + math.sin(theta) * total)
+    else:
+        term, total = 1.0, 1.0
+        for i in range(2, dof - 1, 2):
+            term *= cos2 * (i - 1) / i
+            total += term
+        inside = math.sin(theta) * total
+    p = (1 - inside) / 2
+    return p if t >= 0 else 1 - p
+
+
+def friedman_test(values: np.ndarray):
+    """p-value of the friedman test on a matrix (instances x candidates), lower values are better"""
+    instances, candidates = values.shape
+    ranks = np.argsort(np.argsort(values, axis=1), axis=1) + 1.0
+    # Average ranks of ties
+    for row in range(instances):
+        for value in np.unique(values[row]):
+            tied = values[row] == value
+            ranks[row, tied] = ranks[row, tied].mean()
+    rank_sums = ranks.sum(axis=0)
+    numerator = (candidates - 1) * np.sum((rank_sums - instances * (candidates + 1) / 2) ** 2)
+    denominator = np.sum(ranks ** 2) - instances * candidates * (candidates + 1) ** 2 / 4
+    if denominator <= 0:
+        return 1.0
+    return chi2_sf(numerator / denominator, candidates - 1)
+
+
+def paired_t_test(values: np.ndarray, best: np.ndarray):
+    """One sided p-value that the candidate is not worse than the best candidate (lower values are better)"""
+    differences = values - best
+    deviation = differences.std(ddof=1)
+    if deviation == 0:
+        return 0.0 if differences.mean() > 0 else 1.0
+    return t_sf(differences.mean() / (deviation / math.sqrt(len(differences))), len(differences) - 1)
+
+
+def setup_with_ruleset(setup, ruleset_id: int):
+    """Copy of the setup in which every agent uses the ruleset"""
+    setup = setup.copy()
+    setup["Agents"] = [[ruleset_id] * len(agents if isinstance(agents, list) else ast.literal_eval(agents))
+                       for agents in setup["Agents"]]
+    return setup
+
+
+def race(eval_measures: dict, config: dict, measure="mean_tardiness", maximize=False, rulesets=None, setup=None,
+         first_test=5, batch_size=2, max_instances=30, alpha=0.05, processes=None):
+    """Compare rulesets in the style of F-race. All remaining rulesets run on the same instances (seeds of incoming
+    orders and machine interruptions). After the first_test instances and after each further batch a friedman test
+    is applied, if it is significant rulesets which are worse than the best one in a paired t-test are dropped.
+    Returns the remaining ruleset ids and all results as DataFrame (ruleset, instance, measure)"""
+    if measure not in [key for key, value in eval_measures["simulation"].items() if value]:
+        raise ValueError("The racing measure has to be an activated simulation measure!", measure)
+    if setup is None:
+        setup = load_setup_from_config(config)
+    if rulesets is None:
+        load_rulesets()
+        rulesets = [ruleset.id for ruleset in RuleSet.instances]
+
+    order_seeds = np.random.RandomState(config["SEED_GENERATOR"]["SEED_GEN_INC_ORDERS"]).randint(99999999, size=max_instances)
+    interruption_seeds = np.random.RandomState(config["SEED_GENERATOR"]["SEED_GEN_M_INTERRUPTIONS"]).randint(99999999, size=max_instances)
+    setups = {ruleset_id: setup_with_ruleset(setup, ruleset_id) for ruleset_id in rulesets}
+
+    remaining = list(rulesets)
+    rows = []
+    instance = 0
+    pool = multiprocessing.Pool(processes) if processes != 1 else None
+    try:
+        while instance < max_instances and len(remaining) > 1:
+            instances = range(instance, min(instance + (first_test if instance == 0 else batch_size), max_instances))
+            jobs = []
+            for ruleset_id in remaining:
+                for number in instances:
+                    job_config = deepcopy(config)
+                    job_config["DB_IN_MEMORY"] = True
+                    job_config["SEED_INCOMING_ORDERS"] = order_seeds[number].item()
+                    job_config["SEED_MACHINE_INTERRUPTIONS"] = interruption_seeds[number].item()
+                    jobs.append({"point": ruleset_id, "parameters": {"ruleset": ruleset_id}, "replication": number,
+                                 "config": job_config, "setup": setups[ruleset_id].copy()})
+            if pool:
+                results = pool.starmap(run_job, [(job, eval_measures) for job in jobs])
+            else:
+                results = [run_job(job, eval_measures) for job in jobs]
+            rows += [{"ruleset": row["ruleset"], "instance": row["replication"], measure: row.get(measure)} for row in results]
+            instance = instances[-1] + 1
+
+            # Only instances with a result for every remaining ruleset are compared
+            df = pd.DataFrame(rows)
+            table = df[df["ruleset"].isin(remaining)].pivot(index="instance", columns="ruleset", values=measure)
+            table = table[remaining].dropna().astype(float)
+            values = -table.to_numpy() if maximize else table.to_numpy()
+            if len(values) < 2 or friedman_test(values) >= alpha:
+                continue
+
+            best = values.mean(axis=0).argmin()
+            dropped = [ruleset_id for column, ruleset_id in enumerate(remaining)
+                       if column != best and paired_t_test(values[:, column], values[:, best]) < alpha]
+            for ruleset_id in dropped:
+                print("Ruleset %d dropped after %d instances" % (ruleset_id, instance))
+            remaining = [ruleset_id for ruleset_id in remaining if ruleset_id not in dropped]
+    finally:
+        if pool:
+            pool.close()
+
+    return remaining, pd.DataFrame(rows)
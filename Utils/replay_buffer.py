@@ -0,0 +1,136 @@
+"""Copyright 2022 Jannis Müller/ janmueller@uni-potsdam.de
+
+Licensed under the Apache License, Version 2.0 (the "License");
+you may not use this file except in compliance with the License.
+You may obtain a copy of the License at
+
+    http://www.apache.org/licenses/LICENSE-2.0
+
+Unless required by applicable law or agreed to in writing, software
+distributed under the License is distributed on an "AS IS" BASIS,
+WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+See the License for the specific language governing permissions and
+limitations under the License."""
+
+import os
+import numpy as np
+from contextlib import contextmanager
+
+try:
+    import fcntl
+except ImportError:  # Windows: Only one writing process per replay buffer
+    fcntl = None
+
+
+class ReplayBuffer:
+    """Ring buffer of transitions (state, action, reward, next state, done) of smart agents.
+    All fields are numpy.memmap files within one directory, so the memory can exceed the RAM and several
+    simulation processes can append to the same buffer. Writers and readers are synchronized by a file lock."""
+
+    HEADER = ["capacity", "observation_size", "position", "size", "max_priority"]
+
+    def __init__(self, path: str, capacity=100000, observation_size=1024, alpha=0.6, seed=None):
+        os.makedirs(path, exist_ok=True)
+        self.PATH = path
+        self.ALPHA = alpha  # How much the priorities count when sampling, 0 is uniform
+        self.random = np.random.RandomState(seed)
+        self.lock_file = open(os.path.join(path, "lock"), "a+")
+
+        with self.locked():
+            header_file = os.path.join(path, "header.dat")
+            new = not os.path.exists(header_file)
+            self.header = np.memmap(header_file, dtype=np.float64, mode="w+" if new else "r+", shape=(len(self.HEADER),))
+            if new:
+                self.header[:] = [capacity, observation_size, 0, 0, 1]
+                self.header.flush()
+            elif self.header[0] != capacity or self.header[1] != observation_size:
+                raise ValueError("The replay buffer at {path} was created with a different capacity or observation size!"
+                                 .format(path=path), int(self.header[0]), int(self.header[1]))
+
+            self.CAPACITY = capacity
+            self.OBSERVATION_SIZE = observation_size
+            self.states = self.field("states", np.float32, (capacity, observation_size), new)
+            self.next_states = self.field("next_states", np.float32, (capacity, observation_size), new)
+            self.actions = self.field("actions", np.int32, (capacity,), new)
+            self.rewards = self.field("rewards", np.float32, (capacity,), new)
+            self.dones = self.field("dones", np.bool_, (capacity,), new)
+            self.priorities = self.field("priorities", np.float32, (capacity,), new)
+
+    def field(self, name: str, dtype, shape: tuple, new: bool):
+        return np.memmap(os.path.join(self.PATH, name + ".dat"), dtype=dtype, mode="w+" if new else "r+", shape=shape)
+
+    @contextmanager
+    def locked(self, shared=False):
+        if fcntl:
+            fcntl.flock(self.lock_file, fcntl.LOCK_SH if shared else fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            if fcntl:
+                fcntl.flock(self.lock_file, fcntl.LOCK_UN)
+
+    def __len__(self):
+        return int(self.header[3])
+
+    def append(self, state: np.ndarray, action: int, reward: float, next_state: np.ndarray, done=False):
+        """Add one transition, the oldest transition is overwritten if the buffer is full.
+        States shorter than the observation size are zero padded"""
+        if len(state) > self.OBSERVATION_SIZE or len(next_state) > self.OBSERVATION_SIZE:
+            raise ValueError("The state exceeds the observation size of the replay buffer!", len(state), len(next_state))
+
+        with self.locked():
+            index = int(self.header[2])
+            self.states[index, :len(state)] = state
+            self.states[index, len(state):] = 0
+            self.next_states[index, :len(next_state)] = next_state
+            self.next_states[index, len(next_state):] = 0
+            self.actions[index] = action
+            self.rewards[index] = reward
+            self.dones[index] = done
+            self.priorities[index] = self.header[4]  # New transitions are sampled at least once with high probability
+
+            self.header[2] = (index + 1) % self.CAPACITY
+            self.header[3] = min(self.header[3] + 1, self.CAPACITY)
+
+    def sample(self, batch_size: int, prioritized=False, beta=0.4):
+        """Random minibatch as dict of arrays. Only the sampled rows are read from the files.
+        Prioritized sampling returns importance sampling weights, otherwise all weights are 1"""
+        with self.locked(shared=True):
+            size = len(self)
+            if size == 0:
+                raise Exception("Sampling from an empty replay buffer!")
+
+            if prioritized:
+                probabilities = self.priorities[:size].astype(np.float64) ** self.ALPHA
+                probabilities /= probabilities.sum()
+                indices = self.random.choice(size, batch_size, p=probabilities)
+                weights = (size * probabilities[indices]) ** -beta
+                weights /= weights.max()
+            else:
+                indices = self.random.randint(size, size=batch_size)
+                weights = np.ones(batch_size)
+
+            return {"indices": indices,
+                    "states": self.states[indices],
+                    "actions": self.actions[indices],
+                    "rewards": self.rewards[indices],
+                    "next_states": self.next_states[indices],
+                    "dones": self.dones[indices],
+                    "weights": weights.astype(np.float32)}
+
+    def update_priorities(self, indices: np.ndarray, priorities: np.ndarray):
+        """Set new priorities (e.g. absolute td errors) of sampled transitions"""
+        with self.locked():
+            priorities = np.abs(priorities) + 1e-6
+            self.priorities[indices] = priorities
+            self.header[4] = max(self.header[4], priorities.max())
+
+    def flush(self):
+        with self.locked():
+            for data in [self.header, self.states, self.next_states, self.actions, self.rewards, self.dones,
+                         self.priorities]:
+                data.flush()
+
+    def close(self):
+        self.flush()
+        self.lock_file.close()
@@ -0,0 +1,107 @@
+"""Copyright 2022 Jannis Müller/ janmueller@uni-potsdam.de
+
+Licensed under the Apache License, Version 2.0 (the "License");
+you may not use this file except in compliance with the License.
+You may obtain a copy of the License at
+
+    http://www.apache.org/licenses/LICENSE-2.0
+
+Unless required by applicable law or agreed to in writing, software
+distributed under the License is distributed on an "AS IS" BASIS,
+WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+See the License for the specific language governing permissions and
+limitations under the License."""
+
+import os
+import json
+import hashlib
+import state_attributes
+from Utils.save_results import configuration_hash
+
+CACHE_DIRECTORY = "result/cache"
+CATALOGS = ["ProcessingSteps.json", "Order_types.json", "Materials.json", "rulesets.json"]
+# Configuration keys which only change the outputs and instrumentation of a run, not its results
+OUTPUT_KEYS = ["DB_IN_MEMORY", "INSTRUMENTATION", "MEMORY_REPORT", "MEMORY_BUDGET_ACTION", "MEMORY_BUDGETS",
+               "REPLAY_BUFFER", "REPLAY_BUFFER_CAPACITY", "REPLAY_OBSERVATION_SIZE", "RESULT_CACHE", "RESULT_CACHE_SIZE",
+               "EVENT_LOG_FORMAT", "TIME_SERIES_BIN_WIDTH"]
+
+
+def cache_key(config: dict, setup, seed_pair: tuple, eval_measures: dict):
+    """Content address of a simulation run: configuration without OUTPUT_KEYS, cell setup, catalogs, trained models,
+    state attributes of the agents, seeds and chosen measures"""
+    config = {key: value for key, value in config.items() if key not in OUTPUT_KEYS}
+    key = hashlib.sha256(configuration_hash(config, setup).encode("UTF-8"))
+    for catalog in CATALOGS:
+        if os.path.exists(catalog):
+            with open(catalog, "rb") as f:
+                key.update(f.read())
+    for model_file in trained_models():
+        # Dynamic rulesets without their model file act randomly
+        key.update(model_file.encode("UTF-8"))
+        if os.path.exists(model_file):
+            with open(model_file, "rb") as f:
+                key.update(f.read())
+        else:
+            key.update(b"missing")
+    states = [state_attributes.normal_state, state_attributes.smart_state]
+    key.update(json.dumps([list(seed_pair), eval_measures, states], sort_keys=True).encode("UTF-8"))
+    return key.hexdigest()
+
+
+def trained_models():
+    """Model files of the dynamic rulesets, loaded by Ruleset.load_policy"""
+    if not os.path.exists("rulesets.json"):
+        return []
+    with open("rulesets.json", encoding="UTF-8") as f:
+        rulesets = json.load(f)["rulesets"]
+    return [ruleset["rules"]["trained_model"] for ruleset in rulesets
+            if ruleset["rules"].get("dynamic") and ruleset["rules"].get("trained_model")]
+
+
+class ResultCache:
+    """Results of simulation runs on disk, one json file per cache key.
+    The least recently used files are removed once the cache exceeds its size"""
+
+    def __init__(self, directory=CACHE_DIRECTORY, max_size=500):
+        self.DIRECTORY = directory
+        self.MAX_SIZE = max_size * 1024 * 1024  # MB
+        os.makedirs(directory, exist_ok=True)
+
+    def file(self, key: str):
+        return os.path.join(self.DIRECTORY, key + ".json")
+
+    def get(self, key: str):
+        """Cached results or None"""
+        try:
+            with open(self.file(key), encoding="UTF-8") as f:
+                results = json.load(f)
+        except (OSError, json.JSONDecodeError):
+            return None
+        os.utime(self.file(key))  # Mark as recently used
+        return results
+
+    def put(self, key: str, results: dict):
+        # Timers and memory usage were measured in the simulating process, they are no results of the run
+        results = dict(results, instrumentation=None, memory=None)
+        temporary = self.file(key) + ".tmp"
+        with open(temporary, "w", encoding="UTF-8") as f:
+            json.dump(results, f, ensure_ascii=False)
+        os.replace(temporary, self.file(key))
+        self.evict()
+
+    def invalidate(self, key=None):
+        """Remove one cached run or the whole cache"""
+        files = [self.file(key)] if key else [entry.path for entry in os.scandir(self.DIRECTORY)]
+        for file in files:
+            if os.path.exists(file):
+                os.remove(file)
+
+    def evict(self):
+        entries = sorted((entry.stat().st_mtime, entry.stat().st_size, entry.path) for entry in os.scandir(self.DIRECTORY)
+                         if entry.name.endswith(".json"))
+        size = sum(entry[1] for entry in entries)
+        for modified, file_size, path in entries:
+            if size <= self.MAX_SIZE:
+                break
+            os.remove(path)
+            size -= file_size
@@ -12,56 +12,66 @@ WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
 See the License for the specific language governing permissions and
 limitations under the License."""
 
+import os
 import json
+import hashlib
 import Cell
-from copy import copy
+import numbers
+import pandas as pd
+import time_tracker
+from Order import Order
+from copy import deepcopy
+
+RUNS_FILE = "result/runs.jsonl"  # One line per evaluated simulation run
+SEED_KEYS = ["SEED_INCOMING_ORDERS", "SEED_MACHINE_INTERRUPTIONS"]
 
 
 class SimulationResults:
-    instances = []
 
-    def __init__(self, sim_env):
-        sim_results = copy(schema_simulation)
-        sim_results["run_number"] = len(self.__class__.instances) + 1
+    def __init__(self, sim_env, run_number: int):
+        sim_results = deepcopy(schema_simulation)
+        sim_results["run_number"] = run_number
         sim_results["seed_incoming_orders"] = sim_env.SEED_INCOMING_ORDERS
         sim_results["seed_machine_interruptions"] = sim_env.SEED_MACHINE_INTERRUPTIONS
         sim_results["simulation_results"] = sim_env.result
+        sim_results["instrumentation"] = time_tracker.report()
+        sim_results["memory"] = sim_env.memory
 
         # Fill cell schema
         for cell in Cell.Cell.instances:
-            cell_schema = copy(schema_cells)
+            cell_schema = deepcopy(schema_cells)
             cell_schema["cell_results"] = cell.result
 
             # Fill agent schema
             for agent in cell.AGENTS:
-                agent_schema = copy(schema_agents)
+                agent_schema = deepcopy(schema_agents)
                 agent_schema["ruleset"] = agent.RULESET.name.decode("UTF-8")
                 agent_schema["agent_results"] = agent.result
                 cell_schema["agents"].append(agent_schema)
 
             # Fill machine schema
             for machine in cell.MACHINES:
-                machine_schema = copy(schema_machines)
+                machine_schema = deepcopy(schema_machines)
                 machine_schema["type"] = machine.PERFORMABLE_TASK.name.decode("UTF-8")
                 machine_schema["machine_results"] = machine.result
                 cell_schema["machines"].append(machine_schema)
 
             # Fill input buffer schema
-            input_b_schema = copy(schema_buffer)
+            input_b_schema = deepcopy(schema_buffer)
             input_b_schema["type"] = "Input-Buffer"
             input_b_schema["capacity"] = cell.INPUT_BUFFER.STORAGE_CAPACITY
             input_b_schema["buffer_results"] = cell.INPUT_BUFFER.result
             cell_schema["buffer"].append(input_b_schema)
 
             # Fill output buffer schema
-            output_b_schema = copy(schema_buffer)
+            output_b_schema = deepcopy(schema_buffer)
             output_b_schema["type"] = "Output-Buffer"
             output_b_schema["capacity"] = cell.OUTPUT_BUFFER.STORAGE_CAPACITY
             output_b_schema["buffer_results"] = cell.OUTPUT_BUFFER.result
             cell_schema["buffer"].append(output_b_schema)
 
             # Fill storage buffer schema
-            storage_b_schema = copy(schema_buffer)
+            storage_b_schema = deepcopy(schema_buffer)
             storage_b_schema["type"] = "Storage-Buffer"
             storage_b_schema["capacity"] = cell.STORAGE.STORAGE_CAPACITY
             storage_b_schema["buffer_results"] = cell.STORAGE.result
@@ -69,14 +79,14 @@ class SimulationResults:
 
             # Fill interface buffers schema
             for interface in cell.INTERFACES_IN:
-                interface_in_schema = copy(schema_buffer)
+                interface_in_schema = deepcopy(schema_buffer)
                 interface_in_schema["type"] = "Interface-Buffer Outgoing"
                 interface_in_schema["capacity"] = interface.STORAGE_CAPACITY
                 interface_in_schema["buffer_results"] = interface.result
                 cell_schema["buffer"].append(interface_in_schema)
 
             for interface in cell.INTERFACES_OUT:
-                interface_out_schema = copy(schema_buffer)
+                interface_out_schema = deepcopy(schema_buffer)
                 interface_out_schema["type"] = "Interface-Buffer Ingoing"
                 interface_out_schema["capacity"] = interface.STORAGE_CAPACITY
                 interface_out_schema["buffer_results"] = interface.result
@@ -85,7 +95,96 @@ class SimulationResults:
             sim_results["cells"].append(cell_schema)
 
         self.results = sim_results
-        self.__class__.instances.append(self)
+        self.time_series = None  # KPI time series of the run, see Utils.time_series
+
+
+def results_table(sim_env):
+    """Results of the objects of a run as long table with the columns focus, object, measure and value.
+    Results per order type are split into one measure per type, other non numeric results are left out"""
+    objects = [("simulation", 0, sim_env.result)]
+    for focus, instances in [("cell", Cell.Cell.instances), ("agent", Cell.ManufacturingAgent.instances),
+                             ("machine", Cell.Machine.Machine.instances), ("buffer", Cell.Buffer.instances),
+                             ("order", Order.instances)]:
+        objects += [(focus, obj.LOG_ID, getattr(obj, "result", None)) for obj in instances
+                    if obj.SIMULATION_ENVIRONMENT is sim_env]
+
+    rows = []
+    for focus, object_id, results in objects:
+        for measure, value in (results or {}).items():
+            if value is None or isinstance(value, numbers.Number):
+                rows.append((focus, object_id, measure, value))
+            elif isinstance(value, (list, tuple)):
+                rows += [(focus, object_id, measure + "/" + str(name), number) for name, number in value]
+    table = pd.DataFrame(rows, columns=["focus", "object", "measure", "value"])
+    table["value"] = table["value"].astype(float)
+    return table
+
+
+def configuration_hash(config: dict, setup=None):
+    """Identify runs of the same configuration and cell setup. The seeds of the single runs are excluded"""
+    content = json.dumps({key: value for key, value in config.items() if key not in SEED_KEYS}, sort_keys=True, default=str)
+    if setup is not None:
+        content += setup.to_csv()
+    return hashlib.sha1(content.encode("UTF-8")).hexdigest()
+
+
+def append_run(results: dict, config_hash: str, path=RUNS_FILE):
+    """Append one evaluated run as JSON line. The line is on disk before the next run starts"""
+    with open(path, "a+b") as f:
+        # Terminate the incomplete line of a crashed run
+        if f.tell() > 0:
+            f.seek(-1, os.SEEK_END)
+            if f.read(1) != b"\n":
+                f.write(b"\n")
+        f.write((json.dumps({"config_hash": config_hash, **results}, ensure_ascii=False) + "\n").encode("UTF-8"))
+        f.flush()
+        os.fsync(f.fileno())
+
+
+def read_runs(config_hash=None, path=RUNS_FILE):
+    """Iterate over the stored runs, optionally only over those of one configuration. Incomplete lines are skipped"""
+    if not os.path.exists(path):
+        return
+    with open(path, encoding="UTF-8") as f:
+        for line in f:
+            try:
+                run = json.loads(line)
+            except json.JSONDecodeError:
+                continue
+            if config_hash is None or run.get("config_hash") == config_hash:
+                yield run
+
+
+def completed_runs(config_hash: str, path=RUNS_FILE):
+    """Seed pairs (incoming orders, machine interruptions) of the stored runs of a configuration"""
+    return {(run["seed_incoming_orders"], run["seed_machine_interruptions"]) for run in read_runs(config_hash, path)}
+
+
+def write_last_runs(config_hash: str, seed_pairs: list, path=RUNS_FILE, output="result/last_runs.json"):
+    """Write the stored runs of the given seed pairs to one json file, run by run.
+    Returns the simulation results of these runs"""
+    seed_pairs = [tuple(pair) for pair in seed_pairs]
+
+    # Latest line of each seed pair, repeated runs without resume replace older ones
+    latest = {}
+    for number, run in enumerate(read_runs(config_hash, path)):
+        pair = (run["seed_incoming_orders"], run["seed_machine_interruptions"])
+        if pair in seed_pairs:
+            latest[pair] = number
+    selected = set(latest.values())
+
+    results = {}
+    with open(output, "w", encoding="UTF-8") as f:
+        f.write('{"simulation_runs": [')
+        for number, run in enumerate(read_runs(config_hash, path)):
+            if number in selected:
+                f.write(",\n" if results else "\n")
+                json.dump(run, f, indent=4, ensure_ascii=False)
+                results[(run["seed_incoming_orders"], run["seed_machine_interruptions"])] = run["simulation_results"]
+        f.write("\n]}\n")
+
+    return [{"seed_incoming_orders": pair[0], "seed_machine_interruptions": pair[1],
+             "simulation_results": results.get(pair)} for pair in seed_pairs]
 
 
 schema_simulation = json.loads("""{
@@ -93,6 +192,8 @@ schema_simulation = json.loads("""{
                 "seed_incoming_orders": null,
                 "seed_machine_interruptions": null,
                 "simulation_results": null,
+                "instrumentation": null,
+                "memory": null,
                 "cells": []
             }""")
 
@@ -0,0 +1,114 @@
+"""Copyright 2022 Jannis Müller/ janmueller@uni-potsdam.de
+
+Licensed under the Apache License, Version 2.0 (the "License");
+you may not use this file except in compliance with the License.
+You may obtain a copy of the License at
+
+    http://www.apache.org/licenses/LICENSE-2.0
+
+Unless required by applicable law or agreed to in writing, software
+distributed under the License is distributed on an "AS IS" BASIS,
+WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+See the License for the specific language governing permissions and
+limitations under the License."""
+
+import json
+import numpy as np
+import pandas as pd
+
+
+def generate_setup(depth: int, fan_out, machines_per_cell: int, task_mix=None, agents_per_cell=2,
+                   dist_agents_per_cell=None, rulesets=(2,), dist_rulesets=None, storage_cap=5, input_cap=4,
+                   output_cap=3, dist_storage_cap=None, seed=None):
+    """Create a synthetic cell setup without user input. The result has the same layout as the setup files
+    in ./setups and can be passed to generator_from_setup directly.
+
+    :param depth: Number of distribution cell levels above the manufacturing cells
+    :param fan_out: Children per distribution cell. Integer or list with one value per level, top down
+    :param machines_per_cell: Amount of machines within each manufacturing cell
+    :param task_mix: Dict {task_id: weight} used to draw the machine types. Default: Uniform over all tasks
+    :param agents_per_cell: Amount of agents within each manufacturing cell
+    :param dist_agents_per_cell: Amount of agents within each distribution cell. Default: agents_per_cell
+    :param rulesets: Ruleset ids the agents of manufacturing cells are drawn from
+    :param dist_rulesets: Ruleset ids the agents of distribution cells are drawn from. Default: rulesets
+    :param storage_cap: Storage capacity of manufacturing cells
+    :param input_cap: Input buffer capacity of each cell
+    :param output_cap: Output buffer capacity of each cell
+    :param dist_storage_cap: Storage capacity of distribution cells. Default: storage_cap
+    :param seed: Seed for the random machine and agent selection
+    :return: Setup as DataFrame (Type, Machines, Agents, StorageCap, InputCap, OutputCap, Parent, Level)
+    """
+    if isinstance(fan_out, int):
+        fan_out = [fan_out] * depth
+    if len(fan_out) != depth or min(fan_out, default=1) < 1:
+        raise ValueError("Fan out has to be a positive integer or a list with one positive value per level!")
+    if machines_per_cell < 1:
+        raise ValueError("Each manufacturing cell needs at least one machine!")
+
+    if dist_agents_per_cell is None:
+        dist_agents_per_cell = agents_per_cell
+    if dist_rulesets is None:
+        dist_rulesets = rulesets
+    if dist_storage_cap is None:
+        dist_storage_cap = storage_cap
+
+    if task_mix is None:
+        tasks = json.load(open("ProcessingSteps.json", encoding="UTF-8"))["tasks"]
+        task_mix = {task["id"]: 1 for task in tasks}
+    task_ids = list(task_mix.keys())
+    task_weights = np.asarray(list(task_mix.values()), dtype=float)
+    task_weights = task_weights / task_weights.sum()
+
+    random_state = np.random.RandomState(seed)
+
+    # Amount of cells per level, bottom up. Level 0 contains the manufacturing cells
+    cells_per_level = [1]
+    for children in fan_out:
+        cells_per_level.insert(0, cells_per_level[0] * children)
+    fan_out_bottom_up = list(reversed(fan_out))
+
+    # First index of each level. Children always have lower indices than their parents
+    level_offsets = np.cumsum([0] + cells_per_level[:-1]).tolist()
+    number_of_cells = sum(cells_per_level)
+
+    types = []
+    machines = []
+    agents = []
+    storage = []
+    parents = []
+    levels = []
+
+    for level, amount in enumerate(cells_per_level):
+        for position in range(amount):
+            if level == 0:
+                types.append("Man")
+                machines.append(sorted(random_state.choice(task_ids, machines_per_cell, p=task_weights).tolist()))
+                agents.append(random_state.choice(rulesets, agents_per_cell).tolist())
+                storage.append(storage_cap)
+            else:
+                types.append("Dist")
+                machines.append([])
+                agents.append(random_state.choice(dist_rulesets, dist_agents_per_cell).tolist())
+                storage.append(dist_storage_cap)
+
+            if level == depth:
+                parents.append(np.nan)
+            else:
+                parents.append(float(level_offsets[level + 1] + position // fan_out_bottom_up[level]))
+            levels.append(level)
+
+    setup = pd.DataFrame({"Type": types,
+                          "Machines": machines,
+                          "Agents": agents,
+                          "StorageCap": storage,
+                          "InputCap": [input_cap] * number_of_cells,
+                          "OutputCap": [output_cap] * number_of_cells,
+                          "Parent": parents,
+                          "Level": levels})
+    return setup
+
+
+def save_setup(setup: pd.DataFrame, name: str):
+    """Save a generated setup in ./setups so it can be referenced by SETUP_FILE in the configuration"""
+    with open('./setups/' + name.replace(" ", "_") + '.txt', 'w') as outfile:
+        setup.to_csv(outfile, sep=";")
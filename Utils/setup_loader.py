@@ -0,0 +1,163 @@
+"""Copyright 2022 Jannis Müller/ janmueller@uni-potsdam.de
+
+Licensed under the Apache License, Version 2.0 (the "License");
+you may not use this file except in compliance with the License.
+You may obtain a copy of the License at
+
+    http://www.apache.org/licenses/LICENSE-2.0
+
+Unless required by applicable law or agreed to in writing, software
+distributed under the License is distributed on an "AS IS" BASIS,
+WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+See the License for the specific language governing permissions and
+limitations under the License."""
+
+import os
+import ast
+import json
+import pickle
+import hashlib
+import numpy as np
+import pandas as pd
+
+COLUMNS = ["Type", "Machines", "Agents", "StorageCap", "InputCap", "OutputCap", "Parent", "Level"]
+CATALOGS = ["ProcessingSteps.json", "rulesets.json"]  # Ids of the setup are validated against these files
+CACHE_SUFFIX = ".cache"
+
+
+def load_setup(path: str):
+    """Load a setup file (table or json tree layout). The validated setup is cached next to the file
+    and reused as long as the file and the catalogs are unchanged"""
+    cache_file = path + CACHE_SUFFIX
+    files = [path] + CATALOGS
+    fingerprint = [(os.stat(file).st_mtime_ns, os.stat(file).st_size) for file in files]
+
+    cached = None
+    if os.path.exists(cache_file):
+        try:
+            with open(cache_file, "rb") as f:
+                cached = pickle.load(f)
+        except Exception:
+            cached = None
+
+    if cached and cached["fingerprint"] == fingerprint:
+        return cached["setup"].copy()
+
+    content_hash = files_hash(files)
+    if cached and cached["hash"] == content_hash:
+        setup = cached["setup"]
+    else:
+        setup = compile_setup(path)
+    with open(cache_file, "wb") as f:
+        pickle.dump({"fingerprint": fingerprint, "hash": content_hash, "setup": setup}, f, protocol=pickle.HIGHEST_PROTOCOL)
+    return setup.copy()
+
+
+def files_hash(files: list):
+    content = hashlib.sha1()
+    for file in files:
+        with open(file, "rb") as f:
+            content.update(f.read())
+    return content.hexdigest()
+
+
+def compile_setup(path: str):
+    with open(path, encoding="UTF-8") as f:
+        text = f.read()
+    if text.lstrip().startswith(('"', "{")):
+        setup = setup_from_tree(text)
+    else:
+        setup = setup_from_table(path)
+    validate_setup(setup)
+    return setup
+
+
+def setup_from_table(path: str):
+    """Table layout: One row per cell separated by ;"""
+    setup = pd.read_csv(path, sep=";", index_col=0)
+    for column in ["Machines", "Agents"]:
+        setup[column] = [value if isinstance(value, list) else ast.literal_eval(value) for value in setup[column]]
+    return setup[COLUMNS]
+
+
+def setup_from_tree(text: str):
+    """Json tree layout: Interfaces contain one cell, cells contain agents, machines, a storage and interfaces.
+    The task_id of machines is the position of the processing step in ProcessingSteps.json"""
+    tree = json.loads(text)
+    if isinstance(tree, str):
+        tree = json.loads(tree)
+
+    with open("ProcessingSteps.json", encoding="UTF-8") as f:
+        task_ids = [step["id"] for step in json.load(f)["tasks"]]
+
+    rows = []
+
+    def node_of(entry: dict):
+        return next(iter(entry.values()))
+
+    def add_cell(cell: dict, capacity: int):
+        """Add the children first, cells may only reference parents with a higher index"""
+        agents, machines, storage, children = [], [], None, []
+        for child in cell.get("children", []):
+            child = node_of(child)
+            data = child.get("data", {})
+            if data.get("type") == "Agent":
+                agents.append(int(data["ruleset"]))
+            elif data.get("type") == "Machine":
+                if not 0 <= int(data["task_id"]) < len(task_ids):
+                    raise ValueError("Unknown task id in setup!", data["task_id"])
+                machines.append(task_ids[int(data["task_id"])])
+            elif data.get("type") == "Storage":
+                storage = int(data["capacity"])
+            elif data.get("type") == "Interface":
+                children.append(add_cell(node_of(child["children"][0]), int(data["capacity"])))
+            else:
+                raise ValueError("Unknown element in setup!", data)
+
+        index = len(rows)
+        rows.append({"Type": "Dist" if children else "Man", "Machines": machines, "Agents": agents,
+                     "StorageCap": storage, "InputCap": capacity, "OutputCap": capacity, "Parent": np.nan,
+                     "Level": max((rows[child]["Level"] + 1 for child in children), default=0)})
+        for child in children:
+            rows[child]["Parent"] = index
+        return index
+
+    root = node_of(tree)
+    if root.get("data", {}).get("type") != "Interface" or len(root.get("children", [])) != 1:
+        raise ValueError("The json setup has to start with one interface containing the main cell!")
+    add_cell(node_of(root["children"][0]), int(root["data"]["capacity"]))
+
+    return pd.DataFrame(rows, columns=COLUMNS)
+
+
+def validate_setup(setup: pd.DataFrame):
+    with open("ProcessingSteps.json", encoding="UTF-8") as f:
+        task_ids = {step["id"] for step in json.load(f)["tasks"]}
+    with open("rulesets.json", encoding="UTF-8") as f:
+        ruleset_ids = {ruleset["id"] for ruleset in json.load(f)["rulesets"]}
+
+    if list(setup.index) != list(range(len(setup))):
+        raise ValueError("The cells of a setup have to be numbered from 0 on!")
+    if setup["Parent"].isna().sum() != 1:
+        raise ValueError("A setup needs exactly one main cell without parent!")
+
+    for index, cell in setup.iterrows():
+        if cell["Type"] not in ["Man", "Dist"]:
+            raise ValueError("Unknown cell type in setup!", index, cell["Type"])
+        if (cell["Type"] == "Man") != bool(cell["Machines"]):
+            raise ValueError("Manufacturing cells need machines, distribution cells must not have machines!", index)
+        if not cell["Agents"]:
+            raise ValueError("Cell without agents in setup!", index)
+        if not set(cell["Machines"]) <= task_ids:
+            raise ValueError("Unknown task id in setup!", index, cell["Machines"])
+        if not set(cell["Agents"]) <= ruleset_ids:
+            raise ValueError("Unknown ruleset id in setup!", index, cell["Agents"])
+        for capacity in ["StorageCap", "InputCap", "OutputCap"]:
+            if pd.isna(cell[capacity]) or cell[capacity] < 1:
+                raise ValueError("Capacities of a setup have to be at least 1!", index, capacity)
+        if not pd.isna(cell["Parent"]):
+            parent = int(cell["Parent"])
+            if parent <= index or parent >= len(setup) or setup.loc[parent, "Type"] != "Dist":
+                raise ValueError("The parent of a cell has to be a distribution cell with a higher index!", index)
+        elif cell["Type"] != "Dist" and len(setup) > 1:
+            raise ValueError("The main cell of a setup with several cells has to be a distribution cell!", index)
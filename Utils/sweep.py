@@ -0,0 +1,100 @@
+"""Copyright 2022 Jannis Müller/ janmueller@uni-potsdam.de
+
+Licensed under the Apache License, Version 2.0 (the "License");
+you may not use this file except in compliance with the License.
+You may obtain a copy of the License at
+
+    http://www.apache.org/licenses/LICENSE-2.0
+
+Unless required by applicable law or agreed to in writing, software
+distributed under the License is distributed on an "AS IS" BASIS,
+WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+See the License for the specific language governing permissions and
+limitations under the License."""
+
+import itertools
+import multiprocessing
+import numpy as np
+import pandas as pd
+from copy import deepcopy
+import environment
+from Order import load_order_types
+from Ruleset import load_rulesets
+from Utils import check_config
+from Utils.init_simulation_env import load_setup_from_config
+
+SETUP_PARAMETERS = ["StorageCap", "InputCap", "OutputCap"]  # Setup columns which can be swept for all cells
+
+
+def set_config_value(config: dict, key: str, value):
+    """Set a key of the configuration, also within the nested dicts (e.g. DISTANCES)"""
+    if key in config:
+        config[key] = value
+        return True
+    return any(set_config_value(nested, key, value) for nested in config.values() if isinstance(nested, dict))
+
+
+def expand_jobs(parameters: dict, replications: int, config: dict, setup):
+    """One job per combination of parameter values and replication. Replications use the same seeds for every
+    parameter point, the seeds are drawn like in environment.simulation"""
+    order_seeds = np.random.RandomState(config["SEED_GENERATOR"]["SEED_GEN_INC_ORDERS"]).randint(99999999, size=replications)
+    interruption_seeds = np.random.RandomState(config["SEED_GENERATOR"]["SEED_GEN_M_INTERRUPTIONS"]).randint(99999999, size=replications)
+
+    keys = list(parameters.keys())
+    jobs = []
+    for point, values in enumerate(itertools.product(*[parameters[key] for key in keys])):
+        point_config = deepcopy(config)
+        point_config["DB_IN_MEMORY"] = True  # Parallel jobs must not share the database file
+        point_setup = setup.copy()
+        for key, value in zip(keys, values):
+            if key in SETUP_PARAMETERS:
+                point_setup[key] = value
+            elif not set_config_value(point_config, key, value):
+                raise ValueError("Sweep parameter is neither a configuration key nor a setup column!", key)
+
+        for replication in range(replications):
+            job_config = deepcopy(point_config)
+            job_config["SEED_INCOMING_ORDERS"] = order_seeds[replication].item()
+            job_config["SEED_MACHINE_INTERRUPTIONS"] = interruption_seeds[replication].item()
+            jobs.append({"point": point, "parameters": dict(zip(keys, values)), "replication": replication,
+                         "config": job_config, "setup": point_setup.copy()})
+    return jobs
+
+
+def run_job(job: dict, eval_measures: dict):
+    """Simulate one job and return its row of the result table"""
+    config = job["config"]
+    check_config.check_configuration_file(config)
+    load_order_types()
+    load_rulesets()
+
+    result = environment.run_simulation(config, eval_measures, job["setup"], job["replication"] + 1)
+
+    row = {"point": job["point"], **job["parameters"], "replication": job["replication"],
+           "seed_incoming_orders": config["SEED_INCOMING_ORDERS"],
+           "seed_machine_interruptions": config["SEED_MACHINE_INTERRUPTIONS"]}
+    for kpi, value in (result.results["simulation_results"] or {}).items():
+        if isinstance(value, list):
+            # Measures per order type: [[type, value], ...]
+            for name, type_value in value:
+                row["{kpi}[{name}]".format(kpi=kpi, name=name)] = type_value
+        else:
+            row[kpi] = value
+    return row
+
+
+def sweep(parameters: dict, eval_measures: dict, config: dict, replications=1, setup=None, processes=None):
+    """Simulate all combinations of the parameter values (config keys or the setup columns in SETUP_PARAMETERS)
+    times the replications in parallel. Returns one row of simulation KPIs per parameter point and replication.
+    On Windows the call has to be guarded by if __name__ == "__main__"."""
+    if setup is None:
+        setup = load_setup_from_config(config)
+    jobs = expand_jobs(parameters, replications, config, setup)
+
+    if processes == 1:
+        rows = [run_job(job, eval_measures) for job in jobs]
+    else:
+        with multiprocessing.Pool(processes) as pool:
+            rows = pool.starmap(run_job, [(job, eval_measures) for job in jobs])
+
+    return pd.DataFrame(rows)
@@ -0,0 +1,147 @@
+"""Copyright 2022 Jannis Müller/ janmueller@uni-potsdam.de
+
+Licensed under the Apache License, Version 2.0 (the "License");
+you may not use this file except in compliance with the License.
+You may obtain a copy of the License at
+
+    http://www.apache.org/licenses/LICENSE-2.0
+
+Unless required by applicable law or agreed to in writing, software
+distributed under the License is distributed on an "AS IS" BASIS,
+WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+See the License for the specific language governing permissions and
+limitations under the License."""
+
+
+import os
+import numpy as np
+import pandas as pd
+import Cell
+from Order import Order
+
+TIME_SERIES_FILE = "result/time_series.csv"  # One row per run, object, measure and time bin
+COLUMNS = ["run", "focus", "object", "measure", "bin_start", "value"]
+
+
+def bin_edges(simulation_length, bin_width):
+    """Start times of all bins and the end of the simulation. The last bin can be shorter"""
+    return np.append(np.arange(0, simulation_length, bin_width), float(simulation_length))
+
+
+def time_weighted_bins(events: pd.DataFrame, edges: np.ndarray, objects: list):
+    """Time weighted mean per bin of piecewise constant values. events has the columns object, time and value,
+    each value holds until the next event of the object or the end of the simulation and is 0 before the first one.
+    Returns a frame with the columns object, bin and value and one row for each of the objects and bins"""
+    events = events.sort_values(["object", "time"], kind="mergesort")
+    owner = events["object"].to_numpy()
+    start = events["time"].to_numpy(dtype=float)
+    value = events["value"].to_numpy(dtype=float)
+
+    # Segments between consecutive events of the same object
+    end = np.append(start[1:], edges[-1])
+    end[np.append(owner[1:] != owner[:-1], True)] = edges[-1]
+    end = np.minimum(end, edges[-1])
+    segments = end > start
+    owner, start, end, value = owner[segments], start[segments], end[segments], value[segments]
+
+    # Split the segments at the bin edges
+    first_bin = np.searchsorted(edges, start, side="right") - 1
+    spans = np.searchsorted(edges, end, side="left") - first_bin
+    segment = np.repeat(np.arange(len(start)), spans)
+    bins = first_bin[segment] + np.arange(len(segment)) - np.repeat(np.cumsum(spans) - spans, spans)
+    overlap = np.minimum(end[segment], edges[bins + 1]) - np.maximum(start[segment], edges[bins])
+
+    result = pd.DataFrame({"object": owner[segment].astype(np.int64), "bin": bins, "value": value[segment] * overlap})
+    result = result.groupby(["object", "bin"])["value"].sum()
+    result = result.reindex(full_grid(objects, edges), fill_value=0).reset_index()
+    result["value"] /= np.diff(edges)[result["bin"].to_numpy()]
+    return result
+
+
+def full_grid(objects: list, edges: np.ndarray):
+    """Index of all combinations of objects and bins"""
+    return pd.MultiIndex.from_product([np.asarray(objects, dtype=np.int64), np.arange(len(edges) - 1)],
+                                      names=["object", "bin"])
+
+
+def counter_events(objects, times, changes):
+    """Running count per object from +1/-1 changes, as events for time_weighted_bins"""
+    events = pd.DataFrame({"object": objects, "time": times, "value": changes}).dropna(subset=["object"])
+    events = events.sort_values(["object", "time"], kind="mergesort")
+    events["value"] = events.groupby("object")["value"].cumsum()
+    return events
+
+
+def cell_occupancy(db_con):
+    """Events of the amount of orders located in each cell (without its child cells)"""
+    df = pd.read_sql_query("SELECT item, time, cell FROM item_events", db_con)
+    df = df.sort_values(["item", "time"], kind="mergesort")
+    previous = df.groupby("item")["cell"].shift(1)
+    moved = df["cell"].ne(previous) & ~(df["cell"].isna() & previous.isna())
+    df, previous = df[moved], previous[moved]
+    return counter_events(np.concatenate([df["cell"].to_numpy(), previous.to_numpy()]),
+                          np.concatenate([df["time"].to_numpy(), df["time"].to_numpy()]),
+                          np.concatenate([np.ones(len(df)), -np.ones(len(df))]))
+
+
+def to_rows(frame: pd.DataFrame, focus: str, measure: str, edges: np.ndarray):
+    frame = frame.assign(focus=focus, measure=measure, bin_start=edges[frame["bin"].to_numpy()])
+    return frame[["focus", "object", "measure", "bin_start", "value"]]
+
+
+def time_series(sim_env, bin_width):
+    """KPI time series of all objects of a finished run in bins of bin_width:
+    utilization of machines and agents, work in progress of buffers, cells and the plant
+    and throughput and mean tardiness of the plant. Returns a long table with a row for each object and bin,
+    the tardiness of bins without completions is NaN"""
+    db_con = sim_env.db_con
+    edges = bin_edges(sim_env.SIMULATION_TIME_RANGE, bin_width)
+    tables = []
+
+    def object_ids(instances):
+        return [obj.LOG_ID for obj in instances if obj.SIMULATION_ENVIRONMENT is sim_env]
+
+    for focus, measure, instances, query in [
+            ("machine", "utilization", Cell.Machine.Machine.instances,
+             "SELECT machine AS object, time, manufacturing AS value FROM machine_events"),
+            ("agent", "utilization", Cell.ManufacturingAgent.instances,
+             "SELECT agent AS object, time, task AS value FROM agent_events"),
+            ("buffer", "wip", Cell.Buffer.instances,
+             "SELECT buffer AS object, time, items_in_storage AS value FROM buffer_events")]:
+        events = pd.read_sql_query(query, db_con)
+        tables.append(to_rows(time_weighted_bins(events, edges, object_ids(instances)), focus, measure, edges))
+
+    tables.append(to_rows(time_weighted_bins(cell_occupancy(db_con), edges, object_ids(Cell.Cell.instances)),
+                          "cell", "wip", edges))
+
+    # Plant: orders between arrival and completion, completions and their tardiness per bin
+    orders = [order for order in Order.instances if order.SIMULATION_ENVIRONMENT == sim_env]
+    arrived = np.array([order.start for order in orders], dtype=float)
+    completed = np.array([np.nan if order.completed_at is None else order.completed_at for order in orders],
+                         dtype=float)
+    due_to = np.array([order.due_to for order in orders], dtype=float)
+    is_completed = ~np.isnan(completed)
+
+    wip = counter_events(np.zeros(len(orders) + is_completed.sum()),
+                         np.concatenate([arrived, completed[is_completed]]),
+                         np.concatenate([np.ones(len(orders)), -np.ones(is_completed.sum())]))
+    tables.append(to_rows(time_weighted_bins(wip, edges, [0]), "simulation", "wip", edges))
+
+    completed_bin = np.searchsorted(edges, completed[is_completed], side="right") - 1
+    completions = pd.DataFrame({"object": 0, "bin": np.minimum(completed_bin, len(edges) - 2),
+                                "tardiness": np.maximum(completed[is_completed] - due_to[is_completed], 0)})
+    completions = completions.groupby(["object", "bin"])["tardiness"].agg(["size", "mean"])
+    completions = completions.reindex(full_grid([0], edges)).reset_index()  # Bins without completions
+    completions["size"] = completions["size"].fillna(0)
+    tables.append(to_rows(completions.rename(columns={"size": "value"}), "simulation", "throughput", edges))
+    tables.append(to_rows(completions.rename(columns={"mean": "value"}), "simulation", "tardiness", edges))
+
+    result = pd.concat(tables, ignore_index=True)
+    result["object"] = result["object"].astype(np.int64)
+    return result
+
+
+def append_time_series(series: pd.DataFrame, run_number: int, path=TIME_SERIES_FILE):
+    """Append the time series of one run to the csv file"""
+    series = series.assign(run=run_number)[COLUMNS]
+    series.to_csv(path, mode="a", header=not os.path.exists(path) or os.path.getsize(path) == 0, index=False)
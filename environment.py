@@ -15,13 +15,20 @@ limitations under the License."""
 import Cell
 from Order import load_order_types, order_arrivals, Order
 import time
+import os
 from Ruleset import load_rulesets
-from Utils import calculate_measures, database, check_config
+from PolicyService import PolicyService
+from Utils import calculate_measures, database, check_config, memory_report
+from Utils.replay_buffer import ReplayBuffer
+from Utils.event_codes import ObjectRegistry
+from Utils.result_cache import ResultCache, cache_key
 from Utils.init_simulation_env import *
-from Utils.save_results import SimulationResults
+from Utils.plant_template import PlantTemplate
+from Utils.save_results import SimulationResults, RUNS_FILE, configuration_hash, append_run, completed_runs, \
+    write_last_runs
 from Utils.progress_func import show_progress_func
+from Utils.time_series import TIME_SERIES_FILE, time_series, append_time_series
 import numpy as np
-import json
 import time_tracker
 
 
@@ -44,40 +51,63 @@ class SimulationEnvironment:
 
         self.main_cell = main_cell
         self.cells = []
+        # Batched decisions of dynamic agents. Random policies draw from streams of this run
+        self.policy_service = PolicyService(env, [self.SEED_INCOMING_ORDERS, self.SEED_MACHINE_INTERRUPTIONS])
 
         self.result = None
+        self.memory = None
+        self.finished_orders = 0
+
+        self.replay_buffer = None  # Transitions of smart agents
+        if config.get("REPLAY_BUFFER"):
+            self.replay_buffer = ReplayBuffer(config["REPLAY_BUFFER"], config.get("REPLAY_BUFFER_CAPACITY", 100000),
+                                              config.get("REPLAY_OBSERVATION_SIZE", 1024))
 
         self.db_con, self.db_cu = database.set_up_db(self)
+        self.object_registry = ObjectRegistry(self.db_cu)  # Dense ids of the objects in the event tables
         self.__class__.instances.append(self)
 
 
 def set_up_sim_env(config: dict, env: simpy.Environment, setup):
-    # Generate objects from setup json file
-    cells = generator_from_setup(setup, config, env)
-
-    # Calculate the shortest distances between objects of each cell
-    # calculate_distances(config, cells)
+    """setup is a setup frame or a PlantTemplate compiled from it"""
+    # Generate objects from the compiled setup
+    template = setup if isinstance(setup, PlantTemplate) else PlantTemplate(setup)
+    cells = template.build(config, env)
 
     # Create new simulation environment and set this to all cells
-    main_cell = cells[np.isnan(cells["Parent"])]["cell_obj"].item()
+    main_cell = cells[template.CELL_IDS.index(template.MAIN_CELL)]
 
     sim_env = SimulationEnvironment(env, config, main_cell)
 
-    set_env_in_cells(sim_env, cells["cell_obj"])
+    set_env_in_cells(sim_env, cells)
 
     return sim_env
 
 
 def simulation(config: dict, eval_measures: dict, runs=1, show_progress=False, save_log=True,
-               change_interruptions=True, change_incoming_orders=True, train=False):
-    """Main function of the simulation: Create project setup and run simulation on it"""
+               change_interruptions=True, change_incoming_orders=True, train=False, setup=None, resume=False,
+               invalidate_cache=False):
+    """Main function of the simulation: Create project setup and run simulation on it.
+    An already created setup (e.g. from Utils.setup_generator) can be passed directly.
+    Each evaluated run is appended to result/runs.jsonl. With resume runs already stored for the same
+    configuration and seeds are skipped. If RESULT_CACHE is active, runs take their results from the result cache.
+    Cached runs write no event log, time series or replay transitions. invalidate_cache ignores cached results
+    and replaces them.
+    With TIME_SERIES_BIN_WIDTH the KPI time series of the simulated runs are written to result/time_series.csv.
+    Returns the simulation results of all runs."""
     check_config.check_configuration_file(config)
     check_config.check_state_attributes()
 
     load_order_types()
     load_rulesets()
 
-    database.clear_files()
+    if save_log:
+        if config.get("EVENT_LOG_FORMAT", "xlsx") != "xlsx" and not database.columnar_available():
+            raise Exception("EVENT_LOG_FORMAT %s requires pyarrow! Install it or use xlsx." % config["EVENT_LOG_FORMAT"])
+        database.clear_files()
+
+    if config.get("TIME_SERIES_BIN_WIDTH", 0) and not resume and os.path.exists(TIME_SERIES_FILE):
+        os.remove(TIME_SERIES_FILE)
 
     if change_interruptions:
         np.random.seed(seed=config["SEED_GENERATOR"]["SEED_GEN_M_INTERRUPTIONS"])
@@ -92,60 +122,95 @@ def simulation(config: dict, eval_measures: dict, runs=1, show_progress=False, s
         order_seeds = np.full([runs, ], config["SEED_INCOMING_ORDERS"])
 
     # Switch between new setup and loading an existing one
-    if yes_no_question("Do you want to load an existing cell setup? [Y/N]\n"):
+    if setup is not None:
+        configuration = setup
+    elif yes_no_question("Do you want to load an existing cell setup? [Y/N]\n"):
         configuration = load_setup_from_config(config)
     else:
         configuration = new_cell_setup()
 
+    config_hash = configuration_hash(config, configuration)
+    seed_pairs = [(order_seeds[sim_count].item(), interruption_seeds[sim_count].item()) for sim_count in range(runs)]
+    finished_runs = completed_runs(config_hash) if resume else set()
+    cache = ResultCache(max_size=config.get("RESULT_CACHE_SIZE", 500)) if config.get("RESULT_CACHE", False) else None
+    if cache:
+        cache_keys = [cache_key(config, configuration, seed_pair, eval_measures) for seed_pair in seed_pairs]
+    template = PlantTemplate(configuration)  # Compiled once, each run only creates the objects of the plant
+
     # Run the set amount of simulations
     for sim_count in range(runs):
-        config["SEED_MACHINE_INTERUPTIONS"] = interruption_seeds[sim_count].item()
-        config["SEED_INCOMING_ORDERS"] = order_seeds[sim_count].item()
-        env = simpy.Environment()
-
-        simulation_environment = set_up_sim_env(config, env, configuration)
-
-        print('----------------------------------------------------------------------------')
-        start_time = time.time()
-
-        env.process(order_arrivals(env, simulation_environment, config))
-
-        if show_progress:
-            env.process(show_progress_func(env, simulation_environment))
-
-        env.run(until=config["SIMULATION_RANGE"])
+        if seed_pairs[sim_count] in finished_runs:
+            print("Simulation %d is already stored in %s, skipped!" % (sim_count + 1, RUNS_FILE))
+            continue
+
+        if cache:
+            cached = None if invalidate_cache else cache.get(cache_keys[sim_count])
+            if cached:
+                print("Simulation %d loaded from the result cache!" % (sim_count + 1))
+                if save_log or config.get("TIME_SERIES_BIN_WIDTH", 0) or config.get("REPLAY_BUFFER"):
+                    print("Warning: The event log, time series and replay transitions of a cached run are not written! "
+                          "Use invalidate_cache to simulate it again.")
+                cached["run_number"] = sim_count + 1
+                append_run(cached, config_hash)
+                continue
+
+        config["SEED_INCOMING_ORDERS"], config["SEED_MACHINE_INTERRUPTIONS"] = seed_pairs[sim_count]
+        result = run_simulation(config, eval_measures, template, sim_count + 1, show_progress, save_log)
+        append_run(result.results, config_hash)
+        if result.time_series is not None:
+            append_time_series(result.time_series, sim_count + 1)
+        if cache:
+            cache.put(cache_keys[sim_count], result.results)
+
+    return write_last_runs(config_hash, seed_pairs)
+
+
+def run_simulation(config: dict, eval_measures: dict, setup, run_number=1, show_progress=False, save_log=False):
+    """Simulate and evaluate one run with the seeds of config. Order types and rulesets have to be loaded.
+    setup can also be a PlantTemplate of it. Returns the SimulationResults of the run"""
+    env = simpy.Environment()
+    time_tracker.reset(config.get("INSTRUMENTATION", False))
+    memory_report.start(config)
+
+    simulation_environment = set_up_sim_env(config, env, setup)
+
+    print('----------------------------------------------------------------------------')
+    start_time = time.time()
 
-        print('\nSimulation %d finished in %d seconds!' % (sim_count + 1, time.time() - start_time))
+    env.process(order_arrivals(env, simulation_environment, config))
 
-        print("Time Tracker:\nTime for state calculations:", time_tracker.time_state_calc, "\nTime for destination calculations:", time_tracker.time_destination_calc)
-        print("\nState Calculations:\nTime for occupancy:", time_tracker.time_occupancy_calc, "\nTime for order attributes:", time_tracker.time_order_attr_calc)
-        print("\nTime for finding actions:", time_tracker.time_action_calc, ",Smart actions:", time_tracker.time_smart_action_calc)
-        print("a", time_tracker.a, "b", time_tracker.b, "c", time_tracker.c)
+    if show_progress:
+        env.process(show_progress_func(env, simulation_environment))
 
+    if config.get("MEMORY_REPORT", False):
+        env.process(memory_report.memory_watch(env, simulation_environment))
 
-        database.add_final_events()
+    env.run(until=config["SIMULATION_RANGE"])
 
-        sim_run_evaluation(simulation_environment, eval_measures)
+    print('\nSimulation %d finished in %d seconds!' % (run_number, time.time() - start_time))
 
-        if save_log:
-            database.save_as_excel(simulation_environment, sim_count + 1)
-        database.close_connection(simulation_environment)
-        release_objects()
+    database.add_final_events()
 
-    schema = json.loads("""
-                            {"simulation_runs":[]}
-                            """)
+    result = sim_run_evaluation(simulation_environment, eval_measures, run_number)
+    if config.get("TIME_SERIES_BIN_WIDTH", 0):
+        result.time_series = time_series(simulation_environment, config["TIME_SERIES_BIN_WIDTH"])
 
-    for run in SimulationResults.instances:
-        schema["simulation_runs"].append(run.results)
+    if save_log:
+        database.save_event_log(simulation_environment, run_number, config.get("EVENT_LOG_FORMAT", "xlsx"),
+                                result.time_series)
+    database.close_connection(simulation_environment)
+    if simulation_environment.replay_buffer is not None:
+        simulation_environment.replay_buffer.close()
+    release_objects()
+    memory_report.stop()
 
-    with open('result/last_runs.json', 'w') as f:
-        json.dump(schema, f, indent=4, ensure_ascii=False)
+    return result
 
 
-def sim_run_evaluation(sim_env, eval_measures):
+def sim_run_evaluation(sim_env, eval_measures, run_number=1):
     print("\nCalculate the chosen measures for the finished simulation run!")
     start_time = time.time()
+    started = time_tracker.start()
 
     functionList = {"machine": calculate_measures.machine_measures,
                     "buffer": calculate_measures.buffer_measures,
@@ -173,17 +238,29 @@ def sim_run_evaluation(sim_env, eval_measures):
                 parameters = {'sim_env': sim_env, 'obj': obj_to_check, 'measures': measures}
                 obj_to_check.result = functionList[focus](**parameters)
 
-    result = SimulationResults(sim_env)
+    time_tracker.stop("evaluation", started)
+    if time_tracker.enabled:
+        print("\nInstrumentation of the simulation run:\n" + time_tracker.summary())
+
+    sim_env.memory = memory_report.report(sim_env)
+    memory_report.check_budgets(sim_env, sim_env.memory)
+
+    result = SimulationResults(sim_env, run_number)
 
     print("\nCalculation finished in %d seconds!" % (time.time() - start_time))
+    return result
 
 
-def release_objects():
-    SimulationEnvironment.instances.clear()
-    Cell.Cell.instances.clear()
-    Cell.Buffer.instances.clear()
-    Cell.ManufacturingAgent.instances.clear()
-    Cell.Machine.Machine.instances.clear()
-    Order.instances.clear()
-    Order.finished_instances.clear()
+def release_objects(sim_env=None):
+    """Remove all simulation objects from the instance lists. If sim_env is given only its objects are removed"""
+    instance_lists = [Cell.Cell.instances, Cell.Buffer.instances, Cell.ManufacturingAgent.instances,
+                      Cell.Machine.Machine.instances, Order.instances, Order.finished_instances]
+    if sim_env is None:
+        SimulationEnvironment.instances.clear()
+        for instances in instance_lists:
+            instances.clear()
+    else:
+        SimulationEnvironment.instances.remove(sim_env)
+        for instances in instance_lists:
+            instances[:] = [obj for obj in instances if obj.SIMULATION_ENVIRONMENT is not sim_env]
 
@@ -0,0 +1,63 @@
+"""Copyright 2022 Jannis Müller/ janmueller@uni-potsdam.de
+
+Licensed under the Apache License, Version 2.0 (the "License");
+you may not use this file except in compliance with the License.
+You may obtain a copy of the License at
+
+    http://www.apache.org/licenses/LICENSE-2.0
+
+Unless required by applicable law or agreed to in writing, software
+distributed under the License is distributed on an "AS IS" BASIS,
+WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+See the License for the specific language governing permissions and
+limitations under the License."""
+
+
+import json
+import simpy
+import numpy as np
+from types import SimpleNamespace
+import Config
+import environment
+from Order import load_order_types
+from Ruleset import load_rulesets, RuleSet
+from PolicyService import PolicyService
+from Utils.init_simulation_env import load_setup
+
+
+def simulate(config: dict, setup):
+    load_order_types()
+    load_rulesets()
+    result = environment.run_simulation(config, Config.evaluation_measures, setup)
+    return json.dumps(result.results, sort_keys=True)
+
+
+def test_runs_with_the_same_seeds_are_identical():
+    """testsetup1 with machine failures and a dynamic agent. All results of the objects and the simulation
+    only depend on the seeds of the run"""
+    config = dict(Config.configuration, SIMULATION_RANGE=1000)
+    setup = load_setup("./setups/testsetup1.txt")
+
+    first_run = simulate(config, setup)
+    other_seed = simulate(dict(config, SEED_MACHINE_INTERRUPTIONS=config["SEED_MACHINE_INTERRUPTIONS"] + 1), setup)
+    second_run = simulate(config, setup)
+
+    assert first_run == second_run
+    assert first_run != other_seed
+
+
+def test_simulations_sharing_a_random_policy_draw_from_their_own_streams():
+    """Instances of a vector environment share the ruleset objects and their policies"""
+    load_rulesets()
+    agent = SimpleNamespace(RULESET=next(ruleset for ruleset in RuleSet.instances if ruleset.dynamic))
+
+    def decide(service):
+        event = service.request(agent, np.zeros(3, dtype=np.float32), np.ones(50, dtype=bool))
+        service.env.run()
+        return event.value
+
+    alone, first, second = [PolicyService(simpy.Environment(), [1, 2]) for service in range(3)]
+    decisions = [decide(alone) for decision in range(10)]
+    interleaved = [(decide(first), decide(second)) for decision in range(10)]
+
+    assert decisions == [action for action, other in interleaved] == [action for other, action in interleaved]
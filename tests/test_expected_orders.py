@@ -0,0 +1,66 @@
+"""Copyright 2022 Jannis Müller/ janmueller@uni-potsdam.de
+
+Licensed under the Apache License, Version 2.0 (the "License");
+you may not use this file except in compliance with the License.
+You may obtain a copy of the License at
+
+    http://www.apache.org/licenses/LICENSE-2.0
+
+Unless required by applicable law or agreed to in writing, software
+distributed under the License is distributed on an "AS IS" BASIS,
+WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+See the License for the specific language governing permissions and
+limitations under the License."""
+
+
+import pytest
+from Utils.expected_orders import ExpectedOrders
+
+
+def test_earliest_follows_the_arrival_times():
+    expected = ExpectedOrders()
+    expected.announce("a", 5.0, "agent 1")
+    expected.announce("b", 3.0, "agent 2", "buffer")
+    expected.announce("c", 3.0, "agent 1")
+
+    assert len(expected) == 3
+    assert expected.earliest() == "b"  # Equal times in order of announcement
+    assert list(expected) == [("a", 5.0, "agent 1", None), ("b", 3.0, "agent 2", "buffer"), ("c", 3.0, "agent 1", None)]
+
+    assert expected.complete("b") == (3.0, 1, "agent 2", "buffer")
+    assert expected.earliest() == "c"
+    assert expected.cancel("c") is not None
+    assert expected.earliest() == "a"
+    assert "c" not in expected and "a" in expected
+
+
+def test_announcing_again_replaces_the_time():
+    expected = ExpectedOrders()
+    expected.announce("a", 1.0, "agent")
+    expected.announce("b", 2.0, "agent")
+    expected.announce("a", 4.0, "agent")
+
+    assert len(expected) == 2
+    assert expected.earliest() == "b"
+    expected.complete("b")
+    assert expected.earliest() == "a"
+    expected.complete("a")
+    assert expected.earliest() is None
+
+
+def test_unknown_orders():
+    expected = ExpectedOrders()
+    assert expected.cancel("a") is None
+    with pytest.raises(Exception):
+        expected.complete("a")
+
+
+def test_outdated_heap_entries_are_compacted():
+    expected = ExpectedOrders()
+    for time in range(100):
+        expected.announce("a", float(time), "agent")
+    expected.announce("b", 50.5, "agent")
+    expected.cancel("a")
+
+    assert len(expected.heap) <= 2 * len(expected) + 16
+    assert expected.earliest() == "b"
@@ -0,0 +1,48 @@
+"""Copyright 2022 Jannis Müller/ janmueller@uni-potsdam.de
+
+Licensed under the Apache License, Version 2.0 (the "License");
+you may not use this file except in compliance with the License.
+You may obtain a copy of the License at
+
+    http://www.apache.org/licenses/LICENSE-2.0
+
+Unless required by applicable law or agreed to in writing, software
+distributed under the License is distributed on an "AS IS" BASIS,
+WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+See the License for the specific language governing permissions and
+limitations under the License."""
+
+
+import Config
+import environment
+from ObservationEncoder import ObservationEncoder
+from Order import load_order_types
+from Ruleset import load_rulesets
+from Utils.init_simulation_env import load_setup
+
+
+def test_buffers_over_capacity_keep_the_slot_layout(monkeypatch):
+    """testsetup1 has a dynamic agent in cell 2. Within 1000 time units its buffers hold more orders than
+    their capacity while locked orders are leaving, the encoder has to clip them to the fixed slots.
+    Cached destinations have to match the current state of the cell"""
+    encode = ObservationEncoder.encode
+    overflows = []
+
+    def checked_encode(self):
+        observation = encode(self)
+        assert observation.shape == (self.SLOTS * len(self.COLUMNS),)
+        overflows.append(self.matrix[:, self.COLUMN_INDEX["overflow"]].max())
+        for order, destination in zip(self.orders, self.destinations):
+            if destination is not None:
+                assert destination is self.AGENT.calculate_destination(order)
+        return observation
+
+    monkeypatch.setattr(ObservationEncoder, "encode", checked_encode)
+    config = dict(Config.configuration, SIMULATION_RANGE=1000)
+    load_order_types()
+    load_rulesets()
+
+    result = environment.run_simulation(config, Config.evaluation_measures, load_setup("./setups/testsetup1.txt"))
+
+    assert result.results["simulation_results"]["processed_quantity"] > 0
+    assert max(overflows) > 0
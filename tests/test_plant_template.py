@@ -0,0 +1,44 @@
+"""Copyright 2022 Jannis Müller/ janmueller@uni-potsdam.de
+
+Licensed under the Apache License, Version 2.0 (the "License");
+you may not use this file except in compliance with the License.
+You may obtain a copy of the License at
+
+    http://www.apache.org/licenses/LICENSE-2.0
+
+Unless required by applicable law or agreed to in writing, software
+distributed under the License is distributed on an "AS IS" BASIS,
+WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+See the License for the specific language governing permissions and
+limitations under the License."""
+
+
+import json
+import Config
+import environment
+from Order import load_order_types
+from Ruleset import load_rulesets
+from Utils.init_simulation_env import load_setup
+from Utils.plant_template import PlantTemplate
+
+
+def simulate(config: dict, template: PlantTemplate):
+    result = environment.run_simulation(config, Config.evaluation_measures, template)
+    return json.dumps(result.results, sort_keys=True)
+
+
+def test_template_is_independent_of_the_loaded_processing_step_objects():
+    config = dict(Config.configuration, SIMULATION_RANGE=500)
+    load_order_types()
+    load_rulesets()
+    template = PlantTemplate(load_setup("./setups/testsetup1.txt"))
+
+    first_run = simulate(config, template)
+    load_order_types()  # Replaces all processing step and order type objects
+    second_run = simulate(config, template)
+
+    assert first_run == second_run
+    assert all(isinstance(task_id, int) for counts in template.PERFORMABLE_TASKS.values() for task_id in counts)
+    keys = [key for routes in template.ROUTES.values() for key in routes]
+    assert keys
+    assert all(isinstance(task_id, int) for key in keys for tasks in key if tasks is not True for task_id in tasks)
@@ -0,0 +1,65 @@
+"""Copyright 2022 Jannis Müller/ janmueller@uni-potsdam.de
+
+Licensed under the Apache License, Version 2.0 (the "License");
+you may not use this file except in compliance with the License.
+You may obtain a copy of the License at
+
+    http://www.apache.org/licenses/LICENSE-2.0
+
+Unless required by applicable law or agreed to in writing, software
+distributed under the License is distributed on an "AS IS" BASIS,
+WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+See the License for the specific language governing permissions and
+limitations under the License."""
+
+
+import math
+import numpy as np
+import pytest
+from Utils.race import chi2_sf, t_sf, friedman_test, paired_t_test
+
+
+@pytest.mark.parametrize("dof, critical_value", [(1, 3.841), (2, 5.991), (3, 7.815), (4, 9.488), (5, 11.070),
+                                                 (10, 18.307)])
+def test_chi2_sf_of_the_critical_values(dof, critical_value):
+    assert chi2_sf(critical_value, dof) == pytest.approx(0.05, abs=1e-4)
+
+
+def test_chi2_sf_bounds():
+    assert chi2_sf(0, 3) == 1.0
+    assert chi2_sf(-1, 2) == 1.0
+    assert chi2_sf(4, 2) == pytest.approx(math.exp(-2))
+
+
+@pytest.mark.parametrize("dof, critical_value", [(1, 6.314), (2, 2.920), (3, 2.353), (5, 2.015), (10, 1.812),
+                                                 (30, 1.697)])
+def test_t_sf_of_the_critical_values(dof, critical_value):
+    assert t_sf(critical_value, dof) == pytest.approx(0.05, abs=1e-4)
+    assert t_sf(-critical_value, dof) == pytest.approx(0.95, abs=1e-4)
+
+
+def test_t_sf_is_symmetric_around_zero():
+    for dof in range(1, 8):
+        assert t_sf(0, dof) == pytest.approx(0.5)
+        assert t_sf(1.3, dof) + t_sf(-1.3, dof) == pytest.approx(1)
+
+
+def test_friedman_test_of_a_consistent_ranking():
+    # Statistic 20 with 2 degrees of freedom
+    values = np.tile([1.0, 2.0, 3.0], (10, 1))
+    assert friedman_test(values) == pytest.approx(math.exp(-10))
+
+
+def test_friedman_test_of_ties():
+    assert friedman_test(np.ones((5, 3))) == 1.0
+    # Averaged ranks of ties: the first two candidates share the ranks 1 and 2
+    values = np.tile([1.0, 1.0, 3.0], (6, 1))
+    assert friedman_test(values) == pytest.approx(math.exp(-6))
+
+
+def test_paired_t_test():
+    best = np.array([1.0, 2.0, 3.0, 4.0, 5.0])
+    # Differences 1 to 5: t = sqrt(18) with 4 degrees of freedom
+    assert paired_t_test(best * 2, best) == pytest.approx(0.0066178, abs=1e-6)
+    assert paired_t_test(best, best) == 1.0
+    assert paired_t_test(best + 1, best) == 0.0
@@ -0,0 +1,87 @@
+"""Copyright 2022 Jannis Müller/ janmueller@uni-potsdam.de
+
+Licensed under the Apache License, Version 2.0 (the "License");
+you may not use this file except in compliance with the License.
+You may obtain a copy of the License at
+
+    http://www.apache.org/licenses/LICENSE-2.0
+
+Unless required by applicable law or agreed to in writing, software
+distributed under the License is distributed on an "AS IS" BASIS,
+WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+See the License for the specific language governing permissions and
+limitations under the License."""
+
+
+import multiprocessing
+import numpy as np
+import pytest
+import Config
+import environment
+from Order import load_order_types
+from Ruleset import load_rulesets
+from Utils.init_simulation_env import load_setup
+from Utils.replay_buffer import ReplayBuffer
+
+
+def append_transitions(path: str, first: int, amount: int):
+    replay_buffer = ReplayBuffer(path, capacity=8, observation_size=4)
+    for action in range(first, first + amount):
+        replay_buffer.append(np.full(3, action), action, 0.5, np.full(4, action))
+    replay_buffer.close()
+
+
+def test_ring_overwrites_the_oldest_transitions(tmp_path):
+    append_transitions(str(tmp_path), 0, 11)
+    replay_buffer = ReplayBuffer(str(tmp_path), capacity=8, observation_size=4)
+
+    assert len(replay_buffer) == 8
+    assert sorted(replay_buffer.actions) == list(range(3, 11))
+    assert replay_buffer.states[3].tolist() == [3, 3, 3, 0]  # Zero padded
+    assert replay_buffer.next_states[3].tolist() == [3, 3, 3, 3]
+
+    batch = replay_buffer.sample(16)
+    assert batch["states"].shape == (16, 4)
+    assert (batch["actions"] == batch["states"][:, 0]).all()
+    assert (batch["weights"] == 1).all()
+    replay_buffer.close()
+
+
+def test_prioritized_sampling_prefers_high_priorities(tmp_path):
+    append_transitions(str(tmp_path), 0, 4)
+    replay_buffer = ReplayBuffer(str(tmp_path), capacity=8, observation_size=4, alpha=1, seed=1)
+    replay_buffer.update_priorities(np.arange(4), np.array([0, 0, 0, 10]))
+
+    batch = replay_buffer.sample(50, prioritized=True)
+    assert (batch["actions"] == 3).all()
+    assert replay_buffer.header[4] == pytest.approx(10, rel=1e-5)  # New transitions get the highest priority
+    replay_buffer.close()
+
+
+def test_processes_append_to_the_same_buffer(tmp_path):
+    ReplayBuffer(str(tmp_path), capacity=8, observation_size=4).close()
+    processes = [multiprocessing.Process(target=append_transitions, args=(str(tmp_path), first, 3)) for first in [0, 10]]
+    for process in processes:
+        process.start()
+    for process in processes:
+        process.join()
+
+    replay_buffer = ReplayBuffer(str(tmp_path), capacity=8, observation_size=4)
+    assert len(replay_buffer) == 6
+    assert sorted(replay_buffer.actions[:6]) == [0, 1, 2, 10, 11, 12]
+    with pytest.raises(ValueError):
+        ReplayBuffer(str(tmp_path), capacity=16, observation_size=4)
+    replay_buffer.close()
+
+
+def test_runs_end_the_last_transition_of_each_agent(tmp_path):
+    """testsetup1 has one dynamic agent"""
+    config = dict(Config.configuration, SIMULATION_RANGE=300, REPLAY_BUFFER=str(tmp_path), REPLAY_OBSERVATION_SIZE=2048)
+    load_order_types()
+    load_rulesets()
+    environment.run_simulation(config, Config.evaluation_measures, load_setup("./setups/testsetup1.txt"))
+
+    replay_buffer = ReplayBuffer(str(tmp_path), capacity=config["REPLAY_BUFFER_CAPACITY"], observation_size=2048)
+    assert len(replay_buffer) > 0
+    assert replay_buffer.dones[:len(replay_buffer)].tolist() == [False] * (len(replay_buffer) - 1) + [True]
+    replay_buffer.close()
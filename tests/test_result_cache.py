@@ -0,0 +1,61 @@
+"""Copyright 2022 Jannis Müller/ janmueller@uni-potsdam.de
+
+Licensed under the Apache License, Version 2.0 (the "License");
+you may not use this file except in compliance with the License.
+You may obtain a copy of the License at
+
+    http://www.apache.org/licenses/LICENSE-2.0
+
+Unless required by applicable law or agreed to in writing, software
+distributed under the License is distributed on an "AS IS" BASIS,
+WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+See the License for the specific language governing permissions and
+limitations under the License."""
+
+
+import shutil
+import pytest
+import Config
+import state_attributes
+from Utils.init_simulation_env import load_setup
+from Utils.result_cache import ResultCache, cache_key, CATALOGS
+
+
+@pytest.fixture
+def setup(tmp_path):
+    shutil.copy("./setups/testsetup1.txt", str(tmp_path / "setup.txt"))
+    return load_setup(str(tmp_path / "setup.txt"))
+
+
+def key(setup, **changes):
+    return cache_key(dict(Config.configuration, **changes), setup, (1, 2), Config.evaluation_measures)
+
+
+def test_output_keys_do_not_change_the_cache_key(setup):
+    assert key(setup) == key(setup, EVENT_LOG_FORMAT="parquet", TIME_SERIES_BIN_WIDTH=10, RESULT_CACHE_SIZE=1,
+                             INSTRUMENTATION=True, MEMORY_REPORT=True, DB_IN_MEMORY=False)
+    assert key(setup) != key(setup, MACHINE_FAILURE_RATE=5)
+
+
+def test_trained_models_and_state_attributes_change_the_cache_key(setup, tmp_path, monkeypatch):
+    for catalog in CATALOGS:
+        shutil.copy(catalog, str(tmp_path / catalog))
+    monkeypatch.chdir(tmp_path)  # rulesets.json references model_1.pkl, which does not exist in the repository
+    keys = [key(setup)]
+    for model in [b"first", b"second"]:
+        (tmp_path / "model_1.pkl").write_bytes(model)
+        keys.append(key(setup))
+    monkeypatch.setitem(state_attributes.smart_state, "agent", ["moving"])
+    keys.append(key(setup))
+
+    assert len(set(keys)) == 4
+
+
+def test_cached_results_contain_no_measurements_of_the_simulating_process(tmp_path):
+    cache = ResultCache(str(tmp_path), max_size=1)
+    cache.put("run", {"simulation_results": {"processed_quantity": 3}, "instrumentation": {"timers": {}},
+                      "memory": {"total": 1}})
+
+    assert cache.get("run") == {"simulation_results": {"processed_quantity": 3}, "instrumentation": None,
+                                "memory": None}
+    assert cache.get("missing") is None
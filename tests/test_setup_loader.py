@@ -0,0 +1,66 @@
+"""Copyright 2022 Jannis Müller/ janmueller@uni-potsdam.de
+
+Licensed under the Apache License, Version 2.0 (the "License");
+you may not use this file except in compliance with the License.
+You may obtain a copy of the License at
+
+    http://www.apache.org/licenses/LICENSE-2.0
+
+Unless required by applicable law or agreed to in writing, software
+distributed under the License is distributed on an "AS IS" BASIS,
+WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+See the License for the specific language governing permissions and
+limitations under the License."""
+
+
+import shutil
+import pytest
+from Utils.setup_loader import load_setup, validate_setup, CACHE_SUFFIX
+
+
+def copy_setup(tmp_path, name: str):
+    """Path of a copy of a repository setup. Loading it writes the cache file into tmp_path, not into setups/"""
+    path = str(tmp_path / name)
+    shutil.copy("./setups/" + name, path)
+    return path
+
+
+@pytest.fixture
+def setup(tmp_path):
+    return load_setup(copy_setup(tmp_path, "testsetup1.txt"))
+
+
+def test_setups_of_the_repository_are_valid(tmp_path):
+    for name in ["testsetup1.txt", "t1.txt", "medium_testsetup.txt"]:
+        validate_setup(load_setup(copy_setup(tmp_path, name)))
+
+
+@pytest.mark.parametrize("column, row, value", [
+    ("Type", 0, "Other"),
+    ("Machines", 0, []),  # Manufacturing cell without machines
+    ("Machines", 6, [1]),  # Distribution cell with machines
+    ("Machines", 0, [999]),  # Unknown task id
+    ("Agents", 0, []),
+    ("Agents", 0, [999]),  # Unknown ruleset id
+    ("StorageCap", 0, 0),
+    ("Parent", 6, 3),  # Parent with a lower index that is no distribution cell
+    ("Parent", 8, 7),  # No main cell
+    ("Parent", 7, None),  # Two main cells
+])
+def test_invalid_setups(setup, column, row, value):
+    setup.at[row, column] = value
+    with pytest.raises(ValueError):
+        validate_setup(setup)
+
+
+def test_cached_setup_is_compiled_again_after_changes(tmp_path):
+    path = copy_setup(tmp_path, "testsetup1.txt")
+    first = load_setup(path)
+    assert (tmp_path / ("testsetup1.txt" + CACHE_SUFFIX)).exists()
+    assert load_setup(path).equals(first)
+
+    with open(path, encoding="UTF-8") as f:
+        content = f.read()
+    with open(path, "w", encoding="UTF-8") as f:
+        f.write(content.replace("5;3;4;6;0", "15;3;4;6;0", 1))
+    assert load_setup(path).loc[0, "StorageCap"] == 15
@@ -0,0 +1,47 @@
+"""Copyright 2022 Jannis Müller/ janmueller@uni-potsdam.de
+
+Licensed under the Apache License, Version 2.0 (the "License");
+you may not use this file except in compliance with the License.
+You may obtain a copy of the License at
+
+    http://www.apache.org/licenses/LICENSE-2.0
+
+Unless required by applicable law or agreed to in writing, software
+distributed under the License is distributed on an "AS IS" BASIS,
+WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+See the License for the specific language governing permissions and
+limitations under the License."""
+
+
+import Config
+from Utils.init_simulation_env import load_setup
+from Utils.sweep import expand_jobs, run_job
+
+KPIS = ["processed_quantity", "processed_in_time", "mean_tardiness", "mean_lateness"]
+
+
+def test_replications_only_depend_on_their_seeds():
+    config = dict(Config.configuration, SIMULATION_RANGE=1000)
+    jobs = expand_jobs({"MACHINE_FAILURE_RATE": [20]}, 1, config, load_setup("./setups/testsetup1.txt"))
+    job = jobs[0]
+    other_interruptions = dict(job, config=dict(job["config"], SEED_MACHINE_INTERRUPTIONS=job["config"]["SEED_MACHINE_INTERRUPTIONS"] + 1))
+
+    first_row = run_job(job, Config.evaluation_measures)
+    other_row = run_job(other_interruptions, Config.evaluation_measures)
+    second_row = run_job(job, Config.evaluation_measures)
+
+    assert first_row == second_row
+    assert [first_row[kpi] for kpi in KPIS] != [other_row[kpi] for kpi in KPIS]
+
+
+def test_parameter_points_share_the_seeds_of_a_replication():
+    jobs = expand_jobs({"StorageCap": [4, 6], "AGENT_SPEED": [1]}, 3, Config.configuration,
+                       load_setup("./setups/testsetup1.txt"))
+
+    assert len(jobs) == 6
+    seeds = {}
+    for job in jobs:
+        seed_pair = (job["config"]["SEED_INCOMING_ORDERS"], job["config"]["SEED_MACHINE_INTERRUPTIONS"])
+        seeds.setdefault(job["replication"], set()).add(seed_pair)
+    assert all(len(pairs) == 1 for pairs in seeds.values())
+    assert len(set.union(*seeds.values())) == 3
@@ -0,0 +1,28 @@
+"""Copyright 2022 Jannis Müller/ janmueller@uni-potsdam.de
+
+Licensed under the Apache License, Version 2.0 (the "License");
+you may not use this file except in compliance with the License.
+You may obtain a copy of the License at
+
+    http://www.apache.org/licenses/LICENSE-2.0
+
+Unless required by applicable law or agreed to in writing, software
+distributed under the License is distributed on an "AS IS" BASIS,
+WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+See the License for the specific language governing permissions and
+limitations under the License."""
+
+
+
+import numpy as np
+import pandas as pd
+from Utils.time_series import bin_edges, time_weighted_bins
+
+
+def test_time_weighted_bins_cover_all_objects_and_bins():
+    edges = bin_edges(30, 10)
+    events = pd.DataFrame({"object": [1, 1], "time": [15, 20], "value": [2, 4]})
+    result = time_weighted_bins(events, edges, [1, 2])
+
+    assert list(zip(result["object"], result["bin"])) == [(1, 0), (1, 1), (1, 2), (2, 0), (2, 1), (2, 2)]
+    assert result["value"].tolist() == [0, 1, 4, 0, 0, 0]  # 0 before the first event and for objects without events
@@ -1,13 +1,105 @@
-time_state_calc = 0
-time_destination_calc = 0
+"""Copyright 2022 Jannis Müller/ janmueller@uni-potsdam.de
 
-time_occupancy_calc = 0
-time_order_attr_calc = 0
-time_pos_attr_calc = 0
+Licensed under the Apache License, Version 2.0 (the "License");
+you may not use this file except in compliance with the License.
+You may obtain a copy of the License at
 
-time_action_calc = 0
-time_smart_action_calc = 0
+    http://www.apache.org/licenses/LICENSE-2.0
 
-a = 0
-b = 0
-c = 0
+Unless required by applicable law or agreed to in writing, software
+distributed under the License is distributed on an "AS IS" BASIS,
+WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+See the License for the specific language governing permissions and
+limitations under the License."""
+
+# -*- coding: utf-8 -*-
+import time
+from bisect import bisect_left
+
+enabled = False  # Set per simulation run by reset(). If False, start() returns None and nothing is recorded
+
+HISTOGRAM_BOUNDS = [1e-6 * 2 ** exponent for exponent in range(24)]  # Upper bounds of the latency bins in seconds
+
+timers = {}  # Name -> Timer
+counters = {}  # Name -> Amount
+
+
+class Timer:
+
+    def __init__(self):
+        self.calls = 0
+        self.total = 0.0
+        self.max = 0.0
+        self.histogram = [0] * (len(HISTOGRAM_BOUNDS) + 1)
+
+    def add(self, duration):
+        self.calls += 1
+        self.total += duration
+        if duration > self.max:
+            self.max = duration
+        self.histogram[bisect_left(HISTOGRAM_BOUNDS, duration)] += 1
+
+    def to_dict(self):
+        bounds = HISTOGRAM_BOUNDS + [None]
+        return {"calls": self.calls,
+                "total": self.total,
+                "mean": self.total / self.calls if self.calls else 0,
+                "max": self.max,
+                "histogram": [[bounds[index], amount] for index, amount in enumerate(self.histogram) if amount]}
+
+
+def start():
+    """Return the start time of a measurement or None if instrumentation is disabled"""
+    if enabled:
+        return time.perf_counter()
+    return None
+
+
+def stop(name: str, started):
+    """Add the time passed since started to the timer with this name"""
+    if started is None:
+        return
+    duration = time.perf_counter() - started
+    timer = timers.get(name)
+    if timer is None:
+        timer = timers[name] = Timer()
+    timer.add(duration)
+
+
+def resume(started, paused):
+    """Continue a measurement paused at the time paused, the time in between is not measured"""
+    if started is None:
+        return None
+    return started + (time.perf_counter() - paused)
+
+
+def count(name: str, amount=1):
+    if enabled:
+        counters[name] = counters.get(name, 0) + amount
+
+
+def reset(active=False):
+    """Clear all timers and counters at the start of a new simulation run"""
+    global enabled
+    enabled = active
+    timers.clear()
+    counters.clear()
+
+
+def report():
+    """Values of the current run for the results file. None if instrumentation is disabled"""
+    if not enabled:
+        return None
+    return {"timers": {name: timer.to_dict() for name, timer in sorted(timers.items())},
+            "counters": dict(sorted(counters.items()))}
+
+
+def summary():
+    lines = ["{:<32}{:>10}{:>14}{:>14}{:>14}".format("Timer", "Calls", "Total [s]", "Mean [ms]", "Max [ms]")]
+    for name, timer in sorted(timers.items()):
+        values = timer.to_dict()
+        lines.append("{:<32}{:>10}{:>14.3f}{:>14.3f}{:>14.3f}".format(name, values["calls"], values["total"],
+                                                                     values["mean"] * 1000, values["max"] * 1000))
+    for name, amount in sorted(counters.items()):
+        lines.append("{:<32}{:>10}".format(name, amount))
+    return "\n".join(lines)
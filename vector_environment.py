@@ -0,0 +1,154 @@
+"""Copyright 2022 Jannis Müller/ janmueller@uni-potsdam.de
+
+Licensed under the Apache License, Version 2.0 (the "License");
+you may not use this file except in compliance with the License.
+You may obtain a copy of the License at
+
+    http://www.apache.org/licenses/LICENSE-2.0
+
+Unless required by applicable law or agreed to in writing, software
+distributed under the License is distributed on an "AS IS" BASIS,
+WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+See the License for the specific language governing permissions and
+limitations under the License."""
+
+import simpy
+import numpy as np
+from copy import copy
+from environment import set_up_sim_env, release_objects
+from Order import load_order_types, order_arrivals
+from Ruleset import load_rulesets
+from PolicyService import PolicyService
+from Utils import check_config, database
+from Utils.plant_template import PlantTemplate
+import RewardLayer
+
+
+class DecisionQueue(PolicyService):
+    """Policy service of a training instance. Decisions of dynamic agents wait until the training loop
+    chooses an action"""
+
+    def request(self, agent, state: np.ndarray, action_mask: np.ndarray):
+        event = self.env.event()
+        self.requests.append((agent, state, action_mask, event))
+        return event
+
+
+class SimulationInstance:
+    """One simulation of the vectorized environment. Runs until the next decision of a dynamic agent"""
+
+    def __init__(self, config: dict, setup):
+        self.CONFIG = config
+        self.SETUP = setup
+        self.sim_env = None
+        self.finished_orders = 0
+
+    def reset(self, seed: int):
+        self.close()
+        config = copy(self.CONFIG)
+        config["SEED_INCOMING_ORDERS"] = seed
+        env = simpy.Environment()
+        self.sim_env = set_up_sim_env(config, env, self.SETUP)
+        self.sim_env.policy_service = DecisionQueue(env)
+        self.finished_orders = 0
+        env.process(order_arrivals(env, self.sim_env, config))
+
+    def advance(self):
+        """Simulate until a dynamic agent waits for a decision. Returns False if the simulation range is over"""
+        env = self.sim_env.env
+        while not self.sim_env.policy_service.requests:
+            if env.peek() >= self.sim_env.SIMULATION_TIME_RANGE:
+                return False
+            env.step()
+        return True
+
+    def decision(self):
+        """State and action mask of the oldest open decision"""
+        agent, state, action_mask, event = self.sim_env.policy_service.requests[0]
+        return state, action_mask
+
+    def act(self, action: int):
+        agent, state, action_mask, event = self.sim_env.policy_service.requests.pop(0)
+        event.succeed(int(action))
+
+    def reward(self):
+        """Reward since the last call"""
+        service = self.sim_env.policy_service
+        reward = RewardLayer.reward_action(service.penalty, self.sim_env.finished_orders - self.finished_orders)
+        service.penalty = 0
+        self.finished_orders = self.sim_env.finished_orders
+        return reward
+
+    def close(self):
+        if self.sim_env:
+            database.close_connection(self.sim_env)
+            if self.sim_env.replay_buffer is not None:
+                self.sim_env.replay_buffer.close()
+            release_objects(self.sim_env)
+            self.sim_env = None
+
+
+class VectorEnvironment:
+    """Gym style training environment of several independent simulations in one process.
+    Each step applies one action per simulation and runs all of them to the next decision of a dynamic agent.
+    Observations, action masks, rewards and dones are returned as stacked arrays. Finished simulations are reset
+    automatically and return the first observation of the new run."""
+
+    def __init__(self, config: dict, setup, instances=4, observation_size=1024, max_actions=128, seed=None):
+        check_config.check_configuration_file(config)
+        load_order_types()
+        load_rulesets()
+
+        config = copy(config)
+        config["DB_IN_MEMORY"] = True  # Instances must not share the database file
+
+        self.OBSERVATION_SIZE = observation_size
+        self.MAX_ACTIONS = max_actions
+        self.random = np.random.RandomState(seed)  # Order seeds of the simulation runs
+        template = PlantTemplate(setup)  # Shared by all instances and resets
+        self.instances = [SimulationInstance(config, template) for instance in range(instances)]
+
+    def reset(self):
+        """Start new simulations. Returns observations and action masks"""
+        for instance in self.instances:
+            self.reset_instance(instance)
+        return self.observations()
+
+    def step(self, actions):
+        """Apply one action per simulation. Returns observations, action masks, rewards and dones"""
+        rewards = np.zeros(len(self.instances), dtype=np.float32)
+        dones = np.zeros(len(self.instances), dtype=bool)
+
+        for index, (instance, action) in enumerate(zip(self.instances, actions)):
+            instance.act(action)
+            dones[index] = not instance.advance()
+            rewards[index] = instance.reward()
+            if dones[index]:
+                self.reset_instance(instance)
+
+        observations, masks = self.observations()
+        return observations, masks, rewards, dones
+
+    def reset_instance(self, instance: SimulationInstance):
+        instance.reset(self.random.randint(99999999))
+        if not instance.advance():
+            raise Exception("No dynamic agent made a decision within the simulation range! "
+                            "Please check the rulesets of the setup.")
+
+    def observations(self):
+        observations = np.zeros((len(self.instances), self.OBSERVATION_SIZE), dtype=np.float32)
+        masks = np.zeros((len(self.instances), self.MAX_ACTIONS), dtype=bool)
+
+        for index, instance in enumerate(self.instances):
+            state, action_mask = instance.decision()
+            if len(state) > self.OBSERVATION_SIZE or len(action_mask) > self.MAX_ACTIONS:
+                raise ValueError("The state of a decision exceeds observation_size or max_actions of the vector "
+                                 "environment!", len(state), len(action_mask))
+            observations[index, :len(state)] = state
+            masks[index, :len(action_mask)] = action_mask
+
+        return observations, masks
+
+    def close(self):
+        for instance in self.instances:
+            instance.close()